@@ -0,0 +1,181 @@
+"""
+Coalescing and admission control for CPU-heavy endpoints.
+
+- `SingleFlight`: concurrent calls with the same key share one in-flight
+  computation; followers just await the leader's result and use no thread.
+- `AdmissionLimiter`: at most `max_concurrent` computations run at once per
+  process, up to `max_queue` more wait (for at most `queue_timeout_s`), and
+  anything beyond that is rejected with 503 + Retry-After instead of piling
+  up in the threadpool.
+
+`run_heavy` combines both and runs the sync computation in the threadpool:
+
+    result = await run_heavy(forecast_limiter, ("forecast", building_id), compute,
+                             request=request)
+
+Given the request, it also watches for the client disconnecting and then
+cancels compute-pool work (see app.workers) unless other callers are still
+waiting for the same result. Timeouts become 504 and cancellations 503 here,
+so endpoints only need to pass HTTPException through.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .profiling import profiled_call
+from .workers import ComputeCancelled, ComputeTimeout, cancel_scope
+
+# How often a running computation checks whether its client is still there
+DISCONNECT_POLL_S = 0.5
+
+
+class Overloaded(HTTPException):
+    def __init__(self, name: str, retry_after_s: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Too many concurrent {name} requests, retry later.",
+            headers={"Retry-After": str(retry_after_s)},
+        )
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._followers: Dict[Hashable, int] = {}
+
+    def followers(self, key: Hashable) -> int:
+        return self._followers.get(key, 0)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        future = self._inflight.get(key)
+        if future is not None:
+            self._followers[key] = self._followers.get(key, 0) + 1
+            try:
+                # shield: a follower disconnecting must not cancel the leader.
+                return await asyncio.shield(future)
+            finally:
+                self._followers[key] -= 1
+                if not self._followers[key]:
+                    del self._followers[key]
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+
+class AdmissionLimiter:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 queue_timeout_s: float, retry_after_s: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.retry_after_s = retry_after_s
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._running = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _reject(self):
+        self.rejected += 1
+        raise Overloaded(self.name, self.retry_after_s)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                self._reject()
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_s)
+            except asyncio.TimeoutError:
+                self._reject()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+
+_flights = SingleFlight()
+
+
+async def _cancel_on_disconnect(request: Request, key: Hashable, cancel: threading.Event):
+    while True:
+        await asyncio.sleep(DISCONNECT_POLL_S)
+        if await request.is_disconnected() and not _flights.followers(key):
+            cancel.set()
+            return
+
+
+async def run_heavy(limiter: AdmissionLimiter, key: Hashable, fn: Callable, *args,
+                    request: Optional[Request] = None):
+    """Run sync `fn(*args)` in the threadpool, coalesced on `key` and admission-limited."""
+
+    async def admitted():
+        async with limiter.slot():
+            cancel = threading.Event()
+            watcher = None
+            if request is not None:
+                watcher = asyncio.create_task(_cancel_on_disconnect(request, key, cancel))
+            try:
+                with cancel_scope(cancel):
+                    return await run_in_threadpool(profiled_call(fn), *args)
+            except ComputeTimeout as exc:
+                raise HTTPException(status_code=504, detail=str(exc))
+            except ComputeCancelled:
+                # Normally nobody is left to read this; a caller that joined
+                # just after the cancel can simply retry.
+                raise HTTPException(
+                    status_code=503,
+                    detail="Computation cancelled, retry later.",
+                    headers={"Retry-After": str(limiter.retry_after_s)},
+                )
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+
+    return await _flights.run(key, admitted)
+
+
+def _limiter(name: str) -> AdmissionLimiter:
+    return AdmissionLimiter(
+        name,
+        max_concurrent=settings.HEAVY_MAX_CONCURRENT,
+        max_queue=settings.HEAVY_MAX_QUEUE,
+        queue_timeout_s=settings.HEAVY_QUEUE_TIMEOUT_S,
+        retry_after_s=settings.HEAVY_RETRY_AFTER_S,
+    )
+
+
+forecast_limiter = _limiter("forecast")
+optimize_limiter = _limiter("optimization")
+simulation_limiter = _limiter("simulation")
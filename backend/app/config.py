@@ -1,4 +1,5 @@
 from pydantic import BaseSettings
+from typing import Optional
 import os
 
 
@@ -9,10 +10,128 @@ class Settings(BaseSettings):
         "DATABASE_URL",
         "sqlite:///./smarted_city.db",  # <-- use SQLite file instead of Postgres
     )
+    # Read-only engine for analytics reads (e.g. a Postgres replica, or for
+    # SQLite "sqlite:///file:./smarted_city.db?mode=ro&uri=true"). Unset =
+    # reads use the primary. SQLite primaries switch to WAL when it is set
+    # (or with SQLITE_WAL) so readers never block ingestion.
+    READ_DATABASE_URL: Optional[str] = os.getenv("READ_DATABASE_URL")
+    SQLITE_WAL: bool = False
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
     SECRET_KEY: str = os.getenv("SECRET_KEY", "super-secret-change-me")
     ALGORITHM: str = "HS256"
 
+    # Per-request profiling (Server-Timing headers, /metrics, sampled traces)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # fraction of requests traced in full
+    PROFILING_PROFILER: str = "cprofile"  # or "pyinstrument"
+    PROFILING_OUTPUT_DIR: str = "./profiles"
+
+    # Query diagnostics (slow-query log with EXPLAIN, N+1 detection)
+    QUERY_DIAGNOSTICS_ENABLED: bool = False
+    SLOW_QUERY_MS: float = 100.0
+    N_PLUS_ONE_THRESHOLD: int = 10
+
+    # orjson responses without response_model re-validation for large payloads
+    FAST_JSON_RESPONSES: bool = False
+
+    # Response compression (brotli when brotli-asgi is installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+
+    # Background jobs (in-process scheduler, or `python -m app.jobs`)
+    JOBS_ENABLED: bool = False
+    JOB_FORECAST_INTERVAL_S: int = 3600
+    JOB_FORECAST_HORIZON: int = 24
+    JOB_RISK_INTERVAL_S: int = 3600
+    JOB_ROLLUP_INTERVAL_S: int = 300
+    # How old a precomputed result may be and still be served (0 = always recompute)
+    FORECAST_MAX_AGE_S: int = 0
+    RISK_MAX_AGE_S: int = 0
+    DASHBOARD_MAX_AGE_S: int = 0
+
+    # On-disk cache shared by all workers (trained models, rollup snapshots).
+    # Off by default: forecasts then retrain per request, as before.
+    SHARED_CACHE_ENABLED: bool = False
+    SHARED_CACHE_DIR: str = "./cache"
+    SHARED_CACHE_MAX_AGE_S: int = 86400
+    SHARED_CACHE_MEMORY_ITEMS: int = 64  # unpickled entries kept per process
+
+    # Memory-mapped hourly kWh per building, read by the forecaster. Run
+    # `python -m app.services.timeseries_store rebuild` after enabling it.
+    TIMESERIES_STORE_ENABLED: bool = False
+    TIMESERIES_STORE_DIR: str = "./timeseries"
+
+    # Admission control for forecast/optimization requests (per process):
+    # concurrent computations, queued requests, and how long they may queue
+    HEAVY_MAX_CONCURRENT: int = max(1, (os.cpu_count() or 2) - 1)
+    HEAVY_MAX_QUEUE: int = 16
+    HEAVY_QUEUE_TIMEOUT_S: float = 10.0
+    HEAVY_RETRY_AFTER_S: int = 5
+
+    # Worker processes for model fits and LP solves (0 = run in the request thread)
+    COMPUTE_POOL_SIZE: int = 0
+    COMPUTE_TIMEOUT_S: float = 120.0
+
+    # Sensor health: a gap is an interval > GAP_FACTOR x cadence; a sensor is
+    # stuck after STUCK_REPEATS identical values and stale after no reading
+    # for STALE_FACTOR x cadence.
+    SENSOR_GAP_FACTOR: float = 3.0
+    SENSOR_STUCK_REPEATS: int = 12
+    SENSOR_STALE_FACTOR: float = 5.0
+    # How the forecaster treats missing sensor-hours: raw, interpolate or exclude
+    FORECAST_GAP_POLICY: str = "raw"
+
+    # Largest accepted POST /energy/readings/batch
+    INGEST_BATCH_MAX: int = 10000
+
+    # Anomaly detection on ingest: each sensor keeps an EWMA mean/variance per
+    # hour of day; once a bucket has MIN_SAMPLES readings, a new reading more
+    # than Z_THRESHOLD deviations away is flagged. The deviation is floored at
+    # MIN_STD_FRAC x the mean so flat loads don't flag every wobble.
+    ANOMALY_DETECTION_ENABLED: bool = True
+    ANOMALY_Z_THRESHOLD: float = 4.0
+    ANOMALY_ALPHA: float = 0.05
+    ANOMALY_MIN_SAMPLES: int = 7
+    ANOMALY_MIN_STD_FRAC: float = 0.05
+
+    # Monthly partitions for energy_readings (Postgres partitions, SQLite shard
+    # tables); see app.partitions. Retention drops whole months older than
+    # RETENTION_MONTHS (0 = keep everything).
+    READINGS_PARTITIONING: bool = False
+    READINGS_RETENTION_MONTHS: int = 0
+    READINGS_PARTITIONS_AHEAD: int = 2
+    JOB_PARTITION_INTERVAL_S: int = 86400
+
+    # Create missing tables at app startup; the gunicorn config turns this
+    # off in workers after creating them once in the master. Otherwise run
+    # `python -m app.database` as a deployment step.
+    AUTO_CREATE_TABLES: bool = True
+    # Import scikit-learn/pandas/PuLP at startup instead of on first use
+    WARMUP_ON_STARTUP: bool = False
+
+    # Tariff / carbon-intensity curves: zone used when a building's own zone
+    # has no data, and how long a loaded curve is reused per process
+    GRID_SIGNAL_DEFAULT_ZONE: str = "default"
+    GRID_SIGNAL_CACHE_TTL_S: int = 300
+    GRID_SIGNAL_CACHE_SIZE: int = 256
+    # How long the last step of a single-point import lasts
+    GRID_SIGNAL_STEP_S: int = 3600
+
+    # What-if simulation: days of history behind the typical-day profile and
+    # how long a built profile is reused per process
+    SIMULATION_PROFILE_DAYS: int = 14
+    SIMULATION_PROFILE_TTL_S: int = 900
+
+    # Energy intensity map tiles
+    INTENSITY_TILE_MAX_AGE_S: int = 900
+    INTENSITY_TILE_CACHE_SIZE: int = 20000
+    # How often a worker checks for readings written by other workers
+    INTENSITY_TILE_SYNC_INTERVAL_S: float = 2.0
+    # Browsers and CDNs may serve a tile this long, then serve it stale for
+    # up to INTENSITY_TILE_STALE_S while revalidating it with its ETag
+    INTENSITY_TILE_CLIENT_MAX_AGE_S: int = 60
+    INTENSITY_TILE_STALE_S: int = 900
+
     class Config:
         env_file = ".env"
 
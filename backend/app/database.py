@@ -1,20 +1,50 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
-# Extra args for SQLite (needed to avoid threading issues)
-connect_args = {}
-if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
 
-engine = create_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-    future=True,
-    connect_args=connect_args,
-)
+def _sqlite_pragmas(engine, *pragmas):
+    @event.listens_for(engine, "connect")
+    def _set(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
 
+
+def _make_engine(url: str, read_only: bool = False):
+    # Extra args for SQLite (needed to avoid threading issues)
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+    elif read_only and url.startswith("postgresql"):
+        connect_args = {"options": "-c default_transaction_read_only=on"}
+    new_engine = create_engine(url, future=True, connect_args=connect_args)
+
+    if settings.QUERY_DIAGNOSTICS_ENABLED:
+        from .query_diagnostics import install_query_diagnostics
+
+        install_query_diagnostics(new_engine, slow_ms=settings.SLOW_QUERY_MS)
+    return new_engine
+
+
+engine = _make_engine(settings.SQLALCHEMY_DATABASE_URI)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+# Heavy analytic reads go to `read_engine` so they don't contend with ingest
+# writes on the primary. Reads may lag the primary by the replication delay.
+if settings.READ_DATABASE_URL:
+    read_engine = _make_engine(settings.READ_DATABASE_URL, read_only=True)
+    if read_engine.dialect.name == "sqlite":
+        _sqlite_pragmas(read_engine, "query_only = ON")
+else:
+    read_engine = engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, future=True)
+
+if engine.dialect.name == "sqlite" and (settings.SQLITE_WAL or read_engine is not engine):
+    # WAL: readers see the last committed state and never block the writer.
+    _sqlite_pragmas(engine, "journal_mode = WAL", "synchronous = NORMAL")
+
 Base = declarative_base()
 
 
@@ -24,3 +54,72 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Session on the read engine, for endpoints that only read."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def dialect_insert(db):
+    """`insert` with ON CONFLICT support for the session's dialect, or None."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def init_db():
+    """
+    Create missing tables and ADDED_COLUMNS. Run once per deployment (or at
+    app startup).
+    """
+    from . import models  # noqa: F401  (register tables on Base)
+
+    if settings.READINGS_PARTITIONING and engine.dialect.name == "postgresql":
+        # energy_readings is created as a partitioned table instead.
+        from .partitions import BASE, create_partitioned_parent
+
+        with engine.begin() as conn:
+            Base.metadata.create_all(
+                bind=conn, tables=[t for t in Base.metadata.sorted_tables if t.name != BASE]
+            )
+            if not engine.dialect.has_table(conn, BASE):
+                create_partitioned_parent(conn)
+        _add_missing_columns(engine)
+        return
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns(engine)
+
+
+# Columns added to tables that existing databases already have, which
+# create_all does not alter: table -> [(column, DDL type)]
+ADDED_COLUMNS = {
+    "buildings": [("updated_at", "TIMESTAMP")],
+}
+
+
+def _add_missing_columns(bind):
+    with bind.begin() as conn:
+        for table_name, columns in ADDED_COLUMNS.items():
+            present = {c["name"] for c in inspect(conn).get_columns(table_name)}
+            table = Base.metadata.tables[table_name]
+            for name, ddl_type in columns:
+                if name in present:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {ddl_type}"))
+                for index in table.indexes:
+                    if [c.name for c in index.columns] == [name]:
+                        index.create(bind=conn, checkfirst=True)
+
+
+if __name__ == "__main__":
+    init_db()
@@ -0,0 +1,297 @@
+"""
+Scheduled background jobs.
+
+Forecasts, institution risk scores and the dashboard rollup are refreshed on
+fixed cadences (JOB_*_INTERVAL_S) instead of only being computed inside GET
+requests. The GET endpoints serve the stored results while they are younger
+than FORECAST_MAX_AGE_S / RISK_MAX_AGE_S / DASHBOARD_MAX_AGE_S and fall back
+to computing on demand otherwise.
+
+With JOBS_ENABLED=true the scheduler runs inside the API process (started from
+the FastAPI lifespan); it can also run on its own:
+
+    python -m app.jobs            # loop forever
+    python -m app.jobs --once     # run every due job once and exit
+
+Each job run is guarded by a lease row in `job_leases`, taken with a single
+conditional UPDATE (or INSERT for the first run), so with several API workers
+or a separate jobs process only one of them runs a job per interval. A crashed
+run's lease simply expires. This works the same on SQLite and Postgres.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger("app.jobs")
+
+# How often the scheduler wakes up to look for due jobs (seconds)
+TICK_S = 5.0
+# A lease is held at most this long; longer runs may be duplicated elsewhere
+MAX_LEASE_S = 6 * 3600
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@dataclass
+class Job:
+    name: str
+    interval_s: int
+    func: Callable[[Session], int]  # returns number of items refreshed
+
+
+# ===== Job bodies =====
+def refresh_forecasts(db: Session) -> int:
+    from .services.energy_forecasting import forecast_building_energy, prune_forecasts
+
+    count = 0
+    ids = [b for (b,) in db.query(models.Building.id).order_by(models.Building.id)]
+    for building_id in ids:
+        try:
+            if forecast_building_energy(db, building_id, settings.JOB_FORECAST_HORIZON):
+                count += 1
+            # Only the newest run per building is ever served
+            prune_forecasts(db, building_id)
+        except Exception:
+            db.rollback()
+            logger.exception("Forecast refresh failed for building %s", building_id)
+    return count
+
+
+def refresh_risk_scores(db: Session) -> int:
+    from .services.education_models import compute_institution_risk
+
+    count = 0
+    ids = [i for (i,) in db.query(models.Institution.id).order_by(models.Institution.id)]
+    for institution_id in ids:
+        try:
+            compute_institution_risk(db, institution_id)
+            count += 1
+        except Exception:
+            db.rollback()
+            logger.exception("Risk refresh failed for institution %s", institution_id)
+    return count
+
+
+def refresh_rollups(db: Session) -> int:
+    from .services.analytics import (
+        DASHBOARD_SNAPSHOT,
+        compute_dashboard_summary,
+        store_snapshot,
+    )
+    from .shared_cache import shared_cache
+
+    store_snapshot(db, DASHBOARD_SNAPSHOT, compute_dashboard_summary(db))
+    if settings.SHARED_CACHE_ENABLED:
+        shared_cache.prune(settings.SHARED_CACHE_MAX_AGE_S)
+    return 1
+
+
+def maintain_partitions(db: Session) -> int:
+    from .partitions import maintain
+
+    return maintain(db)
+
+
+def default_jobs() -> List[Job]:
+    jobs = [
+        Job("forecasts", settings.JOB_FORECAST_INTERVAL_S, refresh_forecasts),
+        Job("risk_scores", settings.JOB_RISK_INTERVAL_S, refresh_risk_scores),
+        Job("rollups", settings.JOB_ROLLUP_INTERVAL_S, refresh_rollups),
+    ]
+    if settings.READINGS_PARTITIONING:
+        jobs.append(Job("partitions", settings.JOB_PARTITION_INTERVAL_S, maintain_partitions))
+    return jobs
+
+
+# ===== Leases =====
+def acquire_lease(db: Session, job: Job, now: datetime) -> bool:
+    """Take the job's lease if it is free and the job is due."""
+    lease = models.JobLease
+    expires = now + timedelta(seconds=min(max(job.interval_s, 60), MAX_LEASE_S))
+    result = db.execute(
+        update(lease)
+        .where(
+            lease.name == job.name,
+            or_(lease.expires_at.is_(None), lease.expires_at < now),
+            or_(
+                lease.last_run_at.is_(None),
+                lease.last_run_at <= now - timedelta(seconds=job.interval_s),
+            ),
+        )
+        .values(owner=OWNER, expires_at=expires)
+    )
+    db.commit()
+    if result.rowcount == 1:
+        return True
+    if db.get(lease, job.name) is not None:
+        return False
+
+    db.add(lease(name=job.name, owner=OWNER, expires_at=expires))
+    try:
+        db.commit()
+    except IntegrityError:  # another worker created it first
+        db.rollback()
+        return False
+    return True
+
+
+def release_lease(db: Session, job: Job, started_at: datetime):
+    lease = models.JobLease
+    db.execute(
+        update(lease)
+        .where(lease.name == job.name, lease.owner == OWNER)
+        .values(expires_at=None, last_run_at=started_at)
+    )
+    db.commit()
+
+
+# ===== Metrics =====
+class JobMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(self, name: str, seconds: float, items: int, ok: bool):
+        with self._lock:
+            s = self._stats.setdefault(
+                name,
+                {"runs": 0, "failures": 0, "seconds": 0.0, "items": 0,
+                 "last_seconds": 0.0, "last_success": 0.0},
+            )
+            s["runs"] += 1
+            s["seconds"] += seconds
+            s["last_seconds"] = seconds
+            if ok:
+                s["items"] += items
+                s["last_success"] = time.time()
+            else:
+                s["failures"] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def render(self) -> str:
+        series = [
+            ("job_runs_total", "counter", "Completed job runs.", "runs"),
+            ("job_failures_total", "counter", "Job runs that raised.", "failures"),
+            ("job_run_seconds_total", "counter", "Time spent running jobs.", "seconds"),
+            ("job_items_total", "counter", "Items refreshed by jobs.", "items"),
+            ("job_last_run_seconds", "gauge", "Duration of the last run.", "last_seconds"),
+            ("job_last_success_timestamp_seconds", "gauge",
+             "Unix time of the last successful run.", "last_success"),
+        ]
+        stats = self.snapshot()
+        lines = []
+        for metric, kind, help_text, key in series:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for name, s in sorted(stats.items()):
+                lines.append(f'{metric}{{job="{name}"}} {s[key]:g}')
+        return "\n".join(lines) + "\n"
+
+
+job_metrics = JobMetrics()
+
+
+# ===== Scheduler =====
+def run_job(job: Job) -> bool:
+    """Run `job` if this process gets its lease. Returns whether it ran."""
+    db = SessionLocal()
+    try:
+        started_at = datetime.utcnow()
+        if not acquire_lease(db, job, started_at):
+            return False
+        start = time.perf_counter()
+        items, ok = 0, True
+        try:
+            items = job.func(db)
+        except Exception:
+            ok = False
+            db.rollback()
+            logger.exception("Job %s failed", job.name)
+        finally:
+            elapsed = time.perf_counter() - start
+            job_metrics.record(job.name, elapsed, items, ok)
+            release_lease(db, job, started_at)
+        logger.info("Job %s: %d items in %.1fs", job.name, items, elapsed)
+        return True
+    finally:
+        db.close()
+
+
+class Scheduler:
+    def __init__(self, jobs: List[Job]):
+        self.jobs = [j for j in jobs if j.interval_s > 0]
+        self._next_check: Dict[str, float] = {}
+        self._task = None
+
+    async def run_pending(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            if now < self._next_check.get(job.name, 0.0):
+                continue
+            # Jobs are sync (SQLAlchemy, sklearn, CBC): keep them off the event loop.
+            ran = await asyncio.to_thread(run_job, job)
+            # Not ours this time: check again soon in case the owner dies.
+            self._next_check[job.name] = now + (job.interval_s if ran else min(job.interval_s, 60))
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_pending()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            await asyncio.sleep(TICK_S)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scheduled background jobs.")
+    parser.add_argument("--once", action="store_true", help="run due jobs once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    from .database import init_db
+
+    init_db()
+    scheduler = Scheduler(default_jobs())
+
+    async def run():
+        if args.once:
+            await scheduler.run_pending()
+            return
+        scheduler.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
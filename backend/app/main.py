@@ -1,12 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .config import settings
-from .database import Base, engine
+from .database import engine, init_db
 from .routers import city_twin, energy, education, optimization,analytics
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.AUTO_CREATE_TABLES:
+        init_db()
+    if settings.WARMUP_ON_STARTUP:
+        from .startup import warm_up
+
+        await asyncio.to_thread(warm_up)
+
+    if settings.COMPUTE_POOL_SIZE > 0:
+        from .workers import compute_pool
+
+        await asyncio.to_thread(compute_pool.start)
+
+    scheduler = None
+    if settings.JOBS_ENABLED:
+        from .jobs import Scheduler, default_jobs
+
+        scheduler = Scheduler(default_jobs())
+        scheduler.start()
+    yield
+    if scheduler is not None:
+        await scheduler.stop()
+    if settings.COMPUTE_POOL_SIZE > 0:
+        compute_pool.shutdown()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,8 +44,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+if settings.PROFILING_ENABLED:
+    from .profiling import ProfilingMiddleware, instrument_engine
+
+    instrument_engine(engine)
+    app.add_middleware(
+        ProfilingMiddleware, sample_rate=settings.PROFILING_SAMPLE_RATE
+    )
+
+if settings.PROFILING_ENABLED or settings.JOBS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        body = ""
+        if settings.PROFILING_ENABLED:
+            from .profiling import metrics
+
+            body += metrics.render()
+        if settings.JOBS_ENABLED:
+            from .jobs import job_metrics
+
+            body += job_metrics.render()
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+if settings.QUERY_DIAGNOSTICS_ENABLED:
+    from .query_diagnostics import QueryDiagnosticsMiddleware
+
+    app.add_middleware(
+        QueryDiagnosticsMiddleware, threshold=settings.N_PLUS_ONE_THRESHOLD
+    )
+
+if settings.COMPRESSION_ENABLED:
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:  # optional dependency
+        from starlette.middleware.gzip import GZipMiddleware
+
+        app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+    else:
+        # Falls back to gzip for clients that don't accept br.
+        app.add_middleware(
+            BrotliMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            gzip_fallback=True,
+        )
+
 app.include_router(city_twin.router, prefix=settings.API_V1_STR)
 app.include_router(energy.router, prefix=settings.API_V1_STR)
 app.include_router(education.router, prefix=settings.API_V1_STR)
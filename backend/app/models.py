@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, Float, Boolean,
-    ForeignKey, DateTime
+    ForeignKey, DateTime, JSON, Index, LargeBinary
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -22,10 +22,13 @@ class Building(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    type = Column(String, nullable=False)  # school, college, office, residential
+    type = Column(String, nullable=False, index=True)  # school, college, office, residential
     latitude = Column(Float)
     longitude = Column(Float)
-    city_zone = Column(String)
+    city_zone = Column(String, index=True)
+    # Set on insert and on every ORM update; the spatial index keys its
+    # freshness on it (see app.services.spatial)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     sensors = relationship("Sensor", back_populates="building")
     institutions = relationship("Institution", back_populates="building")
@@ -46,6 +49,11 @@ class Sensor(Base):
 
 class EnergyReading(Base):
     __tablename__ = "energy_readings"
+    # One reading per sensor and timestamp; ingestion upserts on this.
+    # Existing databases get it from `python -m app.services.ingest dedupe`.
+    __table_args__ = (
+        Index("uq_energy_readings_sensor_ts", "sensor_id", "timestamp", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sensor_id = Column(Integer, ForeignKey("sensors.id", ondelete="CASCADE"))
@@ -111,3 +119,109 @@ class EducationForecast(Base):
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     risk_level = Column(Float)
     notes = Column(String)
+
+
+class AnalyticsSnapshot(Base):
+    """Precomputed aggregate (e.g. the dashboard summary) written by background jobs."""
+    __tablename__ = "analytics_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    payload = Column(JSON, nullable=False)
+
+
+class JobLease(Base):
+    """Cross-worker lock and last-run bookkeeping for scheduled jobs."""
+    __tablename__ = "job_leases"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String)
+    expires_at = Column(DateTime)
+    last_run_at = Column(DateTime)
+
+
+class SensorHealth(Base):
+    """Per-sensor ingest statistics, updated incrementally as readings arrive."""
+    __tablename__ = "sensor_health"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id", ondelete="CASCADE"), primary_key=True)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime, index=True)
+    last_value = Column(Float)
+    reading_count = Column(Integer, default=0)
+    cadence_s = Column(Float)  # EWMA of the interval between readings
+    gap_count = Column(Integer, default=0)
+    last_gap_at = Column(DateTime)
+    repeat_count = Column(Integer, default=0)  # consecutive identical values
+    is_stuck = Column(Boolean, default=False, index=True)
+
+
+class BuildingDataVersion(Base):
+    """When a building's readings last changed; bumped by ingest in the same transaction."""
+    __tablename__ = "building_data_versions"
+
+    building_id = Column(Integer, ForeignKey("buildings.id", ondelete="CASCADE"), primary_key=True)
+    updated_at = Column(DateTime, nullable=False, index=True)
+    writes = Column(Integer, nullable=False, default=0)  # batches that changed readings
+
+
+class SensorBaseline(Base):
+    """Per-sensor EWMA of reading values by hour of day (UTC), for anomaly detection."""
+    __tablename__ = "sensor_baselines"
+
+    sensor_id = Column(Integer, ForeignKey("sensors.id", ondelete="CASCADE"), primary_key=True)
+    # float64 (mean, variance, count) x 24 hours, packed; read on every ingest
+    state = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Anomaly(Base):
+    """A reading flagged by the ingest-time detector; `id` orders the event feed."""
+    __tablename__ = "anomalies"
+    __table_args__ = (Index("ix_anomalies_sensor_ts", "sensor_id", "timestamp"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    sensor_id = Column(Integer, ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False, index=True)
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)  # baseline mean for that hour
+    zscore = Column(Float, nullable=False)
+    kind = Column(String, nullable=False)  # "spike" or "drop"
+    detected_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GridSignalVersion(Base):
+    """One tariff or carbon-intensity import; its id is the version of the rows it added."""
+    __tablename__ = "grid_signal_versions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "tariff" or "carbon"
+    source = Column(String)
+    imported_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TariffRate(Base):
+    """Electricity price step: applies in [valid_from, valid_until) unless a newer version covers it."""
+    __tablename__ = "tariff_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    zone = Column(String, nullable=False, index=True)
+    valid_from = Column(DateTime, nullable=False, index=True)
+    valid_until = Column(DateTime, nullable=False, index=True)
+    price_per_kwh = Column(Float, nullable=False)
+    version = Column(Integer, nullable=False, default=1)  # later imports win
+    source = Column(String)
+
+
+class CarbonIntensity(Base):
+    """Grid carbon intensity step (kg CO2 per kWh), same layout as TariffRate."""
+    __tablename__ = "carbon_intensities"
+
+    id = Column(Integer, primary_key=True, index=True)
+    zone = Column(String, nullable=False, index=True)
+    valid_from = Column(DateTime, nullable=False, index=True)
+    valid_until = Column(DateTime, nullable=False, index=True)
+    kg_co2_per_kwh = Column(Float, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+    source = Column(String)
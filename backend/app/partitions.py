@@ -0,0 +1,474 @@
+"""
+Monthly time partitioning of `energy_readings` (READINGS_PARTITIONING).
+
+Postgres: `energy_readings` is a declaratively partitioned table
+(PARTITION BY RANGE (timestamp)) with one partition per month, named
+energy_readings_YYYY_MM. Queries keep using the parent table; the planner
+prunes partitions outside the `timestamp` filter.
+
+SQLite: readings are stored in per-month shard tables with the same name
+pattern in the same database file. `readings()` returns a UNION ALL of the
+base table and only the shards that cover the requested window, with the
+time (and sensor) filter pushed into every branch, so the forecaster,
+intensity map and dashboard never touch other months.
+
+On both, writes go through `table_for` (shards / partitions are created on
+demand) and retention is `drop_before`: dropping a whole month is a
+metadata operation instead of a huge DELETE plus index churn.
+
+Existing data is moved into partitions with
+
+    python -m app.partitions migrate
+
+which on SQLite empties the base table in batches, and on Postgres
+rebuilds `energy_readings` as a partitioned table (the old table is kept as
+energy_readings_legacy).
+
+On SQLite, shard rows take their ids from one counter (`reading_id_sequence`,
+seeded past every existing id), so ids stay unique across the base table
+and all shards, and are not reused after a month is dropped. Until
+`migrate` has emptied the base table, ingest keeps updating keys that are
+still stored there (see `base_pending`) instead of adding a second row to a
+shard.
+"""
+import argparse
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import (
+    Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, Table,
+    func, select, text, union_all,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger("app.partitions")
+
+BASE = "energy_readings"
+_NAME = re.compile(r"^energy_readings_(\d{4})_(\d{2})$")
+# Rows moved per transaction by `migrate`
+MIGRATE_BATCH = 50_000
+
+_shard_metadata = MetaData()
+# Shard FKs point at sensors.id, so the table must be known to the metadata.
+models.Sensor.__table__.to_metadata(_shard_metadata)
+_shard_tables = {}
+_known: Set[datetime] = set()
+_known_lock = threading.Lock()
+# Once the base table is seen empty under partitioning nothing writes to it again
+_base_empty = False
+
+ID_SEQUENCE = "reading_id_sequence"
+_id_sequence = Table(
+    ID_SEQUENCE,
+    _shard_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("last_id", Integer, nullable=False),
+)
+
+
+def enabled(db) -> bool:
+    return settings.READINGS_PARTITIONING and db.get_bind().dialect.name in ("sqlite", "postgresql")
+
+
+def _is_postgres(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+# ----- months
+def month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months(start: datetime, end: datetime) -> List[datetime]:
+    """Months overlapping [start, end]."""
+    out, month = [], month_start(start)
+    while month <= end:
+        out.append(month)
+        month = next_month(month)
+    return out
+
+
+def partition_name(month: datetime) -> str:
+    return f"{BASE}_{month.year:04d}_{month.month:02d}"
+
+
+def _parse(name: str) -> Optional[datetime]:
+    match = _NAME.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+# ----- catalog
+def existing(db, refresh: bool = False) -> List[datetime]:
+    """Months that currently have a shard / partition, oldest first."""
+    if refresh or not _known:
+        if _is_postgres(db):
+            rows = db.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :base"
+            ), {"base": BASE})
+        else:
+            rows = db.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :pattern"
+            ), {"pattern": BASE + "_%"})
+        found = {m for m in (_parse(name) for (name,) in rows) if m is not None}
+        with _known_lock:
+            _known.clear()
+            _known.update(found)
+    return sorted(_known)
+
+
+def _covering(db, start: Optional[datetime], end: Optional[datetime]) -> List[datetime]:
+    wanted = None
+    if start is not None:
+        wanted = set(months(start, end or datetime.utcnow()))
+        # Another process may have created a month since we last looked.
+        if not wanted <= _known:
+            existing(db, refresh=True)
+    return [m for m in existing(db) if wanted is None or m in wanted]
+
+
+def shard_table(month: datetime) -> Table:
+    """SQLite shard for `month`: same columns and indexes as energy_readings."""
+    name = partition_name(month)
+    table = _shard_tables.get(name)
+    if table is None:
+        table = Table(
+            name,
+            _shard_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("sensor_id", Integer, ForeignKey("sensors.id", ondelete="CASCADE")),
+            Column("timestamp", DateTime, nullable=False),
+            Column("value", Float, nullable=False),
+            Index(f"uq_{name}_sensor_ts", "sensor_id", "timestamp", unique=True),
+            Index(f"ix_{name}_timestamp", "timestamp"),
+        )
+        _shard_tables[name] = table
+    return table
+
+
+def ensure(db, month_list: Iterable[datetime]):
+    """Create missing shards / partitions for the given months."""
+    missing = [m for m in month_list if m not in _known]
+    if not missing:
+        return
+    existing(db, refresh=True)
+    for month in missing:
+        if month in _known:
+            continue
+        if _is_postgres(db):
+            db.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {BASE} '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+            ))
+        else:
+            # IF NOT EXISTS: another worker may create the same month concurrently.
+            table = shard_table(month)
+            db.execute(CreateTable(table, if_not_exists=True))
+            for index in table.indexes:
+                db.execute(CreateIndex(index, if_not_exists=True))
+        with _known_lock:
+            _known.add(month)
+    db.commit()
+
+
+# ----- query layer
+def readings(
+    db,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sensor_ids: Optional[List[int]] = None,
+):
+    """
+    Selectable with id, sensor_id, timestamp, value for readings in
+    [start, end). Callers still apply their own filters; on SQLite shards
+    the window (and sensor list) is also pushed into every branch.
+    """
+    base = models.EnergyReading.__table__
+    if not enabled(db) or _is_postgres(db):
+        return base
+
+    branches = []
+    for table in [base] + [shard_table(m) for m in _covering(db, start, end)]:
+        stmt = select(table.c.id, table.c.sensor_id, table.c.timestamp, table.c.value)
+        if start is not None:
+            stmt = stmt.where(table.c.timestamp >= start)
+        if end is not None:
+            stmt = stmt.where(table.c.timestamp < end)
+        if sensor_ids is not None:
+            stmt = stmt.where(table.c.sensor_id.in_(sensor_ids))
+        branches.append(stmt)
+    if len(branches) == 1:
+        return base
+    return union_all(*branches).subquery(BASE)
+
+
+def latest_timestamp(db, sensor_ids: List[int]) -> Optional[datetime]:
+    """Newest reading time of the sensors, scanning shards newest first."""
+    base = models.EnergyReading.__table__
+
+    def newest(table):
+        return db.execute(
+            select(func.max(table.c.timestamp)).where(table.c.sensor_id.in_(sensor_ids))
+        ).scalar()
+
+    latest = newest(base)
+    if enabled(db) and not _is_postgres(db):
+        for month in reversed(existing(db)):
+            found = newest(shard_table(month))
+            if found is not None:
+                latest = max(latest or found, found)
+                break
+    return latest
+
+
+def base_pending(db) -> bool:
+    """SQLite shards: does the base table still hold readings not yet migrated?"""
+    global _base_empty
+    if _base_empty or not enabled(db) or _is_postgres(db):
+        return False
+    base = models.EnergyReading.__table__
+    if db.execute(select(base.c.id).limit(1)).first() is not None:
+        return True
+    _base_empty = True
+    return False
+
+
+def next_ids(db, count: int) -> int:
+    """First of `count` consecutive shard row ids (SQLite); the caller commits."""
+    db.execute(CreateTable(_id_sequence, if_not_exists=True))
+    if db.execute(select(_id_sequence.c.last_id)).first() is None:
+        # Start past every id already stored, whether in the base or a shard
+        tables = [models.EnergyReading.__table__] + [shard_table(m) for m in existing(db, refresh=True)]
+        highest = max(db.execute(select(func.max(t.c.id))).scalar() or 0 for t in tables)
+        db.execute(text(
+            f"INSERT OR IGNORE INTO {ID_SEQUENCE} (id, last_id) VALUES (1, :highest)"
+        ), {"highest": highest})
+    last = db.execute(
+        _id_sequence.update().values(last_id=_id_sequence.c.last_id + count)
+        .returning(_id_sequence.c.last_id)
+    ).scalar_one()
+    return last - count + 1
+
+
+def assign_ids(db, table: Table, rows: List[dict]):
+    """Give rows bound for a SQLite shard ids from the shared sequence."""
+    if not rows or table.name == BASE or _is_postgres(db):
+        return
+    first = next_ids(db, len(rows))
+    for offset, row in enumerate(rows):
+        row["id"] = first + offset
+
+
+def table_for(db, month: datetime) -> Table:
+    """Table new readings of `month` are written to (created if missing)."""
+    if not enabled(db):
+        return models.EnergyReading.__table__
+    ensure(db, [month])
+    if _is_postgres(db):
+        return models.EnergyReading.__table__
+    return shard_table(month)
+
+
+# ----- retention
+def drop_before(db, cutoff: datetime) -> List[str]:
+    """Drop every month that ends on or before `cutoff`. Returns dropped names."""
+    dropped = []
+    for month in existing(db, refresh=True):
+        if next_month(month) > cutoff:
+            continue
+        name = partition_name(month)
+        if _is_postgres(db):
+            db.execute(text(f"ALTER TABLE {BASE} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        with _known_lock:
+            _known.discard(month)
+        table = _shard_tables.pop(name, None)
+        if table is not None:
+            # Late readings for this month may create it again
+            _shard_metadata.remove(table)
+        dropped.append(name)
+    db.commit()
+    if dropped:
+        logger.info("Dropped reading partitions %s", ", ".join(dropped))
+    return dropped
+
+
+def retention_cutoff(now: datetime) -> Optional[datetime]:
+    keep = settings.READINGS_RETENTION_MONTHS
+    if keep <= 0:
+        return None
+    month = month_start(now)
+    for _ in range(keep):
+        month = datetime(month.year - (month.month == 1), (month.month - 2) % 12 + 1, 1)
+    return month
+
+
+def maintain(db: Session) -> int:
+    """Job body: pre-create upcoming months and apply retention."""
+    if not enabled(db):
+        return 0
+    now = datetime.utcnow()
+    upcoming = [month_start(now)]
+    for _ in range(settings.READINGS_PARTITIONS_AHEAD):
+        upcoming.append(next_month(upcoming[-1]))
+    ensure(db, upcoming)
+    cutoff = retention_cutoff(now)
+    return len(drop_before(db, cutoff)) if cutoff else 0
+
+
+# ----- setup / migration
+def create_partitioned_parent(conn):
+    """Postgres DDL for a partitioned energy_readings (the table must not exist)."""
+    conn.execute(text(f"""
+        CREATE TABLE {BASE} (
+            id SERIAL,
+            sensor_id INTEGER REFERENCES sensors (id) ON DELETE CASCADE,
+            "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            value DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """))
+    conn.execute(text(
+        f'CREATE UNIQUE INDEX uq_{BASE}_sensor_ts ON {BASE} (sensor_id, "timestamp")'
+    ))
+    conn.execute(text(f'CREATE INDEX ix_{BASE}_timestamp ON {BASE} ("timestamp")'))
+
+
+def _pg_is_partitioned(db) -> Optional[bool]:
+    kind = db.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :base"), {"base": BASE}
+    ).scalar()
+    return None if kind is None else kind == "p"
+
+
+def _migrate_sqlite(db: Session) -> int:
+    base = models.EnergyReading.__table__
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    moved = 0
+    while True:
+        rows = db.execute(
+            select(base.c.id, base.c.sensor_id, base.c.timestamp, base.c.value)
+            .order_by(base.c.id)
+            .limit(MIGRATE_BATCH)
+        ).all()
+        if not rows:
+            return moved
+        by_month = {}
+        for row in rows:
+            # Keep the ids: next_ids never hands out one at or below them
+            by_month.setdefault(month_start(row.timestamp), []).append(
+                {"id": row.id, "sensor_id": row.sensor_id, "timestamp": row.timestamp, "value": row.value}
+            )
+        ensure(db, by_month)
+        for month, batch in by_month.items():
+            table = shard_table(month)
+            stmt = sqlite_insert(table)
+            # Later rows (higher id) win, as in ingest.
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[table.c.sensor_id, table.c.timestamp],
+                    set_={"value": stmt.excluded.value},
+                ),
+                batch,
+            )
+        db.execute(base.delete().where(base.c.id <= rows[-1].id))
+        db.commit()
+        moved += len(rows)
+        logger.info("migrate: %s readings moved", moved)
+
+
+def _migrate_postgres(db: Session) -> int:
+    partitioned = _pg_is_partitioned(db)
+    if partitioned:
+        return 0
+    legacy = f"{BASE}_legacy"
+    if partitioned is not None:
+        sequence = db.execute(
+            text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": BASE}
+        ).scalar()
+        db.execute(text(f"ALTER TABLE {BASE} RENAME TO {legacy}"))
+        if sequence:
+            db.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+        for (index,) in db.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :t"
+        ), {"t": legacy}).all():
+            db.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+    create_partitioned_parent(db)
+    db.commit()
+    if partitioned is None:
+        return 0
+
+    bounds = db.execute(text(f'SELECT min("timestamp"), max("timestamp") FROM {legacy}')).one()
+    moved = 0
+    if bounds[0] is not None:
+        for month in months(bounds[0], bounds[1]):
+            ensure(db, [month])
+            result = db.execute(text(
+                f'INSERT INTO {BASE} (id, sensor_id, "timestamp", value) '
+                f'SELECT id, sensor_id, "timestamp", value FROM {legacy} '
+                f'WHERE "timestamp" >= :lo AND "timestamp" < :hi '
+                f"ON CONFLICT (sensor_id, \"timestamp\") DO UPDATE SET value = EXCLUDED.value"
+            ), {"lo": month, "hi": next_month(month)})
+            db.commit()
+            moved += result.rowcount
+            logger.info("migrate: %s moved (%s readings so far)", partition_name(month), moved)
+    db.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{BASE}', 'id'), "
+        f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {BASE}), false)"
+    ))
+    db.commit()
+    return moved
+
+
+def migrate(db: Session) -> int:
+    """Move readings from the unpartitioned table into monthly partitions."""
+    if not enabled(db):
+        raise RuntimeError("Set READINGS_PARTITIONING=true (SQLite or Postgres) first.")
+    if _is_postgres(db):
+        return _migrate_postgres(db)
+    return _migrate_sqlite(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage energy_readings partitions.")
+    parser.add_argument("command", choices=["list", "migrate", "maintain", "drop-before"])
+    parser.add_argument("--before", help="YYYY-MM: drop months ending on or before this month's start")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    from .database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "list":
+            for month in existing(db, refresh=True):
+                print(partition_name(month))
+        elif args.command == "migrate":
+            print(f"Moved {migrate(db):,} readings into monthly partitions")
+        elif args.command == "maintain":
+            print(f"Dropped {maintain(db)} expired partitions")
+        else:
+            if not args.before:
+                parser.error("drop-before needs --before YYYY-MM")
+            cutoff = datetime.strptime(args.before, "%Y-%m")
+            print("Dropped:", ", ".join(drop_before(db, cutoff)) or "nothing")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Opt-in per-request profiling.
+
+When enabled (PROFILING_ENABLED=true) every request gets a timings collector
+in a context variable. SQL time/statement count is fed by SQLAlchemy engine
+events, and services mark their expensive sections with `timed(...)`
+("model_train", "model_predict", "solver"). The breakdown is returned in a
+`Server-Timing` header and aggregated for the Prometheus `/metrics` endpoint.
+A fraction of requests (PROFILING_SAMPLE_RATE) is additionally run under
+cProfile or pyinstrument and the trace written to PROFILING_OUTPUT_DIR.
+Only work that runs in its own thread is traced with cProfile: sync
+endpoints, and the threadpool part of async ones (`profiled_call`, used by
+`run_heavy`). A cProfile trace of the event loop would also record every
+other request in flight, so async endpoints themselves are only traced with
+pyinstrument, whose async mode follows just the request's own task.
+
+With profiling disabled, `timed` and `ProfiledRoute` are a context-variable
+lookup and nothing else.
+"""
+import cProfile
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Request duration histogram buckets (seconds)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+    """Accumulated time and call count per phase for one request."""
+
+    def __init__(self, sampled: bool = False):
+        self.sampled = sampled
+        self.phases: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float, count: int = 1):
+        with self._lock:
+            entry = self.phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Attribute the wrapped block's wall time to `phase` of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+# ===== SQLAlchemy instrumentation =====
+def instrument_engine(engine):
+    """Feed statement count and DB time of `engine` into the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profiling_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        timings = _current.get()
+        stack = conn.info.get("profiling_start")
+        if timings is None or not stack:
+            return
+        timings.add("db", time.perf_counter() - stack.pop())
+
+
+# ===== Metrics registry =====
+class MetricsRegistry:
+    """Minimal in-process Prometheus registry (no client library needed)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: Dict[tuple, list] = {}  # (method, handler, status) -> [count, sum]
+        self._buckets: Dict[tuple, list] = {}  # (method, handler) -> bucket counts
+        self._phases: Dict[tuple, list] = {}  # (handler, phase) -> [seconds, calls]
+
+    def observe(self, method: str, handler: str, status: int, seconds: float, timings: RequestTimings):
+        with self._lock:
+            req = self._requests.setdefault((method, handler, str(status)), [0, 0.0])
+            req[0] += 1
+            req[1] += seconds
+
+            buckets = self._buckets.setdefault(
+                (method, handler), [0] * (len(DURATION_BUCKETS) + 1)
+            )
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+
+            for phase, (phase_seconds, calls) in timings.phases.items():
+                entry = self._phases.setdefault((handler, phase), [0.0, 0])
+                entry[0] += phase_seconds
+                entry[1] += calls
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Completed HTTP requests.",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            for (method, handler, status), (count, _) in sorted(self._requests.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",handler="{handler}",status="{status}"}} {count}'
+                )
+
+            lines += [
+                "# HELP http_request_duration_seconds Request wall time.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            sums: Dict[tuple, float] = {}
+            for (method, handler, _), (_, total) in self._requests.items():
+                sums[(method, handler)] = sums.get((method, handler), 0.0) + total
+            for (method, handler), buckets in sorted(self._buckets.items()):
+                labels = f'method="{method}",handler="{handler}"'
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(
+                        f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {buckets[-1]}'
+                )
+                lines.append(
+                    f"http_request_duration_seconds_sum{{{labels}}} {sums[(method, handler)]:.6f}"
+                )
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {buckets[-1]}")
+
+            lines += [
+                "# HELP request_phase_seconds_total Time spent per phase (db, model_train, model_predict, solver).",
+                "# TYPE request_phase_seconds_total counter",
+            ]
+            for (handler, phase), (seconds, _) in sorted(self._phases.items()):
+                lines.append(
+                    f'request_phase_seconds_total{{handler="{handler}",phase="{phase}"}} {seconds:.6f}'
+                )
+            lines += [
+                "# HELP request_phase_calls_total Calls per phase (for db: SQL statements).",
+                "# TYPE request_phase_calls_total counter",
+            ]
+            for (handler, phase), (_, calls) in sorted(self._phases.items()):
+                lines.append(
+                    f'request_phase_calls_total{{handler="{handler}",phase="{phase}"}} {calls}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# ===== Sampled full-trace profiling =====
+def _write_profile(profiler, name: str, output_dir: str, kind: str):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    if kind == "pyinstrument":
+        path = os.path.join(output_dir, f"{stamp}-{name}-{os.getpid()}.html")
+        with open(path, "w") as fh:
+            fh.write(profiler.output_html())
+    else:
+        path = os.path.join(output_dir, f"{stamp}-{name}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+    return path
+
+
+@contextmanager
+def _profile(name: str, async_mode: bool = False):
+    from .config import settings
+
+    if settings.PROFILING_PROFILER == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler(async_mode="enabled" if async_mode else "disabled")
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            _write_profile(profiler, name, settings.PROFILING_OUTPUT_DIR, "pyinstrument")
+    elif async_mode:
+        yield  # cProfile cannot tell this task apart from the rest of the loop
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _write_profile(profiler, name, settings.PROFILING_OUTPUT_DIR, "cprofile")
+
+
+def profiled_call(fn, name: Optional[str] = None):
+    """
+    `fn` wrapped to run under a profiler when the current request is
+    sampled. Call the result in the thread that does the work (sync
+    endpoints, threadpool jobs); the request context is copied there.
+    """
+    name = name or getattr(fn, "__name__", "call")
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        timings = _current.get()
+        if timings is None or not timings.sampled:
+            return fn(*args, **kwargs)
+        with _profile(name):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _profiled_endpoint(endpoint):
+    """
+    Run the endpoint itself under a profiler for sampled requests. Wrapping the
+    endpoint (rather than the middleware) puts the profiler in the thread that
+    actually executes sync endpoints.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None or not timings.sampled:
+                return await endpoint(*args, **kwargs)
+            with _profile(endpoint.__name__, async_mode=True):
+                return await endpoint(*args, **kwargs)
+
+        return async_wrapper
+
+    return profiled_call(endpoint)
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be traced for sampled requests."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _profiled_endpoint(endpoint), **kwargs)
+
+
+# ===== ASGI middleware =====
+def _server_timing(timings: RequestTimings, total: float) -> str:
+    parts = []
+    for phase, (seconds, calls) in sorted(timings.phases.items()):
+        desc = f'{calls} queries' if phase == "db" else f"{calls} calls"
+        parts.append(f'{phase};dur={seconds * 1000.0:.1f};desc="{desc}"')
+    parts.append(f"total;dur={total * 1000.0:.1f}")
+    return ", ".join(parts)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, sample_rate: float = 0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(sampled=random.random() < self.sample_rate)
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        _server_timing(timings, time.perf_counter() - start).encode(),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", None) or "unmatched"
+            metrics.observe(
+                scope["method"], handler, status, time.perf_counter() - start, timings
+            )
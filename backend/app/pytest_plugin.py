@@ -0,0 +1,82 @@
+"""
+pytest helpers for query budgets.
+
+Enable with `pytest_plugins = ["app.pytest_plugin"]` in a conftest.py, then:
+
+    def test_intensity(client, query_budget):
+        with query_budget(2):
+            client.get("/api/v1/energy/intensity")
+
+    @pytest.mark.query_budget(5, max_repeats=3)
+    def test_dashboard(client):
+        client.get("/api/v1/analytics/dashboard-summary")
+
+A test fails when the block (or the whole marked test) executes more
+statements than declared, or repeats a single statement shape more than
+`max_repeats` times.
+"""
+from contextlib import contextmanager
+from typing import Optional
+
+import pytest
+
+from .database import engine, read_engine
+from .query_diagnostics import install_query_tracking, track_queries
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_queries, max_repeats=None): fail the test if it "
+        "executes more SQL statements than declared",
+    )
+
+
+def _check(scope, max_queries: int, max_repeats: Optional[int]):
+    problems = []
+    if scope.count > max_queries:
+        problems.append(f"{scope.count} statements executed, budget is {max_queries}")
+    if max_repeats is not None:
+        for shape, count in scope.repeated(max_repeats):
+            problems.append(f"{count}x (max {max_repeats}): {shape}")
+    if problems:
+        top = "\n".join(f"  {n}x {s}" for s, n in scope.shapes.most_common(10))
+        pytest.fail(
+            "Query budget exceeded:\n  "
+            + "\n  ".join(problems)
+            + f"\nMost frequent statements:\n{top}",
+            pytrace=False,
+        )
+
+
+def _install():
+    # Endpoints on get_read_db run on read_engine when it is a separate one.
+    for bind in {engine, read_engine}:
+        install_query_tracking(bind)
+
+
+@pytest.fixture
+def query_budget():
+    _install()
+
+    @contextmanager
+    def budget(max_queries: int, max_repeats: Optional[int] = None):
+        with track_queries() as scope:
+            yield scope
+        _check(scope, max_queries, max_repeats)
+
+    return budget
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+    _install()
+    max_queries = marker.args[0] if marker.args else marker.kwargs["max_queries"]
+    max_repeats = marker.kwargs.get("max_repeats")
+    with track_queries(item.nodeid) as scope:
+        result = yield
+    _check(scope, max_queries, max_repeats)
+    return result
@@ -0,0 +1,168 @@
+"""
+Diagnostic mode for the SQLAlchemy engine.
+
+- Slow-query log: statements slower than SLOW_QUERY_MS are logged together
+  with their EXPLAIN plan.
+- N+1 detector: statements are reduced to a "shape" (literals and IN-lists
+  collapsed) and counted per scope; a request that runs the same shape more
+  than N_PLUS_ONE_THRESHOLD times is logged as a likely N+1.
+
+Scopes are opened per request by `QueryDiagnosticsMiddleware`, or explicitly
+with `track_queries()` (which is what the `query_budget` pytest fixture in
+`app.pytest_plugin` uses).
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger("app.query_diagnostics")
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))+\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeated executions compare equal."""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryScope:
+    """Statements executed while a scope is active."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.shapes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str):
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes executed more than `threshold` times, most frequent first."""
+        return [(s, n) for s, n in self.shapes.most_common() if n > threshold]
+
+
+_scope: ContextVar[Optional[QueryScope]] = ContextVar("query_scope", default=None)
+
+
+@contextmanager
+def track_queries(label: str = ""):
+    scope = QueryScope(label)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def install_query_tracking(engine):
+    """Count statements into the active `QueryScope`. Safe to call repeatedly."""
+    if engine.__dict__.get("_query_tracking_installed"):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("diagnostics_explaining"):
+            return
+        scope = _scope.get()
+        if scope is not None:
+            scope.record(statement)
+
+    engine.__dict__["_query_tracking_installed"] = True
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    if conn.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return "(EXPLAIN not supported for this dialect)"
+
+    conn.info["diagnostics_explaining"] = True
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as exc:  # the plan is best-effort diagnostics only
+        return f"(EXPLAIN failed: {exc})"
+    finally:
+        conn.info["diagnostics_explaining"] = False
+
+    if conn.dialect.name == "sqlite":
+        return "\n".join(f"  {row[-1]}" for row in rows)
+    return "\n".join(f"  {row[0]}" for row in rows)
+
+
+def install_slow_query_log(engine, slow_ms: float):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get("diagnostics_explaining"):
+            conn.info.setdefault("diagnostics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("diagnostics_explaining"):
+            return
+        stack = conn.info.get("diagnostics_start")
+        if not stack:
+            return
+        elapsed_ms = (time.perf_counter() - stack.pop()) * 1000.0
+        if elapsed_ms < slow_ms:
+            return
+        plan = ""
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            plan = "\n" + _explain(conn, statement, parameters)
+        logger.warning(
+            "Slow query (%.1f ms): %s | params=%r%s",
+            elapsed_ms,
+            _WHITESPACE.sub(" ", statement).strip(),
+            parameters,
+            plan,
+        )
+
+
+def install_query_diagnostics(engine, slow_ms: float):
+    install_query_tracking(engine)
+    install_slow_query_log(engine, slow_ms)
+
+
+class QueryDiagnosticsMiddleware:
+    """Flags requests that repeat one statement shape more than `threshold` times."""
+
+    def __init__(self, app, threshold: int = 10):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope['method']} {scope['path']}"
+        with track_queries(label) as queries:
+            await self.app(scope, receive, send)
+
+        for shape, count in queries.repeated(self.threshold):
+            logger.warning(
+                "Possible N+1 in %s: %d executions of: %s", label, count, shape
+            )
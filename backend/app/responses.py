@@ -0,0 +1,120 @@
+"""
+Fast response path for large payloads.
+
+Endpoints that already hold plain, trusted data (dicts/lists built straight
+from SQL rows or our own computations) can hand it to `fast_json_response`
+when FAST_JSON_RESPONSES is on. That skips the `response_model` round-trip
+(model construction, validation, `jsonable_encoder`) and encodes with orjson,
+which handles datetimes, enums and NumPy scalars natively.
+
+Time-series endpoints can also answer in a columnar layout (see below).
+"""
+import json
+from typing import Dict, List, Optional
+
+from fastapi.responses import ORJSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+from .config import settings
+
+
+def fast_json_enabled() -> bool:
+    return settings.FAST_JSON_RESPONSES and orjson is not None
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+def fast_json_response(content, **kwargs) -> FastJSONResponse:
+    return FastJSONResponse(content, **kwargs)
+
+
+# ===== Columnar time-series encoding =====
+# Time-series endpoints return one object per hour, repeating every key.
+# Clients that send one of these media types in Accept get the same data as
+# a start timestamp + step + one array per value field instead. Every
+# response of such an endpoint carries `Vary: Accept` (see `vary_on_accept`),
+# so shared caches keep the encodings apart.
+VARY_ACCEPT = {"Vary": "Accept"}
+COLUMNAR_JSON = "application/vnd.smarted.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.smarted.columnar+msgpack"
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+def vary_on_accept(response: Response):
+    """
+    Route dependency for content-negotiated endpoints: adds `Vary: Accept`
+    to responses built from the return value. Responses returned directly
+    pass `headers=VARY_ACCEPT` themselves.
+    """
+    response.headers["Vary"] = "Accept"
+
+
+def columnar_media_type(request) -> Optional[str]:
+    """The columnar media type the client asked for, if any."""
+    accept = request.headers.get("accept", "")
+    if COLUMNAR_MSGPACK in accept and msgpack is not None:
+        return COLUMNAR_MSGPACK
+    if COLUMNAR_JSON in accept:
+        return COLUMNAR_JSON
+    return None
+
+
+def to_columnar(rows: List[Dict], time_key: str, value_keys: List[str]) -> Dict:
+    """
+    {"start": t0, "step_seconds": s, "count": n, <value_key>: [...]}.
+    Irregular series additionally carry the full "timestamps" array.
+    """
+    if not rows:
+        return {"start": None, "step_seconds": None, "count": 0, **{k: [] for k in value_keys}}
+
+    times = [r[time_key] for r in rows]
+    step = (times[1] - times[0]).total_seconds() if len(times) > 1 else 0.0
+    out = {"start": times[0].isoformat(), "step_seconds": step, "count": len(rows)}
+    if any(
+        (times[i + 1] - times[i]).total_seconds() != step for i in range(len(times) - 1)
+    ):
+        out["timestamps"] = [t.isoformat() for t in times]
+    for key in value_keys:
+        out[key] = [r[key] for r in rows]
+    return out
+
+
+def columnar_response(media_type: str, content: Dict) -> Response:
+    if media_type == COLUMNAR_MSGPACK:
+        body = msgpack.packb(content, default=str, use_bin_type=True)
+    elif orjson is not None:
+        body = orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(content, default=str).encode()
+    return Response(content=body, media_type=media_type, headers=VARY_ACCEPT)
+
+
+# ===== Conditional requests =====
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request, etag: str) -> bool:
+    """
+    If-None-Match check: the header is a comma-separated list of entity tags
+    (or "*"), compared exactly with the weak comparison of RFC 9110.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    wanted = _opaque_tag(etag)
+    return any(tag.strip() == "*" or _opaque_tag(tag) == wanted for tag in header.split(","))
@@ -1,13 +1,38 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..schemas import DashboardSummaryOut
-from ..services.analytics import compute_dashboard_summary
+from ..config import settings
+from ..database import get_read_db
+from ..profiling import ProfiledRoute
+from ..responses import fast_json_enabled, fast_json_response
+from ..schemas import DashboardSummaryOut, PanelsRequest, PanelsResponse
+from ..services.analytics import (
+    DASHBOARD_SNAPSHOT,
+    compute_dashboard_summary,
+    latest_snapshot,
+)
+from ..services.panels import render_panels
 
-router = APIRouter(prefix="/analytics", tags=["analytics"])
+router = APIRouter(prefix="/analytics", tags=["analytics"], route_class=ProfiledRoute)
 
 
 @router.get("/dashboard-summary", response_model=DashboardSummaryOut)
-def get_dashboard_summary(db: Session = Depends(get_db)):
-    data = compute_dashboard_summary(db)
+def get_dashboard_summary(db: Session = Depends(get_read_db)):
+    data = None
+    if settings.DASHBOARD_MAX_AGE_S:
+        data = latest_snapshot(db, DASHBOARD_SNAPSHOT, settings.DASHBOARD_MAX_AGE_S)
+    if data is None:
+        data = compute_dashboard_summary(db)
     return DashboardSummaryOut(**data)
+
+
+@router.post("/panels", response_model=PanelsResponse)
+async def get_panels(request: Request, payload: PanelsRequest):
+    """
+    Several dashboard panels in one round trip. Shared inputs (buildings,
+    24h energy per building) are loaded once; panels run concurrently and
+    fail independently.
+    """
+    result = {"panels": await render_panels(payload.panels, request=request)}
+    if fast_json_enabled():
+        return fast_json_response(result)
+    return result
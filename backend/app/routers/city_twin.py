@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from typing import List, Optional
+from ..database import get_db, get_read_db
+from ..profiling import ProfiledRoute
+from ..responses import etag_matches
 from .. import models, schemas
+from ..services.simulation import simulate_city
+from ..services.spatial import DEFAULT_LIMIT, spatial_index
 
-router = APIRouter(prefix="/city", tags=["city-twin"])
+router = APIRouter(prefix="/city", tags=["city-twin"], route_class=ProfiledRoute)
 
 
 @router.post("/buildings", response_model=schemas.BuildingOut)
@@ -13,9 +20,130 @@ def create_building(building: schemas.BuildingCreate, db: Session = Depends(get_
     db.add(db_building)
     db.commit()
     db.refresh(db_building)
+    spatial_index.add(db_building)
     return db_building
 
 
-@router.get("/buildings", response_model=List[schemas.BuildingOut])
-def list_buildings(db: Session = Depends(get_db)):
-    return db.query(models.Building).all()
+BUILDING_FIELDS = ("id", "name", "type", "latitude", "longitude", "city_zone")
+MAX_PAGE_SIZE = 5000
+
+
+@router.get(
+    "/buildings",
+    response_model=List[schemas.BuildingFieldsOut],
+    response_model_exclude_unset=True,
+)
+def list_buildings(
+    request: Request,
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="Last id of the previous page"),
+    type: Optional[str] = None,
+    city_zone: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated subset of building fields; id is always included"
+    ),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Keyset-paginated listing, ordered by id. The next page's cursor is
+    returned in the X-Next-Cursor header (absent on the last page). With
+    `fields`, each item carries only id and the requested fields. Pages
+    carry a weak ETag; a matching If-None-Match gets 304 with no body.
+    """
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(selected) - set(BUILDING_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        selected = ["id"] + [f for f in BUILDING_FIELDS if f in selected and f != "id"]
+    else:
+        selected = list(BUILDING_FIELDS)
+
+    q = db.query(*(getattr(models.Building, f) for f in selected))
+    if cursor is not None:
+        q = q.filter(models.Building.id > cursor)
+    if type is not None:
+        q = q.filter(models.Building.type == type)
+    if city_zone is not None:
+        q = q.filter(models.Building.city_zone == city_zone)
+    # One extra row tells us whether another page exists.
+    rows = q.order_by(models.Building.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    body = JSONResponse(content=[dict(zip(selected, r)) for r in rows]).body
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if has_more:
+        headers["X-Next-Cursor"] = str(rows[-1][0])
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/buildings/within", response_model=List[schemas.BuildingLocationOut])
+def buildings_within(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
+    """Buildings inside a bounding box (map viewport), at most `limit`."""
+    spatial_index.ensure_fresh(db)
+    return spatial_index.within(south, west, north, east, limit=limit)
+
+
+@router.get("/buildings/near", response_model=List[schemas.BuildingLocationOut])
+def buildings_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(1.0, gt=0, le=100),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
+    """Buildings within `radius_km` of a point, nearest first (at most `limit`)."""
+    spatial_index.ensure_fresh(db)
+    return spatial_index.near(lat, lon, radius_km, limit=limit)
+
+
+@router.get("/clusters", response_model=List[schemas.BuildingClusterOut])
+def building_clusters(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(12, ge=0, le=22),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Server-side clustering for the map: the number of clusters is bounded by
+    the viewport size at `zoom`, not by how many buildings the city has.
+    """
+    spatial_index.ensure_fresh(db)
+    return spatial_index.clusters(south, west, north, east, zoom)
+
+
+@router.post("/simulate", response_model=schemas.SimulationResponse)
+async def simulate_scenarios(
+    request: Request,
+    payload: schemas.SimulationRequest,
+    db: Session = Depends(get_read_db),
+):
+    """
+    What-if scenarios over the city's typical-day load: add buildings, scale
+    or shift load by building type / zone / meter type, and compare zone and
+    city peaks against the baseline.
+    """
+    try:
+        return await simulate_city(
+            db, payload.scenarios, payload.include_profiles, days=payload.history_days,
+            request=request,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
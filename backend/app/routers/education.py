@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from ..config import settings
 from ..database import get_db
+from ..profiling import ProfiledRoute
 from .. import models, schemas
-from ..services.education_models import compute_institution_risk
+from ..services.education_models import (
+    compute_institution_risk,
+    latest_institution_risk,
+)
 
-router = APIRouter(prefix="/education", tags=["education"])
+router = APIRouter(prefix="/education", tags=["education"], route_class=ProfiledRoute)
 
 
 @router.post("/performance")
@@ -20,5 +25,9 @@ def add_performance(
 
 @router.get("/risk/{institution_id}", response_model=schemas.EducationForecastOut)
 def get_institution_risk(institution_id: int, db: Session = Depends(get_db)):
-    forecast = compute_institution_risk(db, institution_id)
+    forecast = None
+    if settings.RISK_MAX_AGE_S:
+        forecast = latest_institution_risk(db, institution_id, settings.RISK_MAX_AGE_S)
+    if forecast is None:
+        forecast = compute_institution_risk(db, institution_id)
     return forecast
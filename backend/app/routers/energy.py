@@ -1,37 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 
-from ..database import get_db
-from .. import models, schemas
-from ..services.energy_forecasting import forecast_building_energy
+from ..concurrency import forecast_limiter, run_heavy
+from ..database import get_db, get_read_db
+from ..profiling import ProfiledRoute
+from .. import schemas
+from ..services.energy_forecasting import (
+    forecast_building_energy,
+    latest_forecast_batch,
+)
+from ..services.anomalies import list_anomalies
+from ..services.energy_intensity import intensity_query
+from ..services.ingest import get_reading, upsert_readings
+from ..services.intensity_tiles import intensity_tiles
+from ..services.sensor_health import list_sensor_health
+from ..config import settings
+from ..responses import (
+    VARY_ACCEPT,
+    columnar_media_type,
+    columnar_response,
+    etag_matches,
+    fast_json_enabled,
+    fast_json_response,
+    to_columnar,
+    vary_on_accept,
+)
 
-router = APIRouter(prefix="/energy", tags=["energy"])
+router = APIRouter(prefix="/energy", tags=["energy"], route_class=ProfiledRoute)
 
 
 @router.post("/readings", response_model=schemas.EnergyReadingOut)
 def create_reading(payload: schemas.EnergyReadingCreate, db: Session = Depends(get_db)):
-    sensor = db.query(models.Sensor).filter_by(id=payload.sensor_id).first()
-    if not sensor:
+    """Store one reading; re-sending the same (sensor_id, timestamp) updates it."""
+    timestamp = payload.timestamp or datetime.utcnow()
+    result = upsert_readings(db, [(payload.sensor_id, timestamp, payload.value)])
+    if result["unknown_sensor_ids"]:
         raise HTTPException(status_code=404, detail="Sensor not found")
+    return get_reading(db, payload.sensor_id, timestamp)
 
-    reading = models.EnergyReading(**payload.dict())
-    db.add(reading)
-    db.commit()
-    db.refresh(reading)
-    return reading
+
+@router.post("/readings/batch", response_model=schemas.EnergyReadingBatchResult)
+def create_readings_batch(payload: schemas.EnergyReadingBatch, db: Session = Depends(get_db)):
+    """
+    Idempotent bulk ingest for gateways: one upsert for the whole batch.
+    Readings for unknown sensors are skipped and reported.
+    """
+    if len(payload.readings) > settings.INGEST_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.INGEST_BATCH_MAX} readings per batch.",
+        )
+    return upsert_readings(
+        db, ((r.sensor_id, r.timestamp, r.value) for r in payload.readings)
+    )
+
+
+@router.get("/sensors/health", response_model=List[schemas.SensorHealthOut])
+def get_sensor_health(
+    building_id: Optional[int] = None,
+    status: Optional[str] = Query(None, regex="^(ok|stale|stuck|gappy|unknown)$"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db),
+):
+    return list_sensor_health(db, building_id=building_id, status=status, limit=limit)
+
+
+@router.get("/anomalies", response_model=List[schemas.AnomalyOut])
+def get_anomalies(
+    response: Response,
+    since: Optional[datetime] = Query(None, description="Only readings at or after this time"),
+    building_id: Optional[int] = None,
+    sensor_id: Optional[int] = None,
+    cursor: Optional[int] = Query(None, description="Last anomaly id already seen"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Anomaly event feed, oldest first. Poll with the id of the last event as
+    `cursor` (also returned in X-Next-Cursor) to get only new events.
+    """
+    events = list_anomalies(
+        db, since=since, building_id=building_id, sensor_id=sensor_id, cursor=cursor, limit=limit
+    )
+    if events:
+        response.headers["X-Next-Cursor"] = str(events[-1]["id"])
+    return events
 
 
 @router.get(
     "/forecast/{building_id}",
     response_model=List[schemas.EnergyForecastOut],
+    dependencies=[Depends(vary_on_accept)],
 )
-def get_energy_forecast(
-    building_id: int, horizon_hours: int = 24, db: Session = Depends(get_db)
+async def get_energy_forecast(
+    request: Request,
+    building_id: int,
+    horizon_hours: int = 24,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
 ):
-    forecasts = forecast_building_energy(db, building_id, horizon_hours=horizon_hours)
+    def compute():
+        # Stored forecasts and reading history come from the read engine;
+        # only the new forecast rows are written to the primary.
+        forecasts = None
+        if settings.FORECAST_MAX_AGE_S:
+            forecasts = latest_forecast_batch(
+                read_db, building_id, horizon_hours, settings.FORECAST_MAX_AGE_S
+            )
+        if forecasts is None:
+            forecasts = forecast_building_energy(
+                db, building_id, horizon_hours=horizon_hours, read_db=read_db
+            )
+        return forecasts
+
+    forecasts = await run_heavy(
+        forecast_limiter, ("forecast", building_id, horizon_hours), compute, request=request
+    )
+    media_type = columnar_media_type(request)
+    if media_type:
+        payload = to_columnar(forecasts, "timestamp", ["predicted_value"])
+        return columnar_response(media_type, {"building_id": building_id, **payload})
+    if fast_json_enabled():
+        return fast_json_response(forecasts, headers=VARY_ACCEPT)
     return forecasts
 
 
@@ -39,35 +132,30 @@ def get_energy_forecast(
     "/intensity",
     response_model=List[schemas.BuildingEnergyIntensityOut],
 )
-def get_building_energy_intensity(db: Session = Depends(get_db)):
+def get_building_energy_intensity(db: Session = Depends(get_read_db)):
     now = datetime.utcnow()
     since = now - timedelta(hours=24)
 
-    q = (
-        db.query(
-            models.Building.id.label("building_id"),
-            models.Building.name,
-            models.Building.type,
-            models.Building.latitude,
-            models.Building.longitude,
-            models.Building.city_zone,
-            func.coalesce(func.sum(models.EnergyReading.value), 0.0).label("total_kwh_24h"),
-        )
-        .join(models.Sensor, models.Sensor.building_id == models.Building.id)
-        .join(models.EnergyReading, models.EnergyReading.sensor_id == models.Sensor.id)
-        .filter(models.EnergyReading.timestamp >= since)
-        .group_by(
-            models.Building.id,
-            models.Building.name,
-            models.Building.type,
-            models.Building.latitude,
-            models.Building.longitude,
-            models.Building.city_zone,
-        )
-    )
+    q = intensity_query(db, since)
 
     rows = q.all()
 
+    if fast_json_enabled():
+        return fast_json_response(
+            [
+                {
+                    "building_id": r.building_id,
+                    "name": r.name,
+                    "type": r.type,
+                    "latitude": r.latitude,
+                    "longitude": r.longitude,
+                    "city_zone": r.city_zone,
+                    "total_kwh_24h": float(r.total_kwh_24h or 0.0),
+                }
+                for r in rows
+            ]
+        )
+
     result: List[schemas.BuildingEnergyIntensityOut] = []
     for r in rows:
         result.append(
@@ -83,3 +171,33 @@ def get_building_energy_intensity(db: Session = Depends(get_db)):
         )
 
     return result
+
+
+@router.get("/intensity/tiles/{z}/{x}/{y}")
+def get_energy_intensity_tile(
+    request: Request,
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Pre-aggregated 24h kWh for one map tile. Cached server-side and
+    rebuilt only when one of its buildings gets new readings.
+    """
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    tile = intensity_tiles.get(db, z, x, y)
+    headers = {
+        "ETag": tile.etag,
+        # Shared caches may keep tiles briefly; the ETag makes the
+        # revalidation after that cheap (304)
+        "Cache-Control": (
+            f"public, max-age={settings.INTENSITY_TILE_CLIENT_MAX_AGE_S}, "
+            f"stale-while-revalidate={settings.INTENSITY_TILE_STALE_S}"
+        ),
+    }
+    if etag_matches(request, tile.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=tile.body, media_type="application/json", headers=headers)
@@ -1,21 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..concurrency import optimize_limiter, run_heavy
+from ..database import get_db, get_read_db
+from ..profiling import ProfiledRoute
 from ..schemas import (
     EnergyOptimizationRequest,
     EnergyOptimizationResult,
+    GridSignalImport,
+    GridSignalImportResult,
+    GridSignalKind,
+    GridSignalProfileItem,
+    RollingOptimizationRequest,
+    RollingOptimizationResult,
 )
+from ..services import grid_signals
+from ..services.mpc import rolling_optimize
 from ..services.optimization_engine import optimize_energy_schedule
+from ..responses import (
+    VARY_ACCEPT,
+    columnar_media_type,
+    columnar_response,
+    fast_json_enabled,
+    fast_json_response,
+    to_columnar,
+    vary_on_accept,
+)
+
+router = APIRouter(tags=["optimization"], route_class=ProfiledRoute)
 
-router = APIRouter(tags=["optimization"])
+
+@router.post(
+    "/optimize/energy",
+    response_model=EnergyOptimizationResult,
+    dependencies=[Depends(vary_on_accept)],
+)
+async def optimize_energy(
+    request: Request,
+    payload: EnergyOptimizationRequest,
+    db: Session = Depends(get_db),
+):
+    key = ("optimize", payload.json())  # identical requests share one solve
+    try:
+        result = await run_heavy(
+            optimize_limiter, key, optimize_energy_schedule, db, payload, request=request
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = columnar_media_type(request)
+    if media_type:
+        schedule = to_columnar(
+            result["schedule"], "timestamp", ["baseline_kw", "optimized_kw"]
+        )
+        return columnar_response(media_type, {**result, "schedule": schedule})
+    if fast_json_enabled():
+        return fast_json_response(result, headers=VARY_ACCEPT)
+    return result
 
 
-@router.post("/optimize/energy", response_model=EnergyOptimizationResult)
-def optimize_energy(
-    payload: EnergyOptimizationRequest, db: Session = Depends(get_db)
+@router.post("/optimize/energy/rolling", response_model=RollingOptimizationResult)
+async def optimize_energy_rolling(
+    request: Request,
+    payload: RollingOptimizationRequest,
+    db: Session = Depends(get_db),
 ):
+    """
+    One model-predictive-control step: re-plan the building's window from
+    the current hour, keeping the LP and the previous solution between calls.
+    """
+    key = ("optimize_rolling", payload.json())
     try:
-        return optimize_energy_schedule(db, payload)
+        result = await run_heavy(
+            optimize_limiter, key, rolling_optimize, db, payload, request=request
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if fast_json_enabled():
+        return fast_json_response(result)
+    return result
+
+
+@router.post("/grid/{kind}", response_model=GridSignalImportResult)
+def import_grid_signal(
+    kind: GridSignalKind,
+    payload: GridSignalImport,
+    db: Session = Depends(get_db),
+):
+    """
+    Import a tariff or carbon-intensity curve for a zone as a new version.
+    It replaces older versions from its first point to `valid_until`.
+    """
+    if not payload.points:
+        raise HTTPException(status_code=400, detail="No points to import.")
+    points = ((payload.zone, p.valid_from, p.value) for p in payload.points)
+    try:
+        return grid_signals.import_points(
+            db, kind.value, points, source=payload.source, valid_until=payload.valid_until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/grid/{kind}/profile", response_model=List[GridSignalProfileItem])
+def grid_signal_profile(
+    kind: GridSignalKind,
+    zone: Optional[str] = None,
+    start: Optional[datetime] = None,
+    hours: int = Query(24, ge=1, le=24 * 31),
+    db: Session = Depends(get_read_db),
+):
+    """Hourly values the optimizer would use for `zone` from `start` (default: now)."""
+    first = (start or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+    timestamps = [first + timedelta(hours=h) for h in range(hours)]
+    values = grid_signals.profile(db, kind.value, zone, timestamps)
+    if values is None:
+        raise HTTPException(status_code=404, detail="No curve covers this period.")
+    return [{"timestamp": ts, "value": v} for ts, v in zip(timestamps, values)]
@@ -1,8 +1,8 @@
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Extra, Field, validator
 
 
 class UserBase(BaseModel):
@@ -41,12 +41,105 @@ class BuildingOut(BuildingBase):
         orm_mode = True
 
 
+class BuildingFieldsOut(BaseModel):
+    """A listed building; with ?fields= only id and the requested fields are present."""
+    id: int
+    name: Optional[str]
+    type: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    city_zone: Optional[str]
+
+
+class BuildingLocationOut(BuildingOut):
+    distance_km: Optional[float] = None
+
+
+class BuildingClusterOut(BaseModel):
+    """A map cluster; single-building clusters carry that building's fields."""
+    latitude: float
+    longitude: float
+    count: int
+    id: Optional[int] = None
+    name: Optional[str] = None
+    type: Optional[str] = None
+    city_zone: Optional[str] = None
+
+
+# ===== What-if simulation =====
+class ScenarioOp(str, Enum):
+    scale = "scale"                  # factor (0 removes the load)
+    shift = "shift"                  # hours, fraction
+    add_buildings = "add_buildings"  # type, city_zone, count (factor scales each)
+
+
+class ScenarioTransform(BaseModel):
+    op: ScenarioOp
+    # Filters (scale / shift) or the new buildings' type and zone
+    type: Optional[str] = None
+    city_zone: Optional[str] = None
+    sensor_type: Optional[str] = None  # "energy_meter" or "hvac_meter"
+    factor: float = Field(1.0, ge=0)
+    hours: int = Field(0, ge=-23, le=23)
+    fraction: float = Field(1.0, ge=0, le=1)
+    count: int = Field(0, ge=0)
+
+
+class Scenario(BaseModel):
+    name: str
+    transforms: List[ScenarioTransform] = Field(..., max_items=64)
+
+
+class SimulationRequest(BaseModel):
+    scenarios: List[Scenario] = Field(..., max_items=10000)
+    include_profiles: bool = False
+    history_days: Optional[int] = Field(None, ge=1, le=90)
+
+
+class ZoneSimulationResult(BaseModel):
+    city_zone: str
+    peak_kw: float
+    peak_hour: int
+    daily_kwh: float
+    delta_peak_kw: float
+    profile: Optional[List[float]] = None
+
+
+class ScenarioResult(BaseModel):
+    name: str
+    city_peak_kw: float
+    city_peak_hour: int
+    city_daily_kwh: float
+    zones: List[ZoneSimulationResult]
+    city_profile: Optional[List[float]] = None
+
+
+class SimulationResponse(BaseModel):
+    buildings: int
+    profile_built_at: datetime
+    baseline: ScenarioResult
+    scenarios: List[ScenarioResult]
+
+
 class EnergyReadingCreate(BaseModel):
     sensor_id: int
     timestamp: Optional[datetime] = None
     value: float
 
 
+class EnergyReadingBatch(BaseModel):
+    readings: List[EnergyReadingCreate]
+
+
+class EnergyReadingBatchResult(BaseModel):
+    received: int
+    inserted: int
+    updated: int     # existing (sensor_id, timestamp) with a new value
+    unchanged: int   # exact re-sends, nothing written
+    anomalies: int = 0  # new readings flagged by the detector
+    unknown_sensor_ids: List[int] = []
+
+
 class EnergyReadingOut(BaseModel):
     id: int
     sensor_id: int
@@ -67,6 +160,32 @@ class EnergyForecastOut(BaseModel):
         orm_mode = True
 
 
+class SensorHealthOut(BaseModel):
+    sensor_id: int
+    building_id: Optional[int]
+    status: str  # ok, stale, stuck, gappy, unknown
+    first_seen: Optional[datetime]
+    last_seen: Optional[datetime]
+    last_value: Optional[float]
+    reading_count: int
+    cadence_s: Optional[float]
+    gap_count: int
+    last_gap_at: Optional[datetime]
+    is_stuck: bool
+
+
+class AnomalyOut(BaseModel):
+    id: int
+    sensor_id: int
+    building_id: Optional[int]
+    timestamp: datetime
+    value: float
+    expected: float  # baseline mean for that sensor and hour of day
+    zscore: float
+    kind: str  # spike or drop
+    detected_at: Optional[datetime]
+
+
 class BuildingEnergyIntensityOut(BaseModel):
     building_id: int
     name: str
@@ -123,6 +242,76 @@ class DashboardSummaryOut(BaseModel):
     potential_energy_savings_percent: float
 
 
+class PanelType(str, Enum):
+    summary = "summary"      # dashboard summary
+    intensity = "intensity"  # 24h kWh per building; params: limit, type, city_zone
+    buildings = "buildings"  # params: limit, type, city_zone
+    forecast = "forecast"    # params: building_id, horizon_hours
+    risk = "risk"            # params: institution_id
+
+
+class PanelSpec(BaseModel):
+    id: str
+    type: PanelType
+    params: Dict[str, Any] = {}  # validated per type, see PANEL_PARAMS
+
+
+class PanelParams(BaseModel):
+    """Params of panels that take none; unknown keys are rejected."""
+
+    class Config:
+        extra = Extra.forbid
+
+
+class BuildingsPanelParams(PanelParams):
+    limit: int = Field(500, ge=1, le=5000)
+    type: Optional[str] = None
+    city_zone: Optional[str] = None
+
+
+class ForecastPanelParams(PanelParams):
+    building_id: int
+    horizon_hours: int = Field(24, ge=1, le=168)  # at most a week
+
+
+class RiskPanelParams(PanelParams):
+    institution_id: int
+
+
+PANEL_PARAMS = {
+    PanelType.summary: PanelParams,
+    PanelType.intensity: BuildingsPanelParams,
+    PanelType.buildings: BuildingsPanelParams,
+    PanelType.forecast: ForecastPanelParams,
+    PanelType.risk: RiskPanelParams,
+}
+
+
+class PanelsRequest(BaseModel):
+    panels: List[PanelSpec] = Field(..., max_items=32)
+
+    @validator("panels")
+    def unique_ids(cls, v):
+        seen = set()
+        for spec in v:
+            if spec.id in seen:
+                raise ValueError(f"duplicate panel id {spec.id!r}")
+            seen.add(spec.id)
+        return v
+
+
+class PanelResult(BaseModel):
+    id: str
+    type: PanelType
+    ok: bool
+    data: Any = None
+    error: Optional[str] = None
+
+
+class PanelsResponse(BaseModel):
+    panels: List[PanelResult]
+
+
 # ===== New advanced optimization models =====
 class OptimizationMode(str, Enum):
     peak = "peak"
@@ -159,3 +348,57 @@ class EnergyOptimizationResult(BaseModel):
     estimated_emissions_baseline_kg: Optional[float] = None
     estimated_emissions_optimized_kg: Optional[float] = None
     schedule: List[EnergyOptimizationScheduleItem]
+
+
+class RollingOptimizationRequest(EnergyOptimizationRequest):
+    # Already-executed hours kept in the window (fixed to metered load);
+    # at most the horizon (`hours`)
+    lookback_hours: int = Field(6, ge=0)
+
+    @validator("lookback_hours")
+    def lookback_within_horizon(cls, v, values):
+        hours = values.get("hours")
+        if hours is not None and v > hours:
+            raise ValueError(f"must not exceed hours ({hours})")
+        return v
+
+
+class RollingScheduleItem(EnergyOptimizationScheduleItem):
+    executed: bool = False
+
+
+class RollingOptimizationResult(EnergyOptimizationResult):
+    schedule: List[RollingScheduleItem]
+    window_start: datetime
+    warm_started: bool
+    replans: int
+    solve_ms: float
+
+
+class GridSignalKind(str, Enum):
+    tariff = "tariff"   # price per kWh
+    carbon = "carbon"   # kg CO2 per kWh
+
+
+class GridSignalPoint(BaseModel):
+    valid_from: datetime
+    value: float
+
+
+class GridSignalImport(BaseModel):
+    zone: str
+    source: Optional[str] = None
+    points: List[GridSignalPoint]
+    # End of the last step; default: one step length after the last point
+    valid_until: Optional[datetime] = None
+
+
+class GridSignalImportResult(BaseModel):
+    kind: GridSignalKind
+    version: int
+    imported: int
+
+
+class GridSignalProfileItem(BaseModel):
+    timestamp: datetime
+    value: float
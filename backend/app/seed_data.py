@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 from random import uniform
+from .config import settings
 from .database import SessionLocal, engine, Base
 from . import models
+from .services.timeseries_store import timeseries_store
 
 
 def reset_db():
@@ -199,6 +201,27 @@ def seed_student_performance(db, students, base_score, score_spread, low_attenda
     db.commit()
 
 
+def base_load_kwh(btype, sensor_type, hour):
+    """Typical hourly kWh for a sensor of a given building type at `hour`."""
+    if btype == "school":
+        base = 15 if 8 <= hour <= 15 else 3
+    elif btype == "college":
+        base = 35 if 8 <= hour <= 18 else 5
+    elif btype == "office":
+        base = 50 if 9 <= hour <= 19 else 10
+    elif btype == "residential":
+        base = 25 if (6 <= hour <= 9 or 18 <= hour <= 23) else 8
+    else:
+        base = 10
+
+    if sensor_type == "hvac_meter":
+        if 9 <= hour <= 18:
+            base = base * 0.4
+        else:
+            base = 0.5
+    return base
+
+
 def seed_energy_readings(db, sensors):
     print("Seeding energy readings (last 2 days, hourly)...")
     end_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
@@ -208,24 +231,7 @@ def seed_energy_readings(db, sensors):
     while current <= end_time:
         hour = current.hour
         for sensor in sensors:
-            btype = sensor.building.type
-            if btype == "school":
-                base = 15 if 8 <= hour <= 15 else 3
-            elif btype == "college":
-                base = 35 if 8 <= hour <= 18 else 5
-            elif btype == "office":
-                base = 50 if 9 <= hour <= 19 else 10
-            elif btype == "residential":
-                base = 25 if (6 <= hour <= 9 or 18 <= hour <= 23) else 8
-            else:
-                base = 10
-
-            if sensor.sensor_type == "hvac_meter":
-                if 9 <= hour <= 18:
-                    base = base * 0.4
-                else:
-                    base = 0.5
-
+            base = base_load_kwh(sensor.building.type, sensor.sensor_type, hour)
             value = base + uniform(-0.1 * base, 0.1 * base)
             value = max(0.5, value)
 
@@ -256,6 +262,8 @@ def main():
         seed_student_performance(db, [college_students[2], college_students[3]], base_score=60, score_spread=12, low_attendance=True)
 
         seed_energy_readings(db, sensors)
+        if settings.TIMESERIES_STORE_ENABLED:
+            timeseries_store.rebuild(db)
 
         print("✅ Seeding completed successfully.")
     finally:
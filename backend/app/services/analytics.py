@@ -1,10 +1,18 @@
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from .. import models
+from sqlalchemy import exists, func
+from .. import models, partitions
+from ..config import settings
+from ..shared_cache import shared_cache
 
 
-def compute_dashboard_summary(db: Session):
+def compute_dashboard_summary(db: Session, day_range: Optional[Tuple[float, float]] = None):
+    """
+    `day_range` is (max, min) of the unflagged readings of the last 24h,
+    when the caller already has it (the panels endpoint); otherwise it is
+    queried here.
+    """
     # 1) Monitored buildings
     monitored_buildings = db.query(models.Building).count()
 
@@ -12,9 +20,10 @@ def compute_dashboard_summary(db: Session):
     now = datetime.utcnow()
     seven_days_ago = now - timedelta(days=7)
 
+    week = partitions.readings(db, seven_days_ago)
     total_energy_7d = (
-        db.query(func.coalesce(func.sum(models.EnergyReading.value), 0.0))
-        .filter(models.EnergyReading.timestamp >= seven_days_ago)
+        db.query(func.coalesce(func.sum(week.c.value), 0.0))
+        .filter(week.c.timestamp >= seven_days_ago)
         .scalar()
     )
     avg_daily_energy_kwh = float(total_energy_7d / 7.0) if total_energy_7d else 0.0
@@ -38,17 +47,10 @@ def compute_dashboard_summary(db: Session):
     # 4) Potential energy savings (simple heuristic)
     # For now: assume if we apply optimization we can save 10–25%
     # based on how "peaky" the last day’s load is.
-    one_day_ago = now - timedelta(days=1)
-    max_hourly = (
-        db.query(func.coalesce(func.max(models.EnergyReading.value), 0.0))
-        .filter(models.EnergyReading.timestamp >= one_day_ago)
-        .scalar()
-    )
-    min_hourly = (
-        db.query(func.coalesce(func.min(models.EnergyReading.value), 0.0))
-        .filter(models.EnergyReading.timestamp >= one_day_ago)
-        .scalar()
-    )
+    # Readings flagged as anomalies (meter spikes, dropouts) are left out.
+    if day_range is None:
+        day_range = day_load_range(db, now - timedelta(days=1))
+    max_hourly, min_hourly = day_range
 
     if max_hourly and min_hourly:
         peak_ratio = max_hourly / max(min_hourly, 0.1)
@@ -63,3 +65,54 @@ def compute_dashboard_summary(db: Session):
         "at_risk_institutions": at_risk_institutions,
         "potential_energy_savings_percent": round(potential_savings, 1),
     }
+
+
+def day_load_range(db: Session, since: datetime) -> Tuple[float, float]:
+    """(max, min) reading value since `since`, leaving out flagged anomalies."""
+    day = partitions.readings(db, since)
+    flagged = exists().where(
+        models.Anomaly.sensor_id == day.c.sensor_id,
+        models.Anomaly.timestamp == day.c.timestamp,
+    )
+    max_hourly, min_hourly = (
+        db.query(
+            func.coalesce(func.max(day.c.value), 0.0),
+            func.coalesce(func.min(day.c.value), 0.0),
+        )
+        .filter(day.c.timestamp >= since, ~flagged)
+        .one()
+    )
+    return max_hourly, min_hourly
+
+
+DASHBOARD_SNAPSHOT = "dashboard_summary"
+
+
+def store_snapshot(db: Session, name: str, payload: dict) -> models.AnalyticsSnapshot:
+    snapshot = models.AnalyticsSnapshot(name=name, payload=payload)
+    db.add(snapshot)
+    db.commit()
+    if settings.SHARED_CACHE_ENABLED:
+        shared_cache.put("snapshots", name, payload)
+    return snapshot
+
+
+def latest_snapshot(db: Session, name: str, max_age_s: int) -> Optional[dict]:
+    """Payload of the newest snapshot called `name`, if younger than `max_age_s`."""
+    if settings.SHARED_CACHE_ENABLED:
+        # Written by whichever worker ran the rollup job; avoids the DB round-trip.
+        payload = shared_cache.get("snapshots", name, max_age_s=max_age_s)
+        if payload is not None:
+            return payload
+
+    since = datetime.utcnow() - timedelta(seconds=max_age_s)
+    snapshot = (
+        db.query(models.AnalyticsSnapshot)
+        .filter(
+            models.AnalyticsSnapshot.name == name,
+            models.AnalyticsSnapshot.created_at >= since,
+        )
+        .order_by(models.AnalyticsSnapshot.created_at.desc())
+        .first()
+    )
+    return snapshot.payload if snapshot else None
@@ -0,0 +1,283 @@
+"""
+Streaming anomaly detection on ingested readings.
+
+Each sensor has a `sensor_baselines` row: an EWMA mean and variance of its
+reading values for each hour of day (24 buckets, so O(1) per sensor). A new
+reading is scored against its bucket before the bucket learns from it:
+
+  z = (value - mean) / max(std, ANOMALY_MIN_STD_FRAC * |mean|)
+
+Once the bucket has seen ANOMALY_MIN_SAMPLES readings, |z| above
+ANOMALY_Z_THRESHOLD adds an `anomalies` row ("spike" or "drop"). The value
+that updates the baseline is clipped to the threshold band, so a single
+spike hardly moves it. Until a bucket reaches 1 / ANOMALY_ALPHA readings
+the weights are 1 / n, i.e. the plain mean and variance.
+
+`detect_anomalies` scores a whole ingest batch with numpy. Readings that
+share a (sensor, hour) bucket depend on each other, so the batch is
+processed in rounds: round k holds every bucket's k-th reading (in time
+order) and is one vectorized step over all buckets. A batch of one reading
+per sensor is a single round.
+
+A corrected reading (a re-send with a new value) loses its anomaly row and
+is re-scored by `rescore_anomalies` against the current baseline without
+teaching it again.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..database import dialect_insert
+
+HOURS = 24
+# Smallest deviation used for z, whatever the mean
+MIN_STD_ABS = 1e-3
+LOOKUP_CHUNK = 500
+
+
+def _load(db: Session, sensor_ids: List[int]):
+    """
+    (sensor ids that have a baseline, mean, var, count), one row of 24 per
+    sensor. The rows stay locked until the caller commits, so concurrent
+    batches for the same sensors learn one after the other.
+    """
+    table = models.SensorBaseline.__table__
+    upsert = dialect_insert(db)
+    if upsert is not None:
+        # An all-zero state is an empty baseline; creating the rows first
+        # gives the lock below something to hold for new sensors too.
+        empty = np.zeros((3, HOURS)).tobytes()
+        db.execute(
+            upsert(table).on_conflict_do_nothing(index_elements=[table.c.sensor_id]),
+            [
+                {"sensor_id": sensor_id, "state": empty, "updated_at": datetime.utcnow()}
+                for sensor_id in sensor_ids
+            ],
+        )
+    return _read(db, sensor_ids, for_update=True)
+
+
+def _read(db: Session, sensor_ids: List[int], for_update: bool = False):
+    table = models.SensorBaseline.__table__
+    state = np.zeros((len(sensor_ids), 3, HOURS))
+    position = {sensor_id: i for i, sensor_id in enumerate(sensor_ids)}
+    stored = set()
+    query = (
+        select(table.c.sensor_id, table.c.state)
+        .where(table.c.sensor_id.in_(sensor_ids))
+        .order_by(table.c.sensor_id)
+    )
+    for sensor_id, packed in db.execute(query.with_for_update() if for_update else query):
+        state[position[sensor_id]] = np.frombuffer(packed, dtype=np.float64).reshape(3, HOURS)
+        stored.add(sensor_id)
+    return stored, state[:, 0], state[:, 1], state[:, 2]
+
+
+def _store(db: Session, sensor_ids: List[int], stored, mean, var, count):
+    table = models.SensorBaseline.__table__
+    now = datetime.utcnow()
+    state = np.stack([mean, var, count], axis=1)
+    upsert = dialect_insert(db)
+    if upsert is not None:
+        stmt = upsert(table)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.sensor_id],
+                set_={"state": stmt.excluded.state, "updated_at": stmt.excluded.updated_at},
+            ),
+            [
+                {"sensor_id": sensor_id, "state": state[i].tobytes(), "updated_at": now}
+                for i, sensor_id in enumerate(sensor_ids)
+            ],
+        )
+        return
+    new_rows, updates = [], []
+    for i, sensor_id in enumerate(sensor_ids):
+        packed = state[i].tobytes()
+        if sensor_id in stored:
+            updates.append({"row_id": sensor_id, "new_state": packed, "now": now})
+        else:
+            new_rows.append({"sensor_id": sensor_id, "state": packed, "updated_at": now})
+    if new_rows:
+        db.execute(insert(table), new_rows)
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.sensor_id == bindparam("row_id"))
+            .values(state=bindparam("new_state"), updated_at=bindparam("now")),
+            updates,
+        )
+
+
+def _score(x, m, v, n):
+    """(std, z, warm) of values `x` against buckets with mean m, var v, count n."""
+    floor = np.maximum(settings.ANOMALY_MIN_STD_FRAC * np.abs(m), MIN_STD_ABS)
+    std = np.maximum(np.sqrt(v), floor)
+    return std, (x - m) / std, n >= settings.ANOMALY_MIN_SAMPLES
+
+
+def _micros(ts: datetime) -> int:
+    # Microseconds since 0001-01-01; several times faster than numpy's
+    # datetime64 conversion of a list of datetimes.
+    seconds = ((ts.toordinal() * 24 + ts.hour) * 60 + ts.minute) * 60 + ts.second
+    return seconds * 1_000_000 + ts.microsecond
+
+
+def _rounds(bucket: np.ndarray, ts: np.ndarray) -> List[np.ndarray]:
+    """Reading indices per round: round k has each bucket's k-th reading."""
+    order = np.lexsort((ts, bucket))
+    sorted_buckets = bucket[order]
+    starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    run = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, run)
+    by_rank = np.argsort(rank, kind="stable")
+    return np.split(order[by_rank], np.cumsum(np.bincount(rank))[:-1])
+
+
+def detect_anomalies(db: Session, readings: Iterable[Tuple[int, datetime, float]]) -> int:
+    """
+    Score new (sensor_id, timestamp, value) readings, update the baselines
+    and add Anomaly rows. Returns the number flagged; the caller commits.
+    """
+    if not settings.ANOMALY_DETECTION_ENABLED:
+        return 0
+    readings = list(readings)
+    if not readings:
+        return 0
+
+    sid, ts, val = zip(*readings)
+    sensor_ids, s_idx = np.unique(np.array(sid, dtype=np.int64), return_inverse=True)
+    sensor_ids = sensor_ids.tolist()
+    micros = np.array([_micros(t) for t in ts], dtype=np.int64)
+    hours = micros // 3_600_000_000
+    values = np.array(val, dtype=np.float64)
+    bucket = s_idx * HOURS + hours % HOURS
+
+    stored, mean, var, count = _load(db, sensor_ids)
+    mean, var, count = mean.ravel(), var.ravel(), count.ravel()
+
+    z_limit = settings.ANOMALY_Z_THRESHOLD
+    flagged: List[Tuple[int, float, float]] = []  # (reading index, expected, z)
+    for idx in _rounds(bucket, micros):
+        b = bucket[idx]
+        x = values[idx]
+        m, v, n = mean[b], var[b], count[b]
+
+        std, z, warm = _score(x, m, v, n)
+        hit = warm & (np.abs(z) > z_limit)
+        if hit.any():
+            flagged.extend(zip(idx[hit].tolist(), m[hit].tolist(), z[hit].tolist()))
+
+        # Learn from the value clipped to the band (unclipped while warming up)
+        x = np.where(warm, np.clip(x, m - z_limit * std, m + z_limit * std), x)
+        alpha = np.maximum(1.0 / (n + 1), settings.ANOMALY_ALPHA)
+        delta = x - m
+        mean[b] = m + alpha * delta
+        var[b] = (1.0 - alpha) * (v + alpha * delta * delta)
+        count[b] = n + 1
+
+    _store(
+        db, sensor_ids, stored,
+        mean.reshape(-1, HOURS), var.reshape(-1, HOURS), count.reshape(-1, HOURS),
+    )
+
+    _add_anomalies(db, readings, flagged)
+    return len(flagged)
+
+
+def rescore_anomalies(db: Session, readings: Iterable[Tuple[int, datetime, float]]) -> int:
+    """
+    Re-score corrected (sensor_id, timestamp, value) readings: their old
+    Anomaly rows are removed and the new values are scored against the
+    current baselines, which do not learn from corrections (the original
+    value was already learned). Returns the number flagged; the caller commits.
+    """
+    readings = list(readings)
+    if not readings:
+        return 0
+    table = models.Anomaly.__table__
+    keys = [(sensor_id, ts) for sensor_id, ts, _ in readings]
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        db.execute(
+            delete(table).where(
+                tuple_(table.c.sensor_id, table.c.timestamp).in_(keys[i : i + LOOKUP_CHUNK])
+            )
+        )
+    if not settings.ANOMALY_DETECTION_ENABLED:
+        return 0
+
+    sid, ts, val = zip(*readings)
+    sensor_ids, s_idx = np.unique(np.array(sid, dtype=np.int64), return_inverse=True)
+    hours = np.array([_micros(t) for t in ts], dtype=np.int64) // 3_600_000_000
+    values = np.array(val, dtype=np.float64)
+    _, mean, var, count = _read(db, sensor_ids.tolist())
+    m = mean[s_idx, hours % HOURS]
+    _, z, warm = _score(values, m, var[s_idx, hours % HOURS], count[s_idx, hours % HOURS])
+    hit = np.flatnonzero(warm & (np.abs(z) > settings.ANOMALY_Z_THRESHOLD))
+    flagged = list(zip(hit.tolist(), m[hit].tolist(), z[hit].tolist()))
+    _add_anomalies(db, readings, flagged)
+    return len(flagged)
+
+
+def _add_anomalies(db: Session, readings, flagged: List[Tuple[int, float, float]]):
+    if not flagged:
+        return
+    detected_at = datetime.utcnow()
+    db.execute(
+        insert(models.Anomaly),
+        [
+            {
+                "sensor_id": readings[i][0],
+                "timestamp": readings[i][1],
+                "value": float(readings[i][2]),
+                "expected": expected,
+                "zscore": round(z, 3),
+                "kind": "spike" if z > 0 else "drop",
+                "detected_at": detected_at,
+            }
+            for i, expected, z in flagged
+        ],
+    )
+
+
+def list_anomalies(
+    db: Session,
+    since: Optional[datetime] = None,
+    building_id: Optional[int] = None,
+    sensor_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = 500,
+) -> List[Dict]:
+    """Anomaly events in detection order; `cursor` is the last id already seen."""
+    query = (
+        db.query(models.Anomaly, models.Sensor.building_id)
+        .join(models.Sensor, models.Sensor.id == models.Anomaly.sensor_id)
+        .order_by(models.Anomaly.id)
+    )
+    if since is not None:
+        query = query.filter(models.Anomaly.timestamp >= since)
+    if building_id is not None:
+        query = query.filter(models.Sensor.building_id == building_id)
+    if sensor_id is not None:
+        query = query.filter(models.Anomaly.sensor_id == sensor_id)
+    if cursor is not None:
+        query = query.filter(models.Anomaly.id > cursor)
+    return [
+        {
+            "id": a.id,
+            "sensor_id": a.sensor_id,
+            "building_id": anomaly_building_id,
+            "timestamp": a.timestamp,
+            "value": a.value,
+            "expected": a.expected,
+            "zscore": a.zscore,
+            "kind": a.kind,
+            "detected_at": a.detected_at,
+        }
+        for a, anomaly_building_id in query.limit(limit)
+    ]
@@ -0,0 +1,69 @@
+"""
+Per-building data versions shared by every worker process.
+
+Ingest bumps a building's `building_data_versions` row in the same
+transaction that changes its readings. Caches that live in one process (the
+intensity tiles) or are keyed per request (forecasts) compare against it
+instead of relying on in-process notifications, which other gunicorn
+workers never see.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import dialect_insert
+
+Version = Tuple[int, datetime]  # (writes, updated_at)
+
+
+def bump(db: Session, building_ids: Iterable[int], now: datetime):
+    """Record a change to these buildings' readings; the caller commits."""
+    building_ids = sorted(set(building_ids))
+    if not building_ids:
+        return
+    table = models.BuildingDataVersion.__table__
+    upsert = dialect_insert(db)
+    if upsert is not None:
+        stmt = upsert(table)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.building_id],
+                set_={"updated_at": stmt.excluded.updated_at, "writes": table.c.writes + 1},
+            ),
+            [{"building_id": b, "updated_at": now, "writes": 1} for b in building_ids],
+        )
+        return
+    known = set(db.scalars(select(table.c.building_id).where(table.c.building_id.in_(building_ids))))
+    if known:
+        db.execute(
+            update(table)
+            .where(table.c.building_id.in_(known))
+            .values(updated_at=now, writes=table.c.writes + 1)
+        )
+    missing = [b for b in building_ids if b not in known]
+    if missing:
+        db.execute(insert(table), [{"building_id": b, "updated_at": now, "writes": 1} for b in missing])
+
+
+def changed_since(db: Session, since: datetime) -> Dict[int, Version]:
+    """Buildings whose readings changed at or after `since`."""
+    table = models.BuildingDataVersion.__table__
+    return {
+        building_id: (writes, updated_at)
+        for building_id, writes, updated_at in db.execute(
+            select(table.c.building_id, table.c.writes, table.c.updated_at)
+            .where(table.c.updated_at >= since)
+        )
+    }
+
+
+def building_version(db: Session, building_id: int) -> Version:
+    """(writes, updated_at) of one building; (0, None) if it never had readings ingested."""
+    row = db.execute(
+        select(models.BuildingDataVersion.writes, models.BuildingDataVersion.updated_at)
+        .where(models.BuildingDataVersion.building_id == building_id)
+    ).first()
+    return (row.writes, row.updated_at) if row else (0, None)
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Optional
 from sqlalchemy.orm import Session
 from .. import models
 
@@ -57,3 +58,19 @@ def compute_institution_risk(db: Session, institution_id: int) -> models.Educati
     db.commit()
     db.refresh(forecast)
     return forecast
+
+
+def latest_institution_risk(
+    db: Session, institution_id: int, max_age_s: int
+) -> Optional[models.EducationForecast]:
+    """Most recent stored risk forecast, if younger than `max_age_s`."""
+    since = datetime.utcnow() - timedelta(seconds=max_age_s)
+    return (
+        db.query(models.EducationForecast)
+        .filter(
+            models.EducationForecast.institution_id == institution_id,
+            models.EducationForecast.timestamp >= since,
+        )
+        .order_by(models.EducationForecast.timestamp.desc())
+        .first()
+    )
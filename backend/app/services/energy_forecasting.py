@@ -1,23 +1,42 @@
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
 
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
 
-from .. import models
+from .. import models, partitions, workers
+from ..config import settings
+from ..profiling import timed
+from ..shared_cache import shared_cache
+from . import data_versions
+from .timeseries_store import hour_features, timeseries_store
 
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import GradientBoostingRegressor
+
+# pandas and scikit-learn are imported on first fit (or by app.startup.warm_up)
+# because they dominate the app's import time.
 
 
 def _get_building_hourly_series(
-    db: Session, building_id: int, days: int = 14
+    db: Session,
+    building_id: int,
+    days: int = 14,
+    end: Optional[datetime] = None,
+    gap_policy: str = "raw",
 ) -> List[Dict]:
     """
     Aggregate all sensor readings for a building into hourly total kWh
-    for the last `days` days. Returns list of dicts:
+    for the `days` days before `end` (default: now). Returns list of dicts:
     [{"timestamp": datetime, "value": float}, ...]
+
+    gap_policy decides what happens to hours in which some sensor did not
+    report (which would otherwise look like a drop in load):
+      raw          sum whatever readings exist (legacy behaviour)
+      interpolate  fill each sensor's missing hours linearly between its
+                   neighbouring readings, and leave out stuck sensors
+      exclude      drop hours not covered by every reporting sensor, and
+                   leave out stuck sensors
     """
     sensors = (
         db.query(models.Sensor)
@@ -28,20 +47,23 @@ def _get_building_hourly_series(
     if not sensor_ids:
         return []
 
-    now = datetime.utcnow()
+    now = end or datetime.utcnow()
     start = now - timedelta(days=days)
 
-    readings = (
-        db.query(models.EnergyReading)
-        .filter(
-            models.EnergyReading.sensor_id.in_(sensor_ids),
-            models.EnergyReading.timestamp >= start,
-        )
-        .all()
+    source = partitions.readings(db, start, end, sensor_ids)
+    query = select(source.c.sensor_id, source.c.timestamp, source.c.value).where(
+        source.c.sensor_id.in_(sensor_ids),
+        source.c.timestamp >= start,
     )
+    if end is not None:
+        query = query.where(source.c.timestamp < end)
+    readings = db.execute(query).all()
     if not readings:
         return []
 
+    if gap_policy != "raw":
+        return _gap_filled_series(db, readings, gap_policy)
+
     bucket = defaultdict(float)
     for r in readings:
         ts = r.timestamp.replace(minute=0, second=0, microsecond=0)
@@ -52,6 +74,48 @@ def _get_building_hourly_series(
     return series
 
 
+def _gap_filled_series(db: Session, readings, gap_policy: str) -> List[Dict]:
+    from .sensor_health import stuck_sensor_ids
+
+    per_sensor: Dict[int, Dict[datetime, float]] = defaultdict(lambda: defaultdict(float))
+    for r in readings:
+        ts = r.timestamp.replace(minute=0, second=0, microsecond=0)
+        per_sensor[r.sensor_id][ts] += float(r.value)
+    for sensor_id in stuck_sensor_ids(db, list(per_sensor)):
+        del per_sensor[sensor_id]
+    if not per_sensor:
+        return []
+
+    origin = min(min(b) for b in per_sensor.values())
+    to_idx = lambda ts: int((ts - origin).total_seconds() // 3600)  # noqa: E731
+    span = max(to_idx(max(b)) for b in per_sensor.values()) + 1
+
+    totals = np.zeros(span)
+    covered = np.zeros(span, dtype=np.int64)
+    for buckets in per_sensor.values():
+        idx = np.array([to_idx(ts) for ts in buckets], dtype=np.int64)
+        vals = np.array(list(buckets.values()))
+        order = np.argsort(idx)
+        idx, vals = idx[order], vals[order]
+        if gap_policy == "interpolate":
+            # Only between the sensor's first and last reading; no extrapolation.
+            full = np.arange(idx[0], idx[-1] + 1)
+            totals[full] += np.interp(full, idx, vals)
+            covered[full] += 1
+        else:
+            totals[idx] += vals
+            covered[idx] += 1
+
+    if gap_policy == "exclude":
+        keep = covered == len(per_sensor)
+    else:
+        keep = covered > 0
+    return [
+        {"timestamp": origin + timedelta(hours=int(i)), "value": float(totals[i])}
+        for i in np.flatnonzero(keep)
+    ]
+
+
 def _compute_hourly_baseline(series: List[Dict]) -> List[float]:
     """
     Build a 24-slot baseline profile from historical series.
@@ -104,6 +168,9 @@ def _train_ml_model(series: List[Dict]):
             }
         )
 
+    import pandas as pd
+    from sklearn.ensemble import GradientBoostingRegressor
+
     df = pd.DataFrame(rows)
     if df["value"].nunique() <= 1:
         # no variation → ML won’t learn anything useful
@@ -123,9 +190,170 @@ def _train_ml_model(series: List[Dict]):
     return model
 
 
+def _fit_hybrid_arrays(first_hour: int, window: np.ndarray):
+    """
+    Same fit as `_fit_hybrid`, from a window of the time-series store
+    (hourly values from `first_hour` on, NaN where no data) instead of a
+    list of dicts.
+    """
+    present = np.flatnonzero(~np.isnan(window))
+    hours_of_day, weekdays = hour_features(first_hour + present)
+    values = window[present].astype(np.float64)
+    with timed("model_train"):
+        counts = np.bincount(hours_of_day, minlength=24)
+        totals = np.bincount(hours_of_day, weights=values, minlength=24)
+        global_avg = totals.sum() / max(counts.sum(), 1)
+        baseline_profile = [
+            float(totals[h] / counts[h]) if counts[h] else float(global_avg)
+            for h in range(24)
+        ]
+
+        ml_model = None
+        if len(values) >= 24 and np.unique(values).size > 1:
+            from sklearn.ensemble import GradientBoostingRegressor
+
+            ml_model = GradientBoostingRegressor(
+                n_estimators=100,
+                learning_rate=0.05,
+                max_depth=3,
+                random_state=42,
+            )
+            ml_model.fit(np.column_stack([hours_of_day, weekdays]), values)
+    return baseline_profile, ml_model
+
+
+def _fit_hybrid(series: List[Dict]):
+    """
+    Fit both halves of the hybrid forecaster on a historical series.
+    Returns (baseline_profile, ml_model); ml_model may be None.
+    """
+    with timed("model_train"):
+        baseline_profile = _compute_hourly_baseline(series)
+        ml_model = _train_ml_model(series)
+    return baseline_profile, ml_model
+
+
+def _latest_data_hour(db: Session, building_id: int) -> Optional[datetime]:
+    if settings.TIMESERIES_STORE_ENABLED:
+        hour = timeseries_store.latest_hour(building_id)
+        if hour is not None:
+            return datetime(1970, 1, 1) + timedelta(hours=hour)
+        # No file yet (store not rebuilt): ask the database.
+    sensor_ids = [
+        s for (s,) in db.query(models.Sensor.id).filter(
+            models.Sensor.building_id == building_id, models.Sensor.is_active.is_(True)
+        )
+    ]
+    latest = partitions.latest_timestamp(db, sensor_ids) if sensor_ids else None
+    if latest is None:
+        return None
+    return latest.replace(minute=0, second=0, microsecond=0)
+
+
+def _fit_inputs(db: Session, building_id: int, days: int, gap_policy: str):
+    """Training data in a picklable form: ("window", (...)) or ("series", [...])."""
+    # The store only has building totals; gap handling needs per-sensor rows.
+    if settings.TIMESERIES_STORE_ENABLED and gap_policy == "raw":
+        now = datetime.utcnow()
+        first_hour, window = timeseries_store.window(
+            building_id, now - timedelta(days=days), now + timedelta(hours=1)
+        )
+        # Without data in the store (not rebuilt yet) use the database.
+        if not np.isnan(window).all():
+            return "window", (first_hour, window)
+    series = _get_building_hourly_series(db, building_id, days=days, gap_policy=gap_policy)
+    return ("series", series) if series else None
+
+
+def _fit_predict(cache_key, inputs, timestamps: List[datetime]) -> Optional[List[float]]:
+    """
+    Fit (or reuse a cached fit) and predict. Runs in a compute-pool worker
+    when the pool is enabled, so models stay resident in the workers' memory
+    and the API process never unpickles them. Returns None when `inputs`
+    were not sent because the model was expected in the cache but is gone.
+    """
+    fitted = None
+    if cache_key is not None:
+        fitted = shared_cache.get(
+            "forecast_models", cache_key, max_age_s=settings.SHARED_CACHE_MAX_AGE_S
+        )
+    if fitted is None:
+        if inputs is None:
+            return None
+        kind, data = inputs
+        fitted = _fit_hybrid_arrays(*data) if kind == "window" else _fit_hybrid(data)
+        if cache_key is not None:
+            shared_cache.put("forecast_models", cache_key, fitted)
+    values, _, _ = _predict_hybrid(*fitted, timestamps)
+    return values
+
+
+def _forecast_values(
+    db: Session, building_id: int, timestamps: List[datetime], days: int = 14
+) -> Optional[List[float]]:
+    """
+    Hybrid forecast values for `timestamps`, or None without data.
+
+    With SHARED_CACHE_ENABLED, fitted models are kept in the shared cache
+    keyed by the building's data version (bumped by every ingest that
+    changes its readings, including same-hour and backdated ones), so every
+    worker reuses one fit until the data changes instead of retraining per
+    request and per process. Training data is only loaded from the database
+    on a cache miss.
+    """
+    gap_policy = settings.FORECAST_GAP_POLICY
+    cache_key = None
+    if settings.SHARED_CACHE_ENABLED:
+        latest = _latest_data_hour(db, building_id)
+        if latest is None:
+            return None
+        writes, _ = data_versions.building_version(db, building_id)
+        cache_key = (building_id, days, gap_policy, latest.isoformat(), writes)
+        if shared_cache.contains(
+            "forecast_models", cache_key, max_age_s=settings.SHARED_CACHE_MAX_AGE_S
+        ):
+            values = workers.run(_fit_predict, cache_key, None, timestamps)
+            if values is not None:
+                return values
+
+    inputs = _fit_inputs(db, building_id, days, gap_policy)
+    if inputs is None:
+        return None
+    return workers.run(_fit_predict, cache_key, inputs, timestamps)
+
+
+def _predict_hybrid(
+    baseline_profile: List[float], ml_model, timestamps: List[datetime]
+) -> Tuple[List[float], List[float], List[float]]:
+    """
+    Predict kWh for each timestamp.
+    Returns (hybrid, baseline_only, ml_only) value lists.
+    """
+    if not timestamps:
+        return [], [], []
+
+    baseline_vals = [baseline_profile[ts.hour] for ts in timestamps]
+    if ml_model is not None:
+        X = np.array([[ts.hour, ts.weekday()] for ts in timestamps])
+        with timed("model_predict"):
+            ml_vals = [float(v) for v in ml_model.predict(X)]
+    else:
+        ml_vals = list(baseline_vals)
+
+    # weights: tweak if you want ML to dominate more/less
+    w_baseline = 0.6
+    w_ml = 0.4 if ml_model is not None else 0.0
+
+    hybrid = [
+        max(0.0, w_baseline * b + w_ml * m)  # no negative kWh
+        for b, m in zip(baseline_vals, ml_vals)
+    ]
+    return hybrid, baseline_vals, ml_vals
+
+
 def forecast_building_energy(
-    db: Session, building_id: int, horizon_hours: int = 24
-) -> List[models.EnergyForecast]:
+    db: Session, building_id: int, horizon_hours: int = 24, read_db: Optional[Session] = None
+) -> List[Dict]:
     """
     Hybrid forecast:
       1) Build 14-day hourly series from all sensors.
@@ -133,48 +361,101 @@ def forecast_building_energy(
       3) Train ML model on [hour, weekday] -> kWh.
       4) For each future hour:
            hybrid = w_baseline * baseline + w_ml * ml_pred
-    """
-    series = _get_building_hourly_series(db, building_id, days=14)
-    if not series:
-        return []
-
-    baseline_profile = _compute_hourly_baseline(series)
-    ml_model = _train_ml_model(series)
 
+    Forecasts are stored with one bulk insert and returned as plain dicts
+    shaped like EnergyForecastOut (no ORM round-trip per row). History is
+    read through `read_db` when given (see database.get_read_db).
+    """
     now = datetime.utcnow()
-    forecasts: List[models.EnergyForecast] = []
+    timestamps = [now + timedelta(hours=h + 1) for h in range(horizon_hours)]
+    values = _forecast_values(read_db or db, building_id, timestamps, days=14)
+    if values is None:
+        return []
 
-    # weights: tweak if you want ML to dominate more/less
-    w_baseline = 0.6
-    w_ml = 0.4 if ml_model is not None else 0.0
+    forecasts = [
+        {
+            "building_id": building_id,
+            "timestamp": ts,
+            "horizon_hours": h + 1,
+            "predicted_value": value,
+        }
+        for h, (ts, value) in enumerate(zip(timestamps, values))
+    ]
+    if forecasts:
+        db.execute(insert(models.EnergyForecast), forecasts)
+        db.commit()
 
-    for h in range(horizon_hours):
-        ts = now + timedelta(hours=h + 1)
-        hour = ts.hour
-        dow = ts.weekday()
+    return forecasts
 
-        baseline_val = baseline_profile[hour]
 
-        if ml_model is not None:
-            ml_pred = float(ml_model.predict(np.array([[hour, dow]]))[0])
-        else:
-            ml_pred = baseline_val
+def prune_forecasts(db: Session, building_id: int) -> int:
+    """Delete stored forecast runs older than the building's newest one."""
+    newest = (
+        db.query(func.max(models.EnergyForecast.id))
+        .filter(
+            models.EnergyForecast.building_id == building_id,
+            models.EnergyForecast.horizon_hours == 1,
+        )
+        .scalar()
+    )
+    if newest is None:
+        return 0
+    removed = (
+        db.query(models.EnergyForecast)
+        .filter(
+            models.EnergyForecast.building_id == building_id,
+            models.EnergyForecast.id < newest,
+        )
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return removed
 
-        # combine
-        value = w_baseline * baseline_val + w_ml * ml_pred
-        value = max(0.0, value)  # no negative kWh
 
-        forecast = models.EnergyForecast(
-            building_id=building_id,
-            timestamp=ts,
-            horizon_hours=h + 1,
-            predicted_value=value,
+def latest_forecast_batch(
+    db: Session, building_id: int, horizon_hours: int, max_age_s: int
+) -> Optional[List[Dict]]:
+    """
+    The most recently stored forecast run for a building, if it was generated
+    less than `max_age_s` ago and covers `horizon_hours`. Runs are written in
+    one statement, so they occupy consecutive ids starting at horizon 1.
+    """
+    first = (
+        db.query(models.EnergyForecast)
+        .filter(
+            models.EnergyForecast.building_id == building_id,
+            models.EnergyForecast.horizon_hours == 1,
         )
-        db.add(forecast)
-        forecasts.append(forecast)
-
-    db.commit()
-    for f in forecasts:
-        db.refresh(f)
+        .order_by(models.EnergyForecast.id.desc())
+        .first()
+    )
+    if first is None:
+        return None
+    generated_at = first.timestamp - timedelta(hours=1)
+    if (datetime.utcnow() - generated_at).total_seconds() > max_age_s:
+        return None
 
-    return forecasts
+    rows = (
+        db.query(models.EnergyForecast)
+        .filter(
+            models.EnergyForecast.building_id == building_id,
+            models.EnergyForecast.id >= first.id,
+            models.EnergyForecast.id < first.id + horizon_hours,
+        )
+        .order_by(models.EnergyForecast.id)
+        .all()
+    )
+    batch = [
+        {
+            "building_id": r.building_id,
+            "timestamp": r.timestamp,
+            "horizon_hours": r.horizon_hours,
+            "predicted_value": r.predicted_value,
+        }
+        for i, r in enumerate(rows)
+        if r.horizon_hours == i + 1
+        and r.timestamp == first.timestamp + timedelta(hours=i)
+    ]
+    if len(batch) < horizon_hours:
+        return None
+    return batch
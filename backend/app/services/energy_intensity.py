@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models, partitions
+
+# Keep IN (...) lists well below SQLite's bound-parameter limit.
+_ID_CHUNK = 500
+
+
+def intensity_query(db: Session, since: datetime):
+    """Per-building total kWh since `since`, with the building's map fields."""
+    readings = partitions.readings(db, since)
+    return (
+        db.query(
+            models.Building.id.label("building_id"),
+            models.Building.name,
+            models.Building.type,
+            models.Building.latitude,
+            models.Building.longitude,
+            models.Building.city_zone,
+            func.coalesce(func.sum(readings.c.value), 0.0).label("total_kwh_24h"),
+        )
+        .join(models.Sensor, models.Sensor.building_id == models.Building.id)
+        .join(readings, readings.c.sensor_id == models.Sensor.id)
+        .filter(readings.c.timestamp >= since)
+        .group_by(
+            models.Building.id,
+            models.Building.name,
+            models.Building.type,
+            models.Building.latitude,
+            models.Building.longitude,
+            models.Building.city_zone,
+        )
+    )
+
+
+def building_energy_totals(
+    db: Session,
+    building_ids: Iterable[int],
+    since: Optional[datetime] = None,
+) -> Dict[int, float]:
+    """total kWh over the last 24h (or since `since`) for the given buildings."""
+    since = since or datetime.utcnow() - timedelta(hours=24)
+    ids = list(building_ids)
+    totals: Dict[int, float] = {}
+    readings = partitions.readings(db, since)
+    for i in range(0, len(ids), _ID_CHUNK):
+        chunk = ids[i : i + _ID_CHUNK]
+        rows = (
+            db.query(
+                models.Sensor.building_id,
+                func.coalesce(func.sum(readings.c.value), 0.0),
+            )
+            .join(readings, readings.c.sensor_id == models.Sensor.id)
+            .filter(
+                models.Sensor.building_id.in_(chunk),
+                readings.c.timestamp >= since,
+            )
+            .group_by(models.Sensor.building_id)
+            .all()
+        )
+        totals.update({bid: float(total or 0.0) for bid, total in rows})
+    return totals
@@ -0,0 +1,247 @@
+"""
+Time-varying tariffs and grid carbon intensity.
+
+Both are stored as step curves per zone (`tariff_rates`,
+`carbon_intensities`): a row applies in [valid_from, valid_until). Each
+import gets a new `version` (the id of its `grid_signal_versions` row, so
+concurrent imports never share one) and its steps cover one contiguous
+range per zone: each step lasts until the next point, the last one until
+the import's `valid_until` (default: one step length, the shortest interval
+in the import, or GRID_SIGNAL_STEP_S for a single point). Wherever ranges
+overlap the newest version wins, so a re-import replaces the whole period
+it covers, steps included, without an UPDATE, and the previous curve stays
+auditable.
+
+For an optimization horizon the curve is loaded once per (kind, zone,
+date range) into NumPy arrays and cached in process for
+GRID_SIGNAL_CACHE_TTL_S; every timestamp of the horizon is then resolved in
+one `np.searchsorted`. A zone without data falls back to
+GRID_SIGNAL_DEFAULT_ZONE, and `profile` returns None when neither covers the
+whole horizon, in which case the optimizer keeps its built-in time-of-day
+profiles.
+"""
+import argparse
+import csv
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+
+TARIFF = "tariff"
+CARBON = "carbon"
+# kind -> (model, value column)
+KINDS = {
+    TARIFF: (models.TariffRate, "price_per_kwh"),
+    CARBON: (models.CarbonIntensity, "kg_co2_per_kwh"),
+}
+INSERT_CHUNK = 5000
+
+Curve = Tuple[np.ndarray, np.ndarray]  # (valid_from as datetime64[s], values)
+
+
+class _CurveCache:
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items = max_items
+        self.ttl_s = ttl_s
+        self._items: "OrderedDict[tuple, Tuple[float, Curve]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Curve]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            loaded_at, curve = item
+            if time.monotonic() - loaded_at > self.ttl_s:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return curve
+
+    def put(self, key, curve: Curve):
+        with self._lock:
+            self._items[key] = (time.monotonic(), curve)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_curves = _CurveCache(settings.GRID_SIGNAL_CACHE_SIZE, settings.GRID_SIGNAL_CACHE_TTL_S)
+
+
+def _load_curve(db: Session, kind: str, zone: str, start: datetime, end: datetime) -> Curve:
+    """
+    Steps of `zone` in [start, end) after resolving versions: segment starts
+    and the value in force from each, NaN where no import covers the segment.
+    """
+    model, column = KINDS[kind]
+    rows = (
+        db.query(model.valid_from, model.valid_until, getattr(model, column))
+        .filter(model.zone == zone, model.valid_from < end, model.valid_until > start)
+        .order_by(model.version, model.id)
+        .all()
+    )
+    if not rows:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=np.float64)
+
+    valid_from = np.array([r[0] for r in rows], dtype="datetime64[s]")
+    valid_until = np.array([r[1] for r in rows], dtype="datetime64[s]")
+    values = np.array([r[2] for r in rows], dtype=np.float64)
+    starts = np.unique(np.concatenate([valid_from, valid_until]))
+    # Rows are in priority order, so the highest covering row index wins.
+    covers = (valid_from[:, None] <= starts[None, :]) & (valid_until[:, None] > starts[None, :])
+    winner = np.where(covers, np.arange(len(rows))[:, None], -1).max(axis=0)
+    return starts, np.where(winner >= 0, values[winner], np.nan)
+
+
+def _curve(db: Session, kind: str, zone: str, start: datetime, end: datetime) -> Curve:
+    # Cache by whole days so every horizon starting the same day shares an entry.
+    day_start = datetime(start.year, start.month, start.day)
+    day_end = datetime(end.year, end.month, end.day) + timedelta(days=1)
+    key = (kind, zone, day_start, day_end)
+    curve = _curves.get(key)
+    if curve is None:
+        curve = _load_curve(db, kind, zone, day_start, day_end)
+        _curves.put(key, curve)
+    return curve
+
+
+def lookup(curve: Curve, timestamps: List[datetime]) -> Optional[np.ndarray]:
+    """Value in force at each timestamp, or None if any is not covered."""
+    starts, values = curve
+    if not len(starts) or not timestamps:
+        return None
+    ts = np.array(timestamps, dtype="datetime64[s]")
+    idx = np.searchsorted(starts, ts, side="right") - 1
+    if (idx < 0).any():
+        return None
+    found = values[idx]
+    if np.isnan(found).any():
+        return None
+    return found
+
+
+def profile(db: Session, kind: str, zone: Optional[str], timestamps: List[datetime]) -> Optional[List[float]]:
+    """Per-timestamp tariff or carbon intensity for `zone`, or None if not covered."""
+    if not timestamps:
+        return None
+    start, end = min(timestamps), max(timestamps)
+    zones = [z for z in (zone, settings.GRID_SIGNAL_DEFAULT_ZONE) if z]
+    for z in dict.fromkeys(zones):
+        values = lookup(_curve(db, kind, z, start, end), timestamps)
+        if values is not None:
+            return values.tolist()
+    return None
+
+
+def tariff_profile(db: Session, zone: Optional[str], timestamps: List[datetime]) -> Optional[List[float]]:
+    return profile(db, TARIFF, zone, timestamps)
+
+
+def emission_profile(db: Session, zone: Optional[str], timestamps: List[datetime]) -> Optional[List[float]]:
+    return profile(db, CARBON, zone, timestamps)
+
+
+def _steps(points: List[Tuple[datetime, float]], valid_until: Optional[datetime]):
+    """(valid_from, valid_until, value) for one zone's points, sorted by time."""
+    times = sorted(points)
+    if valid_until is None:
+        gaps = [b - a for (a, _), (b, _) in zip(times, times[1:])]
+        valid_until = times[-1][0] + (min(gaps) if gaps else timedelta(seconds=settings.GRID_SIGNAL_STEP_S))
+    ends = [t for t, _ in times[1:]] + [valid_until]
+    return [(t, until, value) for (t, value), until in zip(times, ends)]
+
+
+def import_points(
+    db: Session,
+    kind: str,
+    points: Iterable[Tuple[str, datetime, float]],
+    source: Optional[str] = None,
+    valid_until: Optional[datetime] = None,
+) -> Dict:
+    """
+    Insert (zone, valid_from, value) points as one new version and commit.
+    `valid_until` ends the last step of every zone (see the module
+    docstring for the default). Returns the version number and how many
+    rows were written.
+    """
+    model, column = KINDS[kind]
+    by_zone: Dict[str, Dict[datetime, float]] = {}
+    for zone, valid_from, value in points:
+        by_zone.setdefault(zone, {})[valid_from] = float(value)  # last one wins
+    if valid_until is not None and any(max(p) >= valid_until for p in by_zone.values()):
+        raise ValueError("valid_until must be after every point")
+
+    # The autoincrement id is the version: unique even for concurrent imports.
+    record = models.GridSignalVersion(kind=kind, source=source)
+    db.add(record)
+    db.flush()
+    version = record.id
+
+    rows = [
+        {
+            "zone": zone,
+            "valid_from": start,
+            "valid_until": until,
+            column: value,
+            "version": version,
+            "source": source,
+        }
+        for zone, zone_points in by_zone.items()
+        for start, until, value in _steps(list(zone_points.items()), valid_until)
+    ]
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.execute(insert(model), rows[i : i + INSERT_CHUNK])
+    db.commit()
+
+    # Other processes pick the new version up when their entries expire.
+    _curves.clear()
+    return {"kind": kind, "version": version, "imported": len(rows)}
+
+
+def _read_csv(path: str, zone: Optional[str]) -> Iterable[Tuple[str, datetime, float]]:
+    """Rows of `zone,valid_from,value` (zone column optional when --zone is given)."""
+    with open(path, newline="") as fh:
+        for row in csv.DictReader(fh):
+            yield (
+                zone or row["zone"],
+                datetime.fromisoformat(row["valid_from"]),
+                float(row["value"]),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import tariff or carbon-intensity curves.")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("csv_path", help="CSV with columns zone,valid_from,value")
+    parser.add_argument("--zone", help="zone for every row (CSV zone column not needed)")
+    parser.add_argument("--source")
+    parser.add_argument("--until", help="ISO time the last step of every zone ends")
+    args = parser.parse_args()
+    until = datetime.fromisoformat(args.until) if args.until else None
+
+    from ..database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        result = import_points(db, args.kind, _read_csv(args.csv_path, args.zone), args.source, until)
+    finally:
+        db.close()
+    print(f"Imported {result['imported']:,} {args.kind} points as version {result['version']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Idempotent energy-reading ingestion.
+
+Meters and gateways retry, so a reading is identified by (sensor_id,
+timestamp): sending it again replaces the stored value instead of adding a
+row. `upsert_readings` handles both the single and the batch endpoint:
+
+  1) collapses duplicates inside the batch (last one wins) and inserts the
+     keys with INSERT ... ON CONFLICT (sensor_id, timestamp) DO NOTHING
+     RETURNING on SQLite and Postgres, so the statement itself reports
+     which readings are new even when a retry races the original;
+  2) locks the rows that already existed, and updates those whose value
+     changed; identical re-sends are not written at all;
+  3) feeds only genuinely new readings to sensor health and the anomaly
+     detector, has corrections re-scored, and sends new values or
+     corrections (as deltas) to the hourly time-series store.
+
+The ON CONFLICT target is the unique index `uq_energy_readings_sensor_ts`.
+Databases created before it existed may hold duplicates, so the index can
+only be added after cleaning them:
+
+    python -m app.services.ingest dedupe [--batch-sensors 200]
+
+Until then (and on databases without RETURNING), existing rows are looked
+up first and writes fall back to UPDATE-by-id plus INSERT, which is
+idempotent for retries but not for two identical requests racing.
+
+With READINGS_PARTITIONING each month's readings go to that month's
+partition (see app.partitions), which always has the unique index. On
+SQLite, keys still in the base table before `partitions migrate` are
+updated there.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Table, bindparam, func, inspect, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from .. import models, partitions
+from ..config import settings
+from ..database import dialect_insert
+from . import data_versions
+from .anomalies import detect_anomalies, rescore_anomalies
+from .intensity_tiles import intensity_tiles
+from .sensor_health import record_readings
+from .timeseries_store import timeseries_store, to_hour
+
+logger = logging.getLogger("app.ingest")
+
+UNIQUE_INDEX = "uq_energy_readings_sensor_ts"
+# Keys per (sensor_id, timestamp) IN lookup
+LOOKUP_CHUNK = 500
+# How long the "does the unique index exist" answer is trusted (seconds)
+INDEX_CHECK_TTL_S = 300
+
+_index_checked: Tuple[float, bool] = (0.0, False)
+
+Key = Tuple[int, datetime]
+
+
+def _utc_naive(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def unique_index_ready(db: Session, table: Optional[Table] = None) -> bool:
+    global _index_checked
+    if partitions.enabled(db) and (
+        db.get_bind().dialect.name == "postgresql" or (table is not None and table.name != partitions.BASE)
+    ):
+        return True  # partitions and shards are created with the index
+    checked_at, ready = _index_checked
+    if ready or time.monotonic() - checked_at < INDEX_CHECK_TTL_S:
+        return ready
+    names = {ix["name"] for ix in inspect(db.get_bind()).get_indexes("energy_readings")}
+    ready = UNIQUE_INDEX in names
+    _index_checked = (time.monotonic(), ready)
+    return ready
+
+
+def _existing(
+    db: Session, table: Table, keys: List[Key], lock: bool = False
+) -> Dict[Key, Tuple[int, float]]:
+    """(sensor_id, timestamp) -> (id, value) for keys already stored."""
+    reading = table.c
+    found: Dict[Key, Tuple[int, float]] = {}
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i : i + LOOKUP_CHUNK]
+        query = (
+            select(reading.id, reading.sensor_id, reading.timestamp, reading.value)
+            .where(tuple_(reading.sensor_id, reading.timestamp).in_(chunk))
+            .order_by(reading.id)
+        )
+        for row_id, sensor_id, ts, value in db.execute(query.with_for_update() if lock else query):
+            found[(sensor_id, ts)] = (row_id, value)  # newest row wins
+    return found
+
+
+def _insert_new(db: Session, table: Table, rows: List[Dict]) -> Set[Key]:
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING: the keys this statement created."""
+    stmt = (
+        dialect_insert(db)(table)
+        .on_conflict_do_nothing(index_elements=[table.c.sensor_id, table.c.timestamp])
+        .returning(table.c.sensor_id, table.c.timestamp)
+    )
+    created: Set[Key] = set()
+    for i in range(0, len(rows), LOOKUP_CHUNK):
+        created.update((s, t) for s, t in db.execute(stmt, rows[i : i + LOOKUP_CHUNK]))
+    return created
+
+
+def _write(db: Session, table: Table, keys: List[Key], batch: Dict[Key, float]):
+    """
+    Store the batch values for `keys` in `table`. Returns (new rows, updates);
+    each update carries the value it replaced as "old". Keys whose stored
+    value is already equal are in neither.
+    """
+    rows = [{"sensor_id": k[0], "timestamp": k[1], "value": batch[k]} for k in keys]
+    partitions.assign_ids(db, table, rows)
+    upsert = dialect_insert(db) if unique_index_ready(db, table) else None
+    if upsert is not None and db.get_bind().dialect.insert_returning:
+        # The database decides what is new: a concurrent retry of the same
+        # key waits on the unique index and then inserts nothing. Rows that
+        # already existed are locked before their old value is read.
+        created = _insert_new(db, table, rows)
+        new_rows = [r for r in rows if (r["sensor_id"], r["timestamp"]) in created]
+        existing = _existing(db, table, [k for k in keys if k not in created], lock=True)
+    else:
+        existing = _existing(db, table, keys)
+        new_rows = [r for r in rows if (r["sensor_id"], r["timestamp"]) not in existing]
+        if upsert is not None and new_rows:
+            stmt = upsert(table)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[table.c.sensor_id, table.c.timestamp],
+                    set_={"value": stmt.excluded.value},
+                ),
+                new_rows,
+            )
+        elif new_rows:
+            db.execute(insert(table), new_rows)
+
+    updates = [
+        {"id": row_id, "sensor_id": k[0], "timestamp": k[1], "value": batch[k], "old": old}
+        for k, (row_id, old) in existing.items()
+        if old != batch[k]
+    ]
+    if updates:
+        db.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(value=bindparam("new_value")),
+            [{"row_id": u["id"], "new_value": u["value"]} for u in updates],
+        )
+    return new_rows, updates
+
+
+def upsert_readings(
+    db: Session, readings: Iterable[Tuple[int, Optional[datetime], float]]
+) -> Dict:
+    """
+    Store (sensor_id, timestamp, value) readings idempotently and commit.
+    A missing timestamp means "now". Unknown sensors are skipped.
+    """
+    now = datetime.utcnow()
+    batch: Dict[Key, float] = {}
+    for sensor_id, ts, value in readings:
+        batch[(sensor_id, _utc_naive(ts) if ts else now)] = float(value)
+    received = len(batch)
+
+    sensors = {
+        s.id: s
+        for s in db.query(models.Sensor.id, models.Sensor.building_id, models.Sensor.is_active)
+        .filter(models.Sensor.id.in_({k[0] for k in batch}))
+    } if batch else {}
+    unknown = sorted({k[0] for k in batch} - set(sensors))
+    keys = [k for k in batch if k[0] in sensors]
+
+    # Target table per month (one table unless partitioned). Keys still in
+    # the base table of a not yet migrated SQLite database are updated there.
+    base = models.EnergyReading.__table__
+    unmigrated = set(_existing(db, base, keys)) if partitions.base_pending(db) else set()
+    by_table: Dict[str, Tuple[Table, List[Key]]] = {}
+    for key in keys:
+        table = base if key in unmigrated else partitions.table_for(db, partitions.month_start(key[1]))
+        by_table.setdefault(table.name, (table, []))[1].append(key)
+
+    inserted, corrected = [], []
+    for table, table_keys in by_table.values():
+        # 1) + 2) new and corrected readings, as decided by the write itself
+        new_rows, updates = _write(db, table, table_keys, batch)
+        inserted += new_rows
+        corrected += updates
+
+    store_deltas: List[Tuple[int, datetime, float]] = [
+        (sensors[r["sensor_id"]].building_id, r["timestamp"], r["value"] - r.get("old", 0.0))
+        for r in inserted + corrected
+        if sensors[r["sensor_id"]].is_active
+    ]
+
+    # 3) sensor health and anomaly baselines only learn from readings they
+    #    have not seen; corrections are only re-scored
+    fresh = [(r["sensor_id"], r["timestamp"], r["value"]) for r in inserted]
+    record_readings(db, fresh)
+    anomalies = detect_anomalies(db, fresh)
+    anomalies += rescore_anomalies(db, [(u["sensor_id"], u["timestamp"], u["value"]) for u in corrected])
+    touched: Set[int] = {b for b, _, _ in store_deltas}
+    data_versions.bump(db, touched, now)
+    db.commit()
+
+    for building_id in touched:
+        intensity_tiles.mark_building_dirty(building_id)
+    if settings.TIMESERIES_STORE_ENABLED and store_deltas:
+        by_building: Dict[int, List[Tuple[int, float]]] = {}
+        for building_id, ts, delta in store_deltas:
+            by_building.setdefault(building_id, []).append((to_hour(ts), delta))
+        for building_id, points in by_building.items():
+            hours, deltas = zip(*points)
+            timeseries_store.add_many(building_id, np.array(hours), np.array(deltas))
+
+    return {
+        "received": received,
+        "inserted": len(inserted),
+        "updated": len(corrected),
+        "unchanged": len(keys) - len(inserted) - len(corrected),
+        "anomalies": anomalies,
+        "unknown_sensor_ids": unknown,
+    }
+
+
+def get_reading(db: Session, sensor_id: int, timestamp: datetime):
+    """The stored row (id, sensor_id, timestamp, value) for one reading key."""
+    timestamp = _utc_naive(timestamp)
+    tables = [partitions.table_for(db, partitions.month_start(timestamp))]
+    if partitions.base_pending(db):
+        tables.insert(0, models.EnergyReading.__table__)
+    for table in tables:
+        row = db.execute(
+            select(table.c.id, table.c.sensor_id, table.c.timestamp, table.c.value)
+            .where(table.c.sensor_id == sensor_id, table.c.timestamp == timestamp)
+            .order_by(table.c.id.desc())
+            .limit(1)
+        ).first()
+        if row is not None:
+            return row
+    return None
+
+
+# ===== One-off cleanup of pre-existing duplicates =====
+def dedupe_readings(db: Session, batch_sensors: int = 200) -> Dict:
+    """
+    Delete duplicate (sensor_id, timestamp) rows, keeping the newest (highest
+    id), `batch_sensors` sensors per transaction, then create the unique
+    index. Safe to interrupt and re-run.
+    """
+    reading = models.EnergyReading
+    sensor_ids = [s for (s,) in db.query(models.Sensor.id).order_by(models.Sensor.id)]
+    removed = 0
+    buildings: Set[int] = set()
+    for i in range(0, len(sensor_ids), batch_sensors):
+        chunk = sensor_ids[i : i + batch_sensors]
+        dupes = (
+            select(func.max(reading.id).label("keep"), reading.sensor_id, reading.timestamp)
+            .where(reading.sensor_id.in_(chunk))
+            .group_by(reading.sensor_id, reading.timestamp)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        doomed = [
+            row_id
+            for (row_id,) in db.execute(
+                select(reading.id)
+                .join(
+                    dupes,
+                    (reading.sensor_id == dupes.c.sensor_id)
+                    & (reading.timestamp == dupes.c.timestamp),
+                )
+                .where(reading.id != dupes.c.keep)
+            )
+        ]
+        if doomed:
+            for j in range(0, len(doomed), LOOKUP_CHUNK):
+                db.query(reading).filter(
+                    reading.id.in_(doomed[j : j + LOOKUP_CHUNK])
+                ).delete(synchronize_session=False)
+            chunk_buildings = {
+                b for (b,) in db.query(models.Sensor.building_id).filter(models.Sensor.id.in_(chunk))
+            }
+            data_versions.bump(db, chunk_buildings, datetime.utcnow())
+            buildings.update(chunk_buildings)
+            removed += len(doomed)
+        db.commit()
+        logger.info("dedupe: sensors %s-%s, %s rows removed so far", chunk[0], chunk[-1], removed)
+
+    index = next(ix for ix in reading.__table__.indexes if ix.name == UNIQUE_INDEX)
+    index.create(bind=db.get_bind(), checkfirst=True)
+    global _index_checked
+    _index_checked = (time.monotonic(), True)
+
+    if settings.TIMESERIES_STORE_ENABLED and buildings:
+        timeseries_store.rebuild(db, buildings)
+    for building_id in buildings:
+        intensity_tiles.mark_building_dirty(building_id)
+    return {"removed": removed, "buildings": len(buildings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Energy reading ingestion maintenance.")
+    parser.add_argument("command", choices=["dedupe"])
+    parser.add_argument("--batch-sensors", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        result = dedupe_readings(db, batch_sensors=args.batch_sensors)
+    finally:
+        db.close()
+    print(
+        f"Removed {result['removed']:,} duplicate readings across "
+        f"{result['buildings']} buildings; {UNIQUE_INDEX} is in place."
+    )
+
+
+if __name__ == "__main__":
+    main()
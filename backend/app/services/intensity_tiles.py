@@ -0,0 +1,177 @@
+"""
+Cached web-map tiles for the energy intensity layer.
+
+A tile (z, x, y) in the usual slippy-map scheme holds the 24h kWh totals of
+its buildings pre-aggregated into a CELLS_PER_TILE x CELLS_PER_TILE grid, so
+the payload per tile is bounded no matter how dense the city is.
+
+Tiles are built on first request and kept until either
+  - a building inside them receives a new reading (only the tiles
+    containing that building, at the zoom levels that are cached, are
+    dropped), or
+  - they are older than INTENSITY_TILE_MAX_AGE_S, since readings also age
+    out of the rolling 24h window without any new ingest.
+
+Ingest in this process calls `mark_building_dirty` directly. Writes made by
+other worker processes are picked up from `building_data_versions` (see
+app.services.data_versions), polled at most every
+INTENSITY_TILE_SYNC_INTERVAL_S.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from .data_versions import Version, changed_since
+from .energy_intensity import building_energy_totals
+from .spatial import spatial_index
+
+CELLS_PER_TILE = 8
+MAX_LAT = 85.05112878
+# Versions are stamped before their transaction commits, so each poll looks
+# back this far to catch slow commits.
+SYNC_OVERLAP_S = 30
+
+
+def lonlat_to_tile(lon, lat, zoom: int):
+    """Fractional slippy-map tile coordinates (works on scalars and arrays)."""
+    n = 2.0 ** zoom
+    lat = np.clip(lat, -MAX_LAT, MAX_LAT)
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a tile in degrees."""
+    n = 2.0 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+class TileEntry:
+    __slots__ = ("body", "etag", "built_at", "building_ids")
+
+    def __init__(self, body: bytes, building_ids: Set[int]):
+        self.body = body
+        self.etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.built_at = time.monotonic()
+        self.building_ids = building_ids
+
+
+class IntensityTileCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiles: Dict[Tuple[int, int, int], TileEntry] = {}
+        self._dirty: Set[int] = set()
+        self._seen: Dict[int, Version] = {}
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+        self.stats = {"hits": 0, "builds": 0, "invalidated": 0}
+
+    def mark_building_dirty(self, building_id: int):
+        with self._lock:
+            self._dirty.add(building_id)
+
+    def _sync_versions(self, db: Session):
+        """Mark buildings dirty whose data version changed in any process."""
+        if time.monotonic() < self._next_sync:
+            return
+        now = datetime.utcnow()
+        # Nothing older than the max tile age can be stale in the cache
+        since = now - timedelta(seconds=settings.INTENSITY_TILE_MAX_AGE_S)
+        if self._synced_at is not None:
+            since = max(since, self._synced_at - timedelta(seconds=SYNC_OVERLAP_S))
+        changed = changed_since(db, since)
+        with self._lock:
+            for building_id, version in changed.items():
+                if self._seen.get(building_id) != version:
+                    self._seen[building_id] = version
+                    self._dirty.add(building_id)
+            # Versions older than the overlap window will not be returned again
+            cutoff = now - timedelta(seconds=2 * SYNC_OVERLAP_S)
+            self._seen = {b: v for b, v in self._seen.items() if v[1] >= cutoff}
+            self._synced_at = now
+            self._next_sync = time.monotonic() + settings.INTENSITY_TILE_SYNC_INTERVAL_S
+
+    def _apply_invalidations(self, db: Session):
+        self._sync_versions(db)
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            stale = [k for k, t in self._tiles.items() if t.building_ids & dirty]
+            for key in stale:
+                del self._tiles[key]
+            self.stats["invalidated"] += len(stale)
+
+    def _build(self, db: Session, z: int, x: int, y: int) -> TileEntry:
+        south, west, north, east = tile_bounds(z, x, y)
+        ids, lat, lon = spatial_index.points_within(south, west, north, east)
+        totals = building_energy_totals(db, ids.tolist()) if len(ids) else {}
+
+        features = []
+        if len(ids):
+            tx, ty = lonlat_to_tile(lon, lat, z)
+            cx = np.clip(((tx - x) * CELLS_PER_TILE).astype(np.int64), 0, CELLS_PER_TILE - 1)
+            cy = np.clip(((ty - y) * CELLS_PER_TILE).astype(np.int64), 0, CELLS_PER_TILE - 1)
+            kwh = np.array([totals.get(int(b), 0.0) for b in ids], dtype=np.float64)
+            _, inverse, counts = np.unique(
+                cy * CELLS_PER_TILE + cx, return_inverse=True, return_counts=True
+            )
+            sums = np.bincount(inverse, weights=kwh)
+            peaks = np.zeros(len(counts))
+            np.maximum.at(peaks, inverse, kwh)
+            lat_mean = np.bincount(inverse, weights=lat) / counts
+            lon_mean = np.bincount(inverse, weights=lon) / counts
+            member = np.empty(len(counts), dtype=np.int64)
+            member[inverse] = ids
+
+            for c in range(len(counts)):
+                feature = {
+                    "latitude": round(float(lat_mean[c]), 6),
+                    "longitude": round(float(lon_mean[c]), 6),
+                    "count": int(counts[c]),
+                    "total_kwh_24h": round(float(sums[c]), 3),
+                    "max_kwh_24h": round(float(peaks[c]), 3),
+                }
+                if counts[c] == 1:
+                    feature["building_id"] = int(member[c])
+                features.append(feature)
+
+        body = json.dumps(
+            {"z": z, "x": x, "y": y, "features": features}, separators=(",", ":")
+        ).encode()
+        return TileEntry(body, set(int(b) for b in ids))
+
+    def get(self, db: Session, z: int, x: int, y: int) -> TileEntry:
+        spatial_index.ensure_fresh(db)
+        self._apply_invalidations(db)
+        key = (z, x, y)
+        entry: Optional[TileEntry] = self._tiles.get(key)
+        if entry is not None and time.monotonic() - entry.built_at < settings.INTENSITY_TILE_MAX_AGE_S:
+            self.stats["hits"] += 1
+            return entry
+
+        entry = self._build(db, z, x, y)
+        with self._lock:
+            self._tiles[key] = entry
+            self.stats["builds"] += 1
+            if len(self._tiles) > settings.INTENSITY_TILE_CACHE_SIZE:
+                # Drop the oldest tile (dicts keep insertion order).
+                self._tiles.pop(next(iter(self._tiles)))
+        return entry
+
+
+intensity_tiles = IntensityTileCache()
@@ -0,0 +1,246 @@
+"""
+Rolling-horizon (MPC) building schedule optimization.
+
+`optimize_energy_schedule` builds and solves a fresh LP per call. For
+continuous control the plan is recomputed every hour, and most of that
+work is identical between calls. A `RollingHorizonPlanner` keeps one LP per
+(building, mode, horizon, lookback) and on each replan only:
+
+  1) shifts the window to the current hour; the last `lookback_hours` slots
+     are hours already executed and are fixed to their metered load
+     (or to the previous plan where no readings arrived);
+  2) rewrites the objective coefficients (tariff / carbon per slot) and the
+     RHS of the energy-service constraint from the new forecast;
+  3) warm-starts CBC from the previous solution shifted by the elapsed
+     hours.
+
+Because executed hours stay in the window, load deferred in the past hours
+has to be served in the coming ones (the service constraint spans the whole
+window), which a stateless solve cannot express.
+
+Planners live in process memory; with several API workers a building's
+planner is rebuilt (cold) the first time another worker serves it.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..profiling import timed
+from ..schemas import OptimizationMode, RollingOptimizationRequest
+from .energy_forecasting import _forecast_values, _get_building_hourly_series
+from .optimization_engine import _build_emission_profile, _default_tariffs, _objective_profile
+
+SERVICE_FACTOR = 0.9
+# Planners kept per process
+MAX_PLANNERS = 256
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class RollingHorizonPlanner:
+    def __init__(self, mode: OptimizationMode, horizon: int, lookback: int, max_load_kw: float):
+        import pulp
+
+        self.mode = mode
+        self.horizon = horizon
+        self.lookback = lookback
+        self.max_load_kw = max_load_kw
+        self.size = lookback + horizon
+        self.window_start: Optional[datetime] = None
+        self.solution: List[float] = []
+        self.replans = 0
+        self.lock = threading.Lock()
+
+        # 2) LP structure, built once
+        self.prob = pulp.LpProblem("SmartEdRollingHorizon", pulp.LpMinimize)
+        self.x = [
+            pulp.LpVariable(f"load_{t}", lowBound=0, upBound=max_load_kw)
+            for t in range(self.size)
+        ]
+        self.prob += pulp.lpSum(self.x) >= 0, "energy_service"
+        if mode == OptimizationMode.peak:
+            peak = pulp.LpVariable("peak_load", lowBound=0)
+            # Only future slots count towards the peak being minimized.
+            for t in range(lookback, self.size):
+                self.prob += self.x[t] <= peak
+            self.prob += peak
+        else:
+            self.prob += pulp.lpSum(0.0 * v for v in self.x)
+
+    def _coefficients(self, timestamps: List[datetime], req) -> Optional[List[float]]:
+        if self.mode == OptimizationMode.cost:
+            return _default_tariffs(req, timestamps)
+        if self.mode == OptimizationMode.emissions:
+            return _build_emission_profile(timestamps)
+        return None
+
+    def window(self, now: datetime) -> List[datetime]:
+        start = _hour(now) - timedelta(hours=self.lookback)
+        return [start + timedelta(hours=t) for t in range(self.size)]
+
+    def replan(
+        self,
+        now: datetime,
+        forecast: List[float],
+        executed: Dict[datetime, float],
+        req,
+        coefficients: Optional[List[float]] = None,
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Re-optimize the window ending `horizon` hours after `now`.
+        `forecast` has one baseline value per future hour; `executed` maps
+        past hour -> metered kWh; `coefficients` (one per window slot)
+        overrides the built-in tariff / emission profile. Returns
+        (schedule, info).
+        """
+        import pulp
+
+        timestamps = self.window(now)
+        start = timestamps[0]
+        shift = 0
+        if self.window_start is not None:
+            shift = int((start - self.window_start).total_seconds() // 3600)
+        warm = bool(self.solution) and 0 <= shift < self.size
+
+        # 1) executed hours: fixed to metered load, else to what was planned
+        previous = {
+            self.window_start + timedelta(hours=t): v for t, v in enumerate(self.solution)
+        } if self.solution else {}
+        baseline = []
+        for t in range(self.lookback):
+            ts = timestamps[t]
+            value = executed.get(ts, previous.get(ts, 0.0))
+            value = min(max(value, 0.0), self.max_load_kw)
+            self.x[t].lowBound = self.x[t].upBound = value
+            baseline.append(executed.get(ts, value))
+        for t in range(self.lookback, self.size):
+            self.x[t].lowBound, self.x[t].upBound = 0, self.max_load_kw
+        baseline += [float(v) for v in forecast[: self.horizon]]
+        if len(baseline) < self.size:
+            raise ValueError("Forecast shorter than the planning horizon.")
+
+        # 2) new coefficients: service RHS and objective
+        total_baseline = sum(baseline)
+        self.prob.constraints["energy_service"].changeRHS(SERVICE_FACTOR * total_baseline)
+        if coefficients is None:
+            coefficients = self._coefficients(timestamps, req)
+        if coefficients is not None:
+            for var, coef in zip(self.x, coefficients):
+                self.prob.objective[var] = coef
+
+        # 3) warm start from the previous plan shifted into the new window
+        if warm:
+            for t, var in enumerate(self.x):
+                src = t + shift
+                guess = self.solution[src] if src < len(self.solution) else baseline[t]
+                var.setInitialValue(min(max(guess, var.lowBound), var.upBound))
+
+        started = time.perf_counter()
+        with timed("solver"):
+            self.prob.solve(pulp.PULP_CBC_CMD(msg=False, warmStart=warm))
+        solve_ms = (time.perf_counter() - started) * 1000.0
+        if pulp.LpStatus[self.prob.status] != "Optimal":
+            raise RuntimeError(f"Optimization failed: {pulp.LpStatus[self.prob.status]}")
+
+        self.solution = [v.value() or 0.0 for v in self.x]
+        self.window_start = start
+        self.replans += 1
+
+        schedule = [
+            {
+                "hour_index": t - self.lookback,
+                "timestamp": timestamps[t],
+                "baseline_kw": baseline[t],
+                "optimized_kw": self.solution[t],
+                "executed": t < self.lookback,
+            }
+            for t in range(self.size)
+        ]
+        info = {
+            "window_start": start,
+            "warm_started": warm,
+            "replans": self.replans,
+            "solve_ms": round(solve_ms, 2),
+            "coefficients": coefficients,
+        }
+        return schedule, info
+
+
+class PlannerRegistry:
+    def __init__(self, max_planners: int = MAX_PLANNERS):
+        self.max_planners = max_planners
+        self._planners: "OrderedDict[tuple, RollingHorizonPlanner]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, building_id: int, req: RollingOptimizationRequest) -> RollingHorizonPlanner:
+        key = (building_id, req.mode, req.hours, req.lookback_hours, req.max_load_kw)
+        with self._lock:
+            planner = self._planners.get(key)
+            if planner is None:
+                planner = RollingHorizonPlanner(
+                    req.mode, req.hours, req.lookback_hours, req.max_load_kw
+                )
+                self._planners[key] = planner
+            self._planners.move_to_end(key)
+            while len(self._planners) > self.max_planners:
+                self._planners.popitem(last=False)
+            return planner
+
+
+planners = PlannerRegistry()
+
+
+def _executed_loads(db: Session, building_id: int, now: datetime, lookback: int) -> Dict[datetime, float]:
+    if lookback <= 0:
+        return {}
+    end = _hour(now)
+    series = _get_building_hourly_series(
+        db, building_id, days=1 + lookback // 24, end=end
+    )
+    since = end - timedelta(hours=lookback)
+    return {p["timestamp"]: p["value"] for p in series if p["timestamp"] >= since}
+
+
+def rolling_optimize(db: Session, req: RollingOptimizationRequest, now: Optional[datetime] = None) -> Dict:
+    """One MPC step for a building: forecast, fix executed hours, re-solve."""
+    now = now or datetime.utcnow()
+    # Forecast exactly the window's future slots; the fitted model is cached,
+    # so this is cheap on replans (and nothing is written to energy_forecasts).
+    future_ts = [_hour(now) + timedelta(hours=h) for h in range(req.hours)]
+    forecast = _forecast_values(db, req.building_id, future_ts, days=14)
+    if forecast is None:
+        raise ValueError("No forecast data available for this building.")
+    executed = _executed_loads(db, req.building_id, now, req.lookback_hours)
+
+    planner = planners.get(req.building_id, req)
+    coefficients = _objective_profile(db, req, planner.window(now))
+    with planner.lock:
+        schedule, info = planner.replan(now, forecast, executed, req, coefficients)
+
+    future = schedule[req.lookback_hours:]
+    coefficients = info.pop("coefficients")
+    result = dict(
+        building_id=req.building_id,
+        hours=req.hours,
+        mode=req.mode,
+        total_baseline_kwh=round(sum(s["baseline_kw"] for s in future), 2),
+        total_optimized_kwh=round(sum(s["optimized_kw"] for s in future), 2),
+        schedule=schedule,
+        **info,
+    )
+    if coefficients is not None:
+        base = sum(s["baseline_kw"] * c for s, c in zip(schedule, coefficients) if not s["executed"])
+        opt = sum(s["optimized_kw"] * c for s, c in zip(schedule, coefficients) if not s["executed"])
+        if req.mode == OptimizationMode.cost:
+            result["estimated_cost_baseline"] = round(base, 2)
+            result["estimated_cost_optimized"] = round(opt, 2)
+        else:
+            result["estimated_emissions_baseline_kg"] = round(base, 2)
+            result["estimated_emissions_optimized_kg"] = round(opt, 2)
+    return result
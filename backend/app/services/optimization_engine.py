@@ -1,16 +1,15 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 
 from sqlalchemy.orm import Session
-import pulp
 
-from .. import models
+from .. import models, workers
+from ..profiling import timed
 from ..schemas import (
     EnergyOptimizationRequest,
     OptimizationMode,
-    EnergyOptimizationResult,
-    EnergyOptimizationScheduleItem,
 )
+from . import grid_signals
 from .energy_forecasting import forecast_building_energy
 
 
@@ -26,6 +25,12 @@ def _build_tariff_profile(timestamps: List[datetime], day_tariff: float, night_t
     return profile
 
 
+def _default_tariffs(req: EnergyOptimizationRequest, timestamps: List[datetime]):
+    day_tariff = req.day_tariff if req.day_tariff is not None else 8.0
+    night_tariff = req.night_tariff if req.night_tariff is not None else 5.0
+    return _build_tariff_profile(timestamps, day_tariff, night_tariff)
+
+
 def _build_emission_profile(timestamps: List[datetime]):
     """
     Approximate grid carbon intensity profile (kg CO2 per kWh).
@@ -45,9 +50,34 @@ def _build_emission_profile(timestamps: List[datetime]):
     return profile
 
 
+def _objective_profile(
+    db: Session, req: EnergyOptimizationRequest, timestamps: List[datetime]
+) -> Optional[List[float]]:
+    """
+    Tariff (cost mode) or carbon-intensity (emissions mode) per timestamp
+    from the building zone's imported curves; None means use the built-in
+    time-of-day profile. Tariffs given in the request always win over
+    imported ones.
+    """
+    if req.mode == OptimizationMode.cost:
+        if req.__fields_set__ & {"day_tariff", "night_tariff"}:
+            return None
+        kind = grid_signals.TARIFF
+    elif req.mode == OptimizationMode.emissions:
+        kind = grid_signals.CARBON
+    else:
+        return None
+    zone = (
+        db.query(models.Building.city_zone)
+        .filter(models.Building.id == req.building_id)
+        .scalar()
+    )
+    return grid_signals.profile(db, kind, zone, timestamps)
+
+
 def optimize_energy_schedule(
     db: Session, req: EnergyOptimizationRequest
-) -> EnergyOptimizationResult:
+) -> Dict:
     """
     Hybrid optimization:
       1) Get forecasted baseline load (kW) for the building.
@@ -59,6 +89,9 @@ def optimize_energy_schedule(
          - mode='peak': minimize max(x_t)
          - mode='cost': minimize sum(x_t * tariff_t)
          - mode='emissions': minimize sum(x_t * emission_factor_t)
+      Tariffs and emission factors come from the imported grid curves when
+      they cover the horizon (tariffs only if the request sets none), else
+      from the fixed time-of-day profiles.
     """
     horizon = req.hours
 
@@ -68,16 +101,35 @@ def optimize_energy_schedule(
         raise ValueError("No forecast data available for this building.")
 
     # Sort by horizon_hours (1..N)
-    forecasts_sorted = sorted(forecasts, key=lambda f: f.horizon_hours)
-    baseline = [float(f.predicted_value) for f in forecasts_sorted]
-    timestamps = [f.timestamp for f in forecasts_sorted]
+    forecasts_sorted = sorted(forecasts, key=lambda f: f["horizon_hours"])
+    baseline = [float(f["predicted_value"]) for f in forecasts_sorted]
+    timestamps = [f["timestamp"] for f in forecasts_sorted]
+
+    coefficients = _objective_profile(db, req, timestamps)
+
+    # 2)-5) run in the compute pool when enabled (CBC is CPU-bound)
+    return workers.run(solve_energy_schedule, req, baseline, timestamps, coefficients)
+
+
+def solve_energy_schedule(
+    req: EnergyOptimizationRequest,
+    baseline: List[float],
+    timestamps: List[datetime],
+    coefficients: Optional[List[float]] = None,
+) -> Dict:
+    """
+    LP part of `optimize_energy_schedule`; needs no database access.
+    `coefficients` overrides the built-in tariff / emission profile.
+    """
     n = len(baseline)
 
     total_baseline = sum(baseline)
     if total_baseline <= 0:
         raise ValueError("Baseline forecast has zero total energy.")
 
-    # 2) Create LP problem
+    # 2) Create LP problem (pulp is imported lazily; it is slow to import)
+    import pulp
+
     prob = pulp.LpProblem("SmartEdEnergyOptimization", pulp.LpMinimize)
 
     # Decision variables: load in kW for each hour
@@ -104,10 +156,7 @@ def optimize_energy_schedule(
         est_emissions_optimized = None
 
     elif req.mode == OptimizationMode.cost:
-        # Build tariff profile
-        day_tariff = req.day_tariff if req.day_tariff is not None else 8.0
-        night_tariff = req.night_tariff if req.night_tariff is not None else 5.0
-        tariffs = _build_tariff_profile(timestamps, day_tariff, night_tariff)
+        tariffs = coefficients or _default_tariffs(req, timestamps)
 
         # Minimize total energy cost
         prob += pulp.lpSum(x[t] * tariffs[t] for t in range(n))
@@ -120,8 +169,8 @@ def optimize_energy_schedule(
         est_emissions_optimized = None
 
     elif req.mode == OptimizationMode.emissions:
-        # Build emission factor profile (kg CO2 / kWh)
-        emission_factors = _build_emission_profile(timestamps)
+        # Emission factor profile (kg CO2 / kWh)
+        emission_factors = coefficients or _build_emission_profile(timestamps)
 
         # Minimize total emissions
         prob += pulp.lpSum(x[t] * emission_factors[t] for t in range(n))
@@ -137,7 +186,8 @@ def optimize_energy_schedule(
         raise ValueError(f"Unsupported optimization mode: {req.mode}")
 
     # 4) Solve
-    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+    with timed("solver"):
+        prob.solve(pulp.PULP_CBC_CMD(msg=False))
 
     if pulp.LpStatus[prob.status] != "Optimal":
         raise RuntimeError(f"Optimization failed: {pulp.LpStatus[prob.status]}")
@@ -147,32 +197,27 @@ def optimize_energy_schedule(
 
     # If cost/emissions mode, compute optimized metrics
     if req.mode == OptimizationMode.cost:
-        day_tariff = req.day_tariff if req.day_tariff is not None else 8.0
-        night_tariff = req.night_tariff if req.night_tariff is not None else 5.0
-        tariffs = _build_tariff_profile(timestamps, day_tariff, night_tariff)
         estimated_cost_optimized = sum(
             optimized_loads[t] * tariffs[t] for t in range(n)
         )
 
     if req.mode == OptimizationMode.emissions:
-        emission_factors = _build_emission_profile(timestamps)
         est_emissions_optimized = sum(
             optimized_loads[t] * emission_factors[t] for t in range(n)
         )
 
-    # 5) Build response object
-    schedule_items: list[EnergyOptimizationScheduleItem] = []
-    for idx in range(n):
-        schedule_items.append(
-            EnergyOptimizationScheduleItem(
-                hour_index=idx,
-                timestamp=timestamps[idx],
-                baseline_kw=baseline[idx],
-                optimized_kw=optimized_loads[idx],
-            )
-        )
+    # 5) Build response (plain dict shaped like EnergyOptimizationResult)
+    schedule_items = [
+        {
+            "hour_index": idx,
+            "timestamp": timestamps[idx],
+            "baseline_kw": baseline[idx],
+            "optimized_kw": optimized_loads[idx],
+        }
+        for idx in range(n)
+    ]
 
-    result = EnergyOptimizationResult(
+    result = dict(
         building_id=req.building_id,
         hours=n,
         mode=req.mode,
@@ -0,0 +1,212 @@
+"""
+Composite dashboard: several panels in one request.
+
+The UI opens with separate calls for the summary, intensity map, building
+list and per-building forecasts, each with its own session and several of
+them scanning the same 24h of readings. `render_panels` takes a list of
+panel specs and:
+
+  1) works out which shared inputs the panels need ("energy_24h": kWh per
+     building over the last 24h, with the load range the summary needs)
+     and loads each of them once, concurrently;
+  2) runs every panel concurrently in the threadpool, each with its own
+     session (sessions are not thread-safe), reading the shared inputs
+     instead of re-querying;
+  3) returns one result per panel. Building lists are read with their
+     filters and limit in SQL, never the whole table; a panel with invalid params (checked
+     against its `schemas.PANEL_PARAMS` model) or a failing handler reports
+     its error without failing the others.
+
+Forecast panels go through `run_heavy` with the same key as
+GET /energy/forecast, so they coalesce with it and obey the same limits.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import case, exists, func
+from starlette.concurrency import run_in_threadpool
+
+from .. import models, partitions, schemas
+from ..concurrency import forecast_limiter, run_heavy
+from ..config import settings
+from ..database import ReadSessionLocal, SessionLocal
+from .analytics import DASHBOARD_SNAPSHOT, compute_dashboard_summary, latest_snapshot
+from .education_models import compute_institution_risk, latest_institution_risk
+from .energy_forecasting import forecast_building_energy, latest_forecast_batch
+
+logger = logging.getLogger("app.panels")
+
+BUILDING_FIELDS = ("id", "name", "type", "latitude", "longitude", "city_zone")
+
+
+# Building ids per IN (...) when matching buildings against the 24h totals
+ID_CHUNK = 1000
+
+
+# ===== Shared inputs (each loaded once per request) =====
+def _load_energy_24h(db) -> Dict[int, tuple]:
+    """building_id -> (kWh, max, min of unflagged readings) over the last 24h."""
+    since = datetime.utcnow() - timedelta(hours=24)
+    readings = partitions.readings(db, since)
+    flagged = exists().where(
+        models.Anomaly.sensor_id == readings.c.sensor_id,
+        models.Anomaly.timestamp == readings.c.timestamp,
+    )
+    unflagged = case((~flagged, readings.c.value))
+    rows = (
+        db.query(
+            models.Sensor.building_id,
+            func.sum(readings.c.value),
+            func.max(unflagged),
+            func.min(unflagged),
+        )
+        .join(readings, readings.c.sensor_id == models.Sensor.id)
+        .filter(readings.c.timestamp >= since)
+        .group_by(models.Sensor.building_id)
+    )
+    return {building_id: (float(total or 0.0), hi, lo) for building_id, total, hi, lo in rows}
+
+
+SHARED: Dict[str, Callable] = {
+    "energy_24h": _load_energy_24h,
+}
+
+
+def _building_query(db, params):
+    query = db.query(*(getattr(models.Building, f) for f in BUILDING_FIELDS))
+    if params.type is not None:
+        query = query.filter(models.Building.type == params.type)
+    if params.city_zone is not None:
+        query = query.filter(models.Building.city_zone == params.city_zone)
+    return query.order_by(models.Building.id)
+
+
+def _with_session(fn: Callable, *args, write: bool = False):
+    db = (SessionLocal if write else ReadSessionLocal)()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+# ===== Panels =====
+def _summary(db, shared, params) -> Dict:
+    data = None
+    if settings.DASHBOARD_MAX_AGE_S:
+        data = latest_snapshot(db, DASHBOARD_SNAPSHOT, settings.DASHBOARD_MAX_AGE_S)
+    if data is None:
+        highs = [hi for _, hi, _ in shared["energy_24h"].values() if hi is not None]
+        lows = [lo for _, _, lo in shared["energy_24h"].values() if lo is not None]
+        day_range = (max(highs, default=0.0), min(lows, default=0.0))
+        data = compute_dashboard_summary(db, day_range=day_range)
+    return data
+
+
+def _intensity(db, shared, params) -> List[Dict]:
+    totals = shared["energy_24h"]
+    ids = sorted(totals)
+    out = []
+    for i in range(0, len(ids), ID_CHUNK):
+        rows = (
+            _building_query(db, params)
+            .filter(models.Building.id.in_(ids[i:i + ID_CHUNK]))
+            .limit(params.limit - len(out))
+        )
+        out += [
+            {
+                "building_id": r.id,
+                **{f: getattr(r, f) for f in BUILDING_FIELDS if f != "id"},
+                "total_kwh_24h": totals[r.id][0],
+            }
+            for r in rows
+        ]
+        if len(out) >= params.limit:
+            break
+    return out
+
+
+def _buildings(db, shared, params) -> List[Dict]:
+    rows = _building_query(db, params).limit(params.limit)
+    return [dict(zip(BUILDING_FIELDS, r)) for r in rows]
+
+
+def _risk(db, shared, params) -> Dict:
+    institution_id = params.institution_id
+    forecast = None
+    if settings.RISK_MAX_AGE_S:
+        forecast = latest_institution_risk(db, institution_id, settings.RISK_MAX_AGE_S)
+    if forecast is None:
+        forecast = compute_institution_risk(db, institution_id)
+    return schemas.EducationForecastOut.from_orm(forecast).dict()
+
+
+async def _forecast(shared, params, request):
+    building_id, horizon_hours = params.building_id, params.horizon_hours
+
+    def compute():
+        forecasts = None
+        if settings.FORECAST_MAX_AGE_S:
+            forecasts = _with_session(
+                latest_forecast_batch, building_id, horizon_hours, settings.FORECAST_MAX_AGE_S
+            )
+        if forecasts is None:
+            db, read_db = SessionLocal(), ReadSessionLocal()
+            try:
+                forecasts = forecast_building_energy(
+                    db, building_id, horizon_hours=horizon_hours, read_db=read_db
+                )
+            finally:
+                db.close()
+                read_db.close()
+        return forecasts
+
+    return await run_heavy(
+        forecast_limiter, ("forecast", building_id, horizon_hours), compute, request=request
+    )
+
+
+# type -> (shared inputs needed, sync handler or None, needs the primary)
+PANELS: Dict[str, tuple] = {
+    "summary": (("energy_24h",), _summary, False),
+    "intensity": (("energy_24h",), _intensity, False),
+    "buildings": ((), _buildings, False),
+    "risk": ((), _risk, True),  # computes and stores a forecast on a miss
+    "forecast": ((), None, True),
+}
+
+
+async def _render(spec: schemas.PanelSpec, shared: Dict[str, Any], request) -> Dict:
+    needs, handler, write = PANELS[spec.type.value]
+    try:
+        params = schemas.PANEL_PARAMS[spec.type].parse_obj(spec.params)
+    except ValidationError as exc:
+        return {"id": spec.id, "type": spec.type, "ok": False, "error": f"Bad params: {exc}"}
+    try:
+        if handler is None:
+            data = await _forecast(shared, params, request)
+        else:
+            data = await run_in_threadpool(
+                _with_session, handler, shared, params, write=write
+            )
+    except HTTPException as exc:
+        return {"id": spec.id, "type": spec.type, "ok": False, "error": str(exc.detail)}
+    except Exception:
+        logger.exception("Panel %s (%s) failed", spec.id, spec.type.value)
+        return {"id": spec.id, "type": spec.type, "ok": False, "error": "Internal error"}
+    return {"id": spec.id, "type": spec.type, "ok": True, "data": data}
+
+
+async def render_panels(specs: List[schemas.PanelSpec], request=None) -> List[Dict]:
+    # 1) shared inputs, loaded once and concurrently
+    needed = sorted({name for spec in specs for name in PANELS[spec.type.value][0]})
+    loaded = await asyncio.gather(
+        *(run_in_threadpool(_with_session, SHARED[name]) for name in needed)
+    )
+    shared = dict(zip(needed, loaded))
+
+    # 2) all panels concurrently; results keep the request order
+    return list(await asyncio.gather(*(_render(spec, shared, request) for spec in specs)))
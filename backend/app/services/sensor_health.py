@@ -0,0 +1,186 @@
+"""
+Incremental sensor health tracking.
+
+Every ingested reading updates its sensor's `sensor_health` row in O(1):
+last-seen time, an EWMA of the reporting interval (the expected cadence),
+a gap counter (intervals longer than SENSOR_GAP_FACTOR x cadence) and a
+run-length of identical values for stuck-meter detection. Staleness depends
+on the current time, so it is derived when health is read, not stored.
+
+`stuck_sensor_ids` lets the forecaster leave broken meters out of building
+totals.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..database import dialect_insert
+
+# Weight of the newest interval in the cadence EWMA
+CADENCE_ALPHA = 0.2
+# Readings needed before gaps are judged against the learned cadence
+MIN_READINGS_FOR_GAPS = 3
+# Relative tolerance for "same value" in stuck detection
+STUCK_TOLERANCE = 1e-9
+
+
+def _update(health: models.SensorHealth, timestamp: datetime, value: float):
+    if health.reading_count is None:  # new row, column defaults not applied yet
+        health.reading_count = 0
+        health.gap_count = 0
+        health.repeat_count = 0
+        health.is_stuck = False
+
+    if health.last_seen is None:
+        health.first_seen = health.last_seen = timestamp
+        health.last_value = value
+        health.reading_count = 1
+        return
+
+    health.reading_count += 1
+    interval = (timestamp - health.last_seen).total_seconds()
+    if interval <= 0:
+        # Late or duplicate reading: counts, but says nothing about cadence.
+        health.first_seen = min(health.first_seen or timestamp, timestamp)
+        return
+
+    if health.cadence_s is None:
+        health.cadence_s = interval
+    elif (
+        health.reading_count > MIN_READINGS_FOR_GAPS
+        and interval > settings.SENSOR_GAP_FACTOR * health.cadence_s
+    ):
+        health.gap_count += 1
+        health.last_gap_at = timestamp  # gaps don't feed the cadence estimate
+    else:
+        health.cadence_s += CADENCE_ALPHA * (interval - health.cadence_s)
+
+    last = health.last_value
+    if last is not None and abs(value - last) <= STUCK_TOLERANCE * max(abs(last), 1.0):
+        health.repeat_count += 1
+    else:
+        health.repeat_count = 0
+    health.is_stuck = health.repeat_count + 1 >= settings.SENSOR_STUCK_REPEATS
+
+    health.last_seen = timestamp
+    health.last_value = value
+
+
+def record_readings(db: Session, readings: Iterable[Tuple[int, datetime, float]]):
+    """
+    Fold (sensor_id, timestamp, value) readings into sensor health. Loads
+    each affected row once, locked until the caller commits so concurrent
+    ingests of the same sensor apply one after the other.
+    """
+    by_sensor: Dict[int, List[Tuple[datetime, float]]] = {}
+    for sensor_id, timestamp, value in readings:
+        by_sensor.setdefault(sensor_id, []).append((timestamp, float(value)))
+    if not by_sensor:
+        return
+
+    upsert = dialect_insert(db)
+    if upsert is not None:
+        # Create missing rows up front; a plain add would race another
+        # ingest into a duplicate key.
+        table = models.SensorHealth.__table__
+        db.execute(
+            upsert(table).on_conflict_do_nothing(index_elements=[table.c.sensor_id]),
+            [
+                {"sensor_id": s, "reading_count": 0, "gap_count": 0, "repeat_count": 0, "is_stuck": False}
+                for s in by_sensor
+            ],
+        )
+    existing = {
+        h.sensor_id: h
+        for h in db.query(models.SensorHealth)
+        .filter(models.SensorHealth.sensor_id.in_(list(by_sensor)))
+        .order_by(models.SensorHealth.sensor_id)
+        .with_for_update()
+    }
+    for sensor_id, points in by_sensor.items():
+        health = existing.get(sensor_id)
+        if health is None:
+            health = models.SensorHealth(sensor_id=sensor_id)
+            db.add(health)
+        for timestamp, value in sorted(points, key=lambda p: p[0]):
+            _update(health, timestamp, value)
+
+
+def record_reading(db: Session, sensor_id: int, timestamp: datetime, value: float):
+    record_readings(db, [(sensor_id, timestamp, value)])
+
+
+def health_status(health: Optional[models.SensorHealth], now: datetime) -> str:
+    if health is None or health.last_seen is None:
+        return "unknown"
+    if health.is_stuck:
+        return "stuck"
+    if health.cadence_s:
+        silent = (now - health.last_seen).total_seconds()
+        if silent > settings.SENSOR_STALE_FACTOR * health.cadence_s:
+            return "stale"
+        # Recent gap: within the last ~day of expected readings.
+        if health.last_gap_at is not None and (
+            (now - health.last_gap_at).total_seconds() < 24 * 3600
+        ):
+            return "gappy"
+    return "ok"
+
+
+def list_sensor_health(
+    db: Session,
+    building_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 500,
+) -> List[Dict]:
+    query = (
+        db.query(models.Sensor.id, models.Sensor.building_id, models.SensorHealth)
+        .outerjoin(models.SensorHealth, models.SensorHealth.sensor_id == models.Sensor.id)
+        .order_by(models.Sensor.id)
+    )
+    if building_id is not None:
+        query = query.filter(models.Sensor.building_id == building_id)
+    if status == "stuck":
+        query = query.filter(models.SensorHealth.is_stuck.is_(True))
+
+    now = datetime.utcnow()
+    out = []
+    for sensor_id, sensor_building_id, health in query.yield_per(1000):
+        row_status = health_status(health, now)
+        if status is not None and row_status != status:
+            continue
+        out.append(
+            {
+                "sensor_id": sensor_id,
+                "building_id": sensor_building_id,
+                "status": row_status,
+                "first_seen": health.first_seen if health else None,
+                "last_seen": health.last_seen if health else None,
+                "last_value": health.last_value if health else None,
+                "reading_count": (health.reading_count or 0) if health else 0,
+                "cadence_s": health.cadence_s if health else None,
+                "gap_count": (health.gap_count or 0) if health else 0,
+                "last_gap_at": health.last_gap_at if health else None,
+                "is_stuck": bool(health.is_stuck) if health else False,
+            }
+        )
+        if len(out) >= limit:
+            break
+    return out
+
+
+def stuck_sensor_ids(db: Session, sensor_ids: List[int]) -> Set[int]:
+    if not sensor_ids:
+        return set()
+    rows = (
+        db.query(models.SensorHealth.sensor_id)
+        .filter(
+            models.SensorHealth.sensor_id.in_(sensor_ids),
+            models.SensorHealth.is_stuck.is_(True),
+        )
+        .all()
+    )
+    return {r[0] for r in rows}
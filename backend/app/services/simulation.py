@@ -0,0 +1,332 @@
+"""
+City-wide what-if simulation for the digital twin.
+
+Questions like "zone peak load if we add 50 schools in Whitefield" or "shift
+office HVAC by two hours" are answered from a typical-day load model:
+
+  1) `build_profile` turns the last SIMULATION_PROFILE_DAYS of readings into
+     a (building, meter type) x 24 matrix of mean kWh per hour of day. The
+     database does the aggregation (GROUP BY sensor and clock hour, then
+     sensor and hour of day), so at most sensors x 24 rows come back
+     whatever the history length. Buildings without readings get the
+     seed-data template for their type.
+  2) Rows are summed into groups keyed by (building type, zone, meter type).
+     Every scenario transform filters on those same keys, so scenarios work
+     on a groups x 24 matrix (tens to hundreds of rows) instead of one row
+     per building, and never touch the ORM.
+  3) A scenario is a list of transforms applied to a copy of that matrix:
+       scale          multiply matching load (0 removes it)
+       shift          move `fraction` of matching load by `hours` (wraps
+                      around the day)
+       add_buildings  add `count` buildings of `type` to `city_zone`, each
+                      with the city's mean profile for that type
+     followed by zone / city aggregation and peak search.
+
+The profile is cached per process for SIMULATION_PROFILE_TTL_S; a miss is
+built through `run_heavy`, so concurrent requests for the same history
+share one build and builds obey the simulation admission limit. Evaluating
+a scenario then costs on the order of 100 microseconds.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models, partitions
+from ..concurrency import run_heavy, simulation_limiter
+from ..config import settings
+from ..seed_data import base_load_kwh
+
+HOURS = 24
+METER_TYPES = ("energy_meter", "hvac_meter")
+
+GroupKey = Tuple[str, str, str]  # (building type, zone, meter type)
+
+
+@dataclass
+class CityProfile:
+    groups: List[GroupKey]
+    load: np.ndarray  # groups x 24, total kWh per hour of day
+    # mean per-building profile for (building type, meter type)
+    type_means: Dict[Tuple[str, str], np.ndarray]
+    buildings: int
+    built_at: datetime = field(default_factory=datetime.utcnow)
+
+    def __post_init__(self):
+        # Integer codes per group key so scenario filters are int compares,
+        # and a zones x groups one-hot so zone totals are one matmul.
+        self.codes: List[Dict[str, int]] = [{}, {}, {}]
+        columns = []
+        for i, names in enumerate(self.codes):
+            for key in self.groups:
+                names.setdefault(key[i], len(names))
+            columns.append(np.array([names[key[i]] for key in self.groups], dtype=np.int64))
+        self.types, self.zones, self.meters = columns
+        self.zone_names = list(self.codes[1])
+        self.zone_onehot = (
+            np.arange(len(self.zone_names))[:, None] == self.zones[None, :]
+        ).astype(np.float64)
+
+
+def _template(btype: str, meter: str) -> np.ndarray:
+    return np.array([base_load_kwh(btype, meter, h) for h in range(HOURS)], dtype=np.float64)
+
+
+def _hour_of_day_means(db: Session, since: datetime):
+    """SELECT sensor_id, hour of day, mean of the hourly totals since `since`."""
+    source = partitions.readings(db, since)
+    ts = source.c.timestamp
+    if db.get_bind().dialect.name == "postgresql":
+        clock_hour, hour_of_day = func.date_trunc("hour", ts), cast(func.extract("hour", ts), Integer)
+    else:
+        clock_hour, hour_of_day = func.strftime("%Y-%m-%d %H", ts), cast(func.strftime("%H", ts), Integer)
+    hourly = (
+        select(
+            source.c.sensor_id.label("sensor_id"),
+            hour_of_day.label("hour"),
+            func.sum(source.c.value).label("total"),
+        )
+        .where(ts >= since)
+        .group_by(source.c.sensor_id, clock_hour, hour_of_day)
+        .subquery()
+    )
+    return select(hourly.c.sensor_id, hourly.c.hour, func.avg(hourly.c.total)).group_by(
+        hourly.c.sensor_id, hourly.c.hour
+    )
+
+
+def build_profile(db: Session, days: int) -> CityProfile:
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+
+    buildings = {
+        b.id: (b.type, b.city_zone or "unknown")
+        for b in db.query(models.Building.id, models.Building.type, models.Building.city_zone)
+    }
+    sensors = db.query(models.Sensor.id, models.Sensor.building_id, models.Sensor.sensor_type).filter(
+        models.Sensor.is_active.is_(True)
+    ).all()
+    sensor_pos = {s.id: i for i, s in enumerate(sensors)}
+
+    # 1) mean kWh per (sensor, hour of day): sum per clock hour, then average
+    #    those hourly totals over the days that have them.
+    per_sensor = np.zeros((len(sensors), HOURS))
+    for sensor_id, hour, mean in db.execute(_hour_of_day_means(db, since)):
+        i = sensor_pos.get(sensor_id)
+        if i is not None:
+            per_sensor[i, int(hour)] = mean or 0.0
+    has_data = per_sensor.any(axis=1)
+
+    # 2) rows per (building, meter type); template where a meter has no data
+    rows_by_key: Dict[Tuple[int, str], np.ndarray] = {}
+    for i, s in enumerate(sensors):
+        if s.building_id not in buildings:
+            continue
+        btype = buildings[s.building_id][0]
+        meter = s.sensor_type or "energy_meter"
+        profile = per_sensor[i] if has_data[i] else _template(btype, meter)
+        key = (s.building_id, meter)
+        rows_by_key[key] = rows_by_key.get(key, 0.0) + profile
+
+    # 3) groups and per-type means
+    index: Dict[GroupKey, int] = {}
+    group_rows: List[np.ndarray] = []
+    type_sums: Dict[Tuple[str, str], np.ndarray] = {}
+    type_counts: Dict[str, int] = {}
+    for building_id, (btype, zone) in buildings.items():
+        type_counts[btype] = type_counts.get(btype, 0) + 1
+    for (building_id, meter), profile in rows_by_key.items():
+        btype, zone = buildings[building_id]
+        key = (btype, zone, meter)
+        if key not in index:
+            index[key] = len(group_rows)
+            group_rows.append(np.zeros(HOURS))
+        group_rows[index[key]] += profile
+        type_sums[(btype, meter)] = type_sums.get((btype, meter), 0.0) + profile
+
+    type_means = {
+        (btype, meter): total / type_counts[btype] for (btype, meter), total in type_sums.items()
+    }
+    load = np.vstack(group_rows) if group_rows else np.zeros((0, HOURS))
+    return CityProfile(list(index), load, type_means, buildings=len(buildings))
+
+
+class _ProfileCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[int, Tuple[float, CityProfile]] = {}
+
+    def cached(self, days: int) -> Optional[CityProfile]:
+        with self._lock:
+            item = self._items.get(days)
+            if item and time.monotonic() - item[0] < settings.SIMULATION_PROFILE_TTL_S:
+                return item[1]
+        return None
+
+    def build(self, db: Session, days: int) -> CityProfile:
+        profile = build_profile(db, days)
+        with self._lock:
+            self._items[days] = (time.monotonic(), profile)
+        return profile
+
+    async def get(self, db: Session, days: int, request=None) -> CityProfile:
+        profile = self.cached(days)
+        if profile is None:
+            profile = await run_heavy(
+                simulation_limiter, ("simulation_profile", days), self.build, db, days,
+                request=request,
+            )
+        return profile
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+profiles = _ProfileCache()
+
+
+# ===== Scenario evaluation =====
+FILTERS = (("type", 0), ("city_zone", 1), ("sensor_type", 2))
+
+
+class _State:
+    """
+    Mutable copy of the group matrix for one scenario. Groups added by
+    `add_buildings` that the city does not have yet are appended after the
+    profile's rows; zones are coded on the fly.
+    """
+
+    def __init__(self, profile: CityProfile):
+        self.profile = profile
+        self.load = profile.load.copy()
+        self.columns = [profile.types, profile.zones, profile.meters]
+        self.codes = profile.codes
+        self.extra: Dict[GroupKey, int] = {}
+
+    def _code(self, axis: int, name: str) -> int:
+        codes = self.codes[axis]
+        if name not in codes:
+            if codes is self.profile.codes[axis]:
+                self.codes = [dict(c) if i == axis else c for i, c in enumerate(self.codes)]
+                codes = self.codes[axis]
+            codes[name] = len(codes)
+        return codes[name]
+
+    def mask(self, t) -> np.ndarray:
+        mask = np.ones(len(self.load), dtype=bool)
+        for attr, axis in FILTERS:
+            name = getattr(t, attr)
+            if name is not None:
+                code = self.codes[axis].get(name, -1)
+                mask &= self.columns[axis] == code
+        return mask
+
+    def add(self, key: GroupKey, profile: np.ndarray):
+        codes = [self._code(axis, name) for axis, name in enumerate(key)]
+        match = np.flatnonzero(
+            (self.columns[0] == codes[0]) & (self.columns[1] == codes[1]) & (self.columns[2] == codes[2])
+        )
+        if len(match):
+            self.load[match[0]] += profile
+            return
+        self.columns = [np.append(col, code) for col, code in zip(self.columns, codes)]
+        self.load = np.vstack([self.load, profile[None, :]])
+
+
+def _apply(state: _State, t):
+    op = t.op.value
+    if op == "scale":
+        state.load[state.mask(t)] *= t.factor
+    elif op == "shift":
+        mask = state.mask(t)
+        rows = state.load[mask]
+        state.load[mask] = (1.0 - t.fraction) * rows + t.fraction * np.roll(rows, t.hours, axis=1)
+    elif op == "add_buildings":
+        if t.type is None or t.city_zone is None:
+            raise ValueError("add_buildings needs type and city_zone")
+        meters = [t.sensor_type] if t.sensor_type else list(METER_TYPES)
+        for meter in meters:
+            mean = state.profile.type_means.get((t.type, meter))
+            if mean is None:
+                mean = _template(t.type, meter) if meter == "energy_meter" else np.zeros(HOURS)
+            state.add((t.type, t.city_zone, meter), t.count * t.factor * mean)
+    else:
+        raise ValueError(f"Unknown transform: {op}")
+
+
+def _aggregate(state: _State):
+    """(zone names, zones x 24 load)."""
+    profile = state.profile
+    base = len(profile.groups)
+    zone_load = profile.zone_onehot @ state.load[:base]
+    zone_names = list(state.codes[1])
+    if len(state.load) > base or len(zone_names) > len(profile.zone_names):
+        zone_load = np.vstack([zone_load, np.zeros((len(zone_names) - len(zone_load), HOURS))])
+        for row, zone in zip(state.load[base:], state.columns[1][base:]):
+            zone_load[zone] += row
+    return zone_names, zone_load
+
+
+def _summarize(name: str, zone_names: List[str], zone_load: np.ndarray,
+               baseline_peaks: Dict[str, float], include_profiles: bool) -> Dict:
+    city = zone_load.sum(axis=0)
+    peaks = zone_load.max(axis=1, initial=0.0)
+    base = np.array([baseline_peaks.get(zone, 0.0) for zone in zone_names])
+    columns = zip(
+        zone_names,
+        np.round(peaks, 3).tolist(),
+        zone_load.argmax(axis=1).tolist() if len(zone_load) else [],
+        np.round(zone_load.sum(axis=1), 3).tolist(),
+        np.round(peaks - base, 3).tolist(),
+    )
+    zones = [
+        {"city_zone": z, "peak_kw": p, "peak_hour": h, "daily_kwh": d, "delta_peak_kw": dp}
+        for z, p, h, d, dp in columns
+    ]
+    if include_profiles:
+        for item, row in zip(zones, np.round(zone_load, 3).tolist()):
+            item["profile"] = row
+    return {
+        "name": name,
+        "city_peak_kw": round(float(city.max(initial=0.0)), 3),
+        "city_peak_hour": int(city.argmax()),
+        "city_daily_kwh": round(float(city.sum()), 3),
+        "zones": zones,
+        "city_profile": np.round(city, 3).tolist() if include_profiles else None,
+    }
+
+
+def simulate(profile: CityProfile, scenarios, include_profiles: bool = False) -> Dict:
+    """Baseline plus one result per scenario (each a list of transforms)."""
+    base_zones, base_load = _aggregate(_State(profile))
+    baseline_peaks = dict(zip(base_zones, base_load.max(axis=1, initial=0.0).tolist()))
+    baseline = _summarize("baseline", base_zones, base_load, baseline_peaks, include_profiles)
+
+    results = []
+    for scenario in scenarios:
+        state = _State(profile)
+        for t in scenario.transforms:
+            _apply(state, t)
+        zone_names, zone_load = _aggregate(state)
+        results.append(
+            _summarize(scenario.name, zone_names, zone_load, baseline_peaks, include_profiles)
+        )
+    return {
+        "buildings": profile.buildings,
+        "profile_built_at": profile.built_at,
+        "baseline": baseline,
+        "scenarios": results,
+    }
+
+
+async def simulate_city(db: Session, scenarios, include_profiles: bool = False,
+                        days: Optional[int] = None, request=None) -> Dict:
+    profile = await profiles.get(db, days or settings.SIMULATION_PROFILE_DAYS, request=request)
+    return await run_in_threadpool(simulate, profile, scenarios, include_profiles)
@@ -0,0 +1,265 @@
+"""
+In-memory spatial index over building coordinates.
+
+Buildings are bucketed into a fixed lat/lon grid (CELL_DEG, ~1.1 km) and
+stored as NumPy arrays sorted by cell key, so the cells of one grid row that
+overlap a viewport form one contiguous slice found with `searchsorted`.
+Bounding-box, radius and zoom-level cluster queries then only touch the
+buildings in (or next to) the requested area, independent of city size.
+
+The index is per process and rebuilt from the `buildings` table when the
+table changes — a row added, removed or updated (`Building.updated_at`, set
+by the ORM; raw SQL updates must set it too). Creating a building through
+the API adds it immediately.
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+
+CELL_DEG = 0.01
+N_COLS = int(math.ceil(360.0 / CELL_DEG))
+# How often (seconds) to check whether another worker changed the table
+REFRESH_INTERVAL_S = 30.0
+EARTH_RADIUS_KM = 6371.0088
+# Buildings returned by `within` / `near` unless the caller asks for fewer
+DEFAULT_LIMIT = 500
+
+
+def _cell_keys(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    rows = np.floor((lat + 90.0) / CELL_DEG).astype(np.int64)
+    cols = np.floor((lon + 180.0) / CELL_DEG).astype(np.int64)
+    return rows * N_COLS + cols
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """
+    Parallel arrays sorted by cell key. Never mutated: writers build a new
+    snapshot and swap the single `SpatialIndex._snapshot` reference, so a
+    reader that took a snapshot always sees aligned arrays.
+    """
+    keys: np.ndarray
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    names: np.ndarray
+    types: np.ndarray
+    zones: np.ndarray
+
+    @classmethod
+    def build(cls, ids, lats, lons, names, types, zones) -> "_Snapshot":
+        lat = np.asarray(lats, dtype=np.float64)
+        lon = np.asarray(lons, dtype=np.float64)
+        keys = _cell_keys(lat, lon)
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            keys[order],
+            np.asarray(ids, dtype=np.int64)[order],
+            lat[order],
+            lon[order],
+            np.asarray(names, dtype=object)[order],
+            np.asarray(types, dtype=object)[order],
+            np.asarray(zones, dtype=object)[order],
+        )
+
+    def insert(self, building_id, lat, lon, name, type_, zone) -> "_Snapshot":
+        """Copy with one more building at its sorted position (no re-sort)."""
+        key = _cell_keys(np.array([lat], dtype=np.float64), np.array([lon], dtype=np.float64))[0]
+        at = int(np.searchsorted(self.keys, key, side="right"))
+        return _Snapshot(
+            np.insert(self.keys, at, key),
+            np.insert(self.ids, at, building_id),
+            np.insert(self.lat, at, lat),
+            np.insert(self.lon, at, lon),
+            np.insert(self.names, at, name),
+            np.insert(self.types, at, type_),
+            np.insert(self.zones, at, zone),
+        )
+
+
+_EMPTY = _Snapshot.build([], [], [], [], [], [])
+
+
+class SpatialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()  # serializes writers; readers don't lock
+        self._version = None
+        self._checked_at = 0.0
+        self._snapshot = _EMPTY
+
+    # ----- maintenance
+    def _table_version(self, db: Session):
+        return tuple(
+            db.query(
+                func.count(models.Building.id),
+                func.max(models.Building.id),
+                func.max(models.Building.updated_at),
+            ).one()
+        )
+
+    def ensure_fresh(self, db: Session):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < REFRESH_INTERVAL_S:
+            return
+        version = self._table_version(db)
+        self._checked_at = now
+        if version == self._version:
+            return
+        with self._lock:
+            rows = (
+                db.query(
+                    models.Building.id,
+                    models.Building.latitude,
+                    models.Building.longitude,
+                    models.Building.name,
+                    models.Building.type,
+                    models.Building.city_zone,
+                )
+                .filter(
+                    models.Building.latitude.isnot(None),
+                    models.Building.longitude.isnot(None),
+                )
+                .all()
+            )
+            self._snapshot = _Snapshot.build(*zip(*rows)) if rows else _EMPTY
+            self._version = version
+
+    def add(self, building: models.Building):
+        """Insert one building without a full rebuild."""
+        if building.latitude is None or building.longitude is None:
+            return
+        with self._lock:
+            self._snapshot = self._snapshot.insert(
+                building.id, building.latitude, building.longitude,
+                building.name, building.type, building.city_zone,
+            )
+            if self._version is not None:
+                count, max_id, updated_at = self._version
+                self._version = (
+                    count + 1,
+                    max(max_id or 0, building.id),
+                    max(filter(None, (updated_at, building.updated_at)), default=None),
+                )
+
+    # ----- queries
+    @staticmethod
+    def _bbox_positions(snap: _Snapshot, south, west, north, east) -> np.ndarray:
+        """Positions in `snap` of buildings inside the bounding box."""
+        row_lo = int(math.floor((south + 90.0) / CELL_DEG))
+        row_hi = int(math.floor((north + 90.0) / CELL_DEG))
+        col_lo = int(math.floor((west + 180.0) / CELL_DEG))
+        col_hi = int(math.floor((east + 180.0) / CELL_DEG))
+
+        rows = np.arange(row_lo, row_hi + 1, dtype=np.int64)
+        starts = np.searchsorted(snap.keys, rows * N_COLS + col_lo, side="left")
+        ends = np.searchsorted(snap.keys, rows * N_COLS + col_hi, side="right")
+        spans = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        if not spans:
+            return np.array([], dtype=np.int64)
+        pos = np.concatenate(spans)
+        # Edge cells are only partially inside the box.
+        mask = (
+            (snap.lat[pos] >= south)
+            & (snap.lat[pos] <= north)
+            & (snap.lon[pos] >= west)
+            & (snap.lon[pos] <= east)
+        )
+        return pos[mask]
+
+    @staticmethod
+    def _rows(snap: _Snapshot, pos: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "id": int(snap.ids[i]),
+                "name": snap.names[i],
+                "type": snap.types[i],
+                "latitude": float(snap.lat[i]),
+                "longitude": float(snap.lon[i]),
+                "city_zone": snap.zones[i],
+            }
+            for i in pos
+        ]
+
+    def points_within(self, south, west, north, east):
+        """(ids, lat, lon) arrays for the buildings inside the bounding box."""
+        snap = self._snapshot
+        pos = self._bbox_positions(snap, south, west, north, east)
+        return snap.ids[pos], snap.lat[pos], snap.lon[pos]
+
+    def within(self, south, west, north, east, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        snap = self._snapshot
+        pos = self._bbox_positions(snap, south, west, north, east)
+        return self._rows(snap, pos[:limit])
+
+    def near(self, lat, lon, radius_km, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        snap = self._snapshot
+        pos = self._bbox_positions(snap, lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        dist = haversine_km(lat, lon, snap.lat[pos], snap.lon[pos])
+        inside = dist <= radius_km
+        pos, dist = pos[inside], dist[inside]
+        order = np.argsort(dist)[:limit]
+        rows = self._rows(snap, pos[order])
+        for row, d in zip(rows, dist[order]):
+            row["distance_km"] = round(float(d), 4)
+        return rows
+
+    def clusters(self, south, west, north, east, zoom: int, cells_per_tile: int = 4):
+        """
+        Group visible buildings into grid clusters sized for `zoom` (about
+        64px at the default 4 cells per 256px web-map tile). Clusters of one
+        building are returned as that building.
+        """
+        snap = self._snapshot
+        pos = self._bbox_positions(snap, south, west, north, east)
+        if len(pos) == 0:
+            return []
+
+        cell = 360.0 / (2 ** zoom) / cells_per_tile
+        lat, lon = snap.lat[pos], snap.lon[pos]
+        gx = np.floor((lon + 180.0) / cell).astype(np.int64)
+        gy = np.floor((lat + 90.0) / cell).astype(np.int64)
+        _, inverse, counts = np.unique(
+            gy * (int(360.0 / cell) + 1) + gx, return_inverse=True, return_counts=True
+        )
+        lat_mean = np.bincount(inverse, weights=lat) / counts
+        lon_mean = np.bincount(inverse, weights=lon) / counts
+        first = np.full(len(counts), -1, dtype=np.int64)
+        first[inverse[::-1]] = pos[::-1]  # any member position per cluster
+
+        out = []
+        for c in range(len(counts)):
+            if counts[c] == 1:
+                row = self._rows(snap, [first[c]])[0]
+                row["count"] = 1
+                out.append(row)
+            else:
+                out.append(
+                    {
+                        "latitude": float(lat_mean[c]),
+                        "longitude": float(lon_mean[c]),
+                        "count": int(counts[c]),
+                    }
+                )
+        return out
+
+
+spatial_index = SpatialIndex()
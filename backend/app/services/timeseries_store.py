@@ -0,0 +1,277 @@
+"""
+Columnar on-disk store of hourly kWh per building.
+
+One file per building (`b<id>.f32`): a 24-byte header (magic, the first
+hour covered and the last hour with data, as hours since the Unix epoch)
+followed by one float32 per hour, NaN where no reading arrived. Files are
+memory-mapped with NumPy, so reading a 14-day window is a slice of the page
+cache — no ORM objects, dicts or DataFrames — and every worker process
+shares the same pages.
+
+Ingest keeps the store in sync (`add` / `add_many`). Data that predates
+enabling TIMESERIES_STORE_ENABLED, or that was written around ingest (e.g.
+by `seed_data` / `synthetic_data` with the flag off), must be loaded with
+
+    python -m app.services.timeseries_store rebuild
+
+Readers fall back to the database for buildings without a file.
+
+Writers serialize on an exclusive `fcntl` lock on a per-building lock file
+where available (POSIX), so several workers can ingest concurrently. Values
+are accumulated in place; changing the first hour (backdated data) writes a
+new file and swaps it in with `os.replace`, so a reader always sees a header
+and data from the same file.
+"""
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models, partitions
+from ..config import settings
+
+try:
+    import fcntl
+except ImportError:  # optional dependency (not available on Windows)
+    fcntl = None
+
+MAGIC = b"TSF2\0\0\0\0"
+HEADER = 24  # magic (8) + int64 base hour (8) + int64 last hour with data (8)
+# Files grow in steps of this many hours (one week) to limit remapping
+GROW_HOURS = 24 * 7
+# Mapped files kept open per process (each one is a kernel mapping)
+MAX_OPEN_MAPS = 1024
+
+
+def to_hour(ts: datetime) -> int:
+    """Hours since the Unix epoch (UTC, naive datetimes as stored)."""
+    return int(np.datetime64(ts, "h").astype(np.int64))
+
+
+def _accumulate(data: np.ndarray, idx: np.ndarray, values: np.ndarray):
+    current = data[idx]
+    # First value for an hour replaces the NaN placeholder.
+    data[idx] = np.where(np.isnan(current), 0.0, current)
+    np.add.at(data, idx, values)
+
+
+def hour_features(hours: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(hour_of_day, weekday with 0=Mon) for epoch-hour integers."""
+    hours = np.asarray(hours, dtype=np.int64)
+    # 1970-01-01 was a Thursday (weekday 3)
+    return hours % 24, (hours // 24 + 3) % 7
+
+
+class TimeseriesStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._maps: "OrderedDict[int, Tuple[tuple, int, int, np.memmap]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, building_id: int) -> str:
+        return os.path.join(self.root, f"b{building_id}.f32")
+
+    # ----- reading
+    def _open(self, building_id: int) -> Optional[Tuple[int, int, np.memmap]]:
+        """(base hour, last hour, data) of a building file, or None."""
+        try:
+            fh = open(self._path(building_id), "rb")
+        except FileNotFoundError:
+            return None
+        with fh:
+            # Header and mapping come from the same open file, even if a
+            # writer swaps in a rebased one meanwhile.
+            st = os.fstat(fh.fileno())
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            with self._lock:
+                cached = self._maps.get(building_id)
+                if cached is not None and cached[0] == key:
+                    self._maps.move_to_end(building_id)
+                    return cached[1:]
+            header = fh.read(HEADER)
+            if len(header) < HEADER or header[:8] != MAGIC:
+                return None
+            base, last = (int(v) for v in np.frombuffer(header[8:], dtype=np.int64))
+            n = (st.st_size - HEADER) // 4
+            data = np.memmap(fh, dtype=np.float32, mode="r", offset=HEADER, shape=(n,))
+        with self._lock:
+            self._maps[building_id] = (key, base, last, data)
+            self._maps.move_to_end(building_id)
+            while len(self._maps) > MAX_OPEN_MAPS:
+                self._maps.popitem(last=False)
+        return base, last, data
+
+    def window(self, building_id: int, start: datetime, end: datetime) -> Tuple[int, np.ndarray]:
+        """
+        (first_hour, values) for the hours in [start, end). `values` is a
+        read-only view into the mapped file with NaN for missing hours.
+        """
+        lo, hi = to_hour(start), to_hour(end)
+        opened = self._open(building_id)
+        if opened is None:
+            return lo, np.empty(0, dtype=np.float32)
+        base, _, data = opened
+        a = min(max(lo - base, 0), len(data))
+        b = min(max(hi - base, 0), len(data))
+        return base + a, data[a:b]
+
+    def latest_hour(self, building_id: int) -> Optional[int]:
+        opened = self._open(building_id)
+        return None if opened is None else opened[1]
+
+    # ----- writing
+    @contextmanager
+    def _locked(self, building_id: int):
+        os.makedirs(self.root, exist_ok=True)
+        fd = os.open(self._path(building_id) + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def _replace(self, path: str, base: int, last: int, data: np.ndarray):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(MAGIC + np.array([base, last], dtype=np.int64).tobytes())
+            fh.write(data.tobytes())
+        os.replace(tmp, path)
+
+    def add_many(self, building_id: int, hours: np.ndarray, values: np.ndarray):
+        """Accumulate kWh into the given epoch hours of one building."""
+        hours = np.asarray(hours, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        if len(hours) == 0:
+            return
+        path = self._path(building_id)
+        lo, hi = int(hours.min()), int(hours.max())
+        with self._locked(building_id):
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                fd = None
+            header = os.pread(fd, HEADER, 0) if fd is not None else b""
+            existing = len(header) == HEADER and header[:8] == MAGIC
+            if existing:
+                base, last = (int(v) for v in np.frombuffer(header[8:], dtype=np.int64))
+                n = (os.fstat(fd).st_size - HEADER) // 4
+
+            if not existing or lo < base:
+                # New file, or data older than its first hour: write the
+                # whole series to a new file and swap it in.
+                if existing:
+                    old = np.frombuffer(os.pread(fd, n * 4, HEADER), dtype=np.float32)
+                    start, end, last = lo, max(base + n, hi + 1), max(last, hi)
+                else:
+                    old, base, start, end, last = np.empty(0, dtype=np.float32), lo, lo, hi + 1, hi
+                if fd is not None:
+                    os.close(fd)
+                data = np.full(max(end, start + GROW_HOURS) - start, np.nan, dtype=np.float32)
+                data[base - start:base - start + len(old)] = old
+                _accumulate(data, hours - start, values)
+                self._replace(path, start, last, data)
+                return
+
+            try:
+                if hi - base >= n:
+                    grow = max(hi - base + 1 - n, GROW_HOURS)
+                    os.pwrite(fd, np.full(grow, np.nan, dtype=np.float32).tobytes(), HEADER + n * 4)
+                    n += grow
+                data = np.memmap(path, dtype=np.float32, mode="r+", offset=HEADER, shape=(n,))
+                _accumulate(data, hours - base, values)
+                data.flush()
+                del data
+                if hi > last:
+                    os.pwrite(fd, np.int64(hi).tobytes(), 16)
+            finally:
+                os.close(fd)
+
+    def add(self, building_id: int, timestamp: datetime, value: float):
+        self.add_many(building_id, np.array([to_hour(timestamp)]), np.array([value]))
+
+    def drop(self, building_id: int):
+        try:
+            os.unlink(self._path(building_id))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._maps.pop(building_id, None)
+
+    def _stored_ids(self) -> set:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return set()
+        return {int(n[1:-4]) for n in names if n.startswith("b") and n.endswith(".f32")}
+
+    def rebuild(self, db: Session, building_ids: Optional[Iterable[int]] = None,
+                batch_size: int = 100_000) -> int:
+        """Recreate building files from `energy_readings` (active sensors only)."""
+        sensors = db.query(models.Sensor.id, models.Sensor.building_id).filter(
+            models.Sensor.is_active.is_(True)
+        )
+        if building_ids is not None:
+            building_ids = list(building_ids)
+            sensors = sensors.filter(models.Sensor.building_id.in_(building_ids))
+        sensor_building = dict(sensors.all())
+        if building_ids is None:
+            # Also clear files of buildings that no longer have readings.
+            targets = set(sensor_building.values()) | self._stored_ids()
+        else:
+            targets = set(building_ids)
+        for building_id in targets:
+            self.drop(building_id)
+
+        source = partitions.readings(db)
+        stmt = select(
+            source.c.sensor_id,
+            source.c.timestamp,
+            source.c.value,
+        ).execution_options(yield_per=batch_size)
+        if building_ids is not None:
+            stmt = stmt.where(source.c.sensor_id.in_(list(sensor_building)))
+
+        rows = 0
+        for chunk in db.execute(stmt).partitions(batch_size):
+            sensor_ids = np.fromiter((r[0] for r in chunk), dtype=np.int64, count=len(chunk))
+            hours = np.array([r[1] for r in chunk], dtype="datetime64[h]").astype(np.int64)
+            values = np.fromiter((r[2] or 0.0 for r in chunk), dtype=np.float64, count=len(chunk))
+            buildings = np.array([sensor_building.get(int(s), -1) for s in sensor_ids])
+            keep = buildings >= 0
+            buildings, hours, values = buildings[keep], hours[keep], values[keep]
+            for building_id in np.unique(buildings):
+                mask = buildings == building_id
+                self.add_many(int(building_id), hours[mask], values[mask])
+            rows += len(chunk)
+        return rows
+
+
+timeseries_store = TimeseriesStore(settings.TIMESERIES_STORE_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hourly time-series store.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--building", type=int, action="append", help="only these buildings")
+    args = parser.parse_args()
+
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = timeseries_store.rebuild(db, args.building)
+    finally:
+        db.close()
+    print(f"Indexed {rows:,} readings into {timeseries_store.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+File-backed cache shared by all worker processes on a host.
+
+With several gunicorn/uvicorn workers, anything cached in process memory is
+built once per worker. Heavy artifacts (trained forecast models, rollup
+snapshots) are instead written here once and read by every worker:
+
+- values are pickled to SHARED_CACHE_DIR/<namespace>/<key hash>.pkl,
+  written to a temp file and `os.replace`d, so readers never see a partial
+  file and no cross-process lock is needed;
+- NumPy arrays go through `put_array` / `get_array` and are memory-mapped
+  read-only, so all workers share the same page-cache pages;
+- each process keeps a small LRU of unpickled values (keyed by path and
+  mtime) so hot entries are not re-read on every request.
+
+Two workers that miss at the same moment may both compute the value; the
+last write wins and both results are equivalent.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from .config import settings
+
+_MISSING = object()
+
+
+class SharedCache:
+    def __init__(self, root: str, memory_items: int = 64):
+        self.root = root
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ----- paths
+    def _path(self, namespace: str, key, suffix: str) -> str:
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.root, namespace, digest + suffix)
+
+    def _write_atomic(self, path: str, write: Callable):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _fresh_mtime(self, path: str, max_age_s: Optional[float]) -> Optional[float]:
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if max_age_s is not None and time.time() - mtime > max_age_s:
+            return None
+        return mtime
+
+    # ----- pickled values
+    def contains(self, namespace: str, key, max_age_s: Optional[float] = None) -> bool:
+        path = self._path(namespace, key, ".pkl")
+        return self._fresh_mtime(path, max_age_s) is not None
+
+    def get(self, namespace: str, key, max_age_s: Optional[float] = None, default=None):
+        path = self._path(namespace, key, ".pkl")
+        mtime = self._fresh_mtime(path, max_age_s)
+        if mtime is None:
+            return default
+
+        memo_key = (path, mtime)
+        with self._lock:
+            value = self._memory.get(memo_key, _MISSING)
+            if value is not _MISSING:
+                self._memory.move_to_end(memo_key)
+                return value
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+        self._remember(memo_key, value)
+        return value
+
+    def put(self, namespace: str, key, value):
+        path = self._path(namespace, key, ".pkl")
+        self._write_atomic(
+            path, lambda fh: pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self._remember((path, os.stat(path).st_mtime), value)
+
+    def get_or_compute(self, namespace: str, key, compute: Callable[[], Any],
+                       max_age_s: Optional[float] = None):
+        value = self.get(namespace, key, max_age_s=max_age_s, default=_MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(namespace, key, value)
+        return value
+
+    def _remember(self, memo_key, value):
+        if self.memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[memo_key] = value
+            self._memory.move_to_end(memo_key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    # ----- arrays
+    def put_array(self, namespace: str, key, array: np.ndarray):
+        path = self._path(namespace, key, ".npy")
+        self._write_atomic(path, lambda fh: np.save(fh, array, allow_pickle=False))
+
+    def get_array(self, namespace: str, key, max_age_s: Optional[float] = None) -> Optional[np.ndarray]:
+        """Read-only memory map of a stored array, or None."""
+        path = self._path(namespace, key, ".npy")
+        if self._fresh_mtime(path, max_age_s) is None:
+            return None
+        try:
+            return np.load(path, mmap_mode="r", allow_pickle=False)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # ----- maintenance
+    def prune(self, max_age_s: float) -> int:
+        """Delete entries older than `max_age_s`. Returns how many were removed."""
+        cutoff = time.time() - max_age_s
+        removed = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+shared_cache = SharedCache(
+    settings.SHARED_CACHE_DIR, memory_items=settings.SHARED_CACHE_MEMORY_ITEMS
+)
@@ -0,0 +1,40 @@
+"""
+Optional warm-up of slow-to-import dependencies.
+
+The forecasting and optimization services import scikit-learn, pandas and
+PuLP on first use, so the API starts fast and requests that don't need them
+never pay for them. Set WARMUP_ON_STARTUP=true to import them during startup
+instead (the first forecast then isn't slowed down). Under gunicorn this
+happens once in the master, and forked workers share the loaded modules.
+"""
+import importlib
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger("app.startup")
+
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "sklearn.ensemble",
+    "pulp",
+)
+
+
+def warm_up() -> Dict[str, float]:
+    """Import HEAVY_MODULES; returns seconds spent per module."""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Warm-up: %s is not installed", name)
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info(
+        "Warm-up imports: %s",
+        ", ".join(f"{name} {secs:.2f}s" for name, secs in timings.items()),
+    )
+    return timings
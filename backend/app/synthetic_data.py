@@ -0,0 +1,344 @@
+"""
+Synthetic large-city dataset generator for load and scale testing.
+
+Unlike `seed_data`, everything is parameterized and written with chunked
+bulk inserts. Readings follow the same per-type load profiles as
+`seed_energy_readings` (see `base_load_kwh`) and are generated per building
+with a seeded RNG, so the same arguments (including --end) always produce
+the same dataset regardless of --workers.
+
+    # ~11.5M readings: 2000 buildings x 2 sensors x 30 days x 15-min cadence
+    DATABASE_URL=sqlite:///./bench.db python -m app.synthetic_data \\
+        --buildings 2000 --sensors-per-building 2 --days 30 \\
+        --cadence-minutes 15 --students 20000 --workers 8
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .config import settings
+from .database import SessionLocal, engine
+from . import models
+from .seed_data import base_load_kwh, reset_db
+from .services.timeseries_store import timeseries_store
+
+BUILDING_TYPES = ["school", "college", "office", "residential"]
+BUILDING_TYPE_WEIGHTS = [0.3, 0.1, 0.25, 0.35]
+
+# (zone, latitude, longitude) around Bengaluru
+CITY_ZONES = [
+    ("Whitefield", 12.9698, 77.7500),
+    ("Indiranagar", 12.9784, 77.6408),
+    ("Nagawara", 13.0517, 77.6200),
+    ("EPIP Zone", 12.9820, 77.7270),
+    ("Koramangala", 12.9352, 77.6245),
+    ("Jayanagar", 12.9250, 77.5938),
+    ("Malleshwaram", 13.0035, 77.5709),
+    ("Electronic City", 12.8452, 77.6602),
+    ("Hebbal", 13.0358, 77.5970),
+    ("Yelahanka", 13.1007, 77.5963),
+]
+
+GRADE_LEVELS = {
+    "school": ["6", "7", "8", "9", "10"],
+    "college": ["PU1", "PU2"],
+}
+
+
+def _load_profiles():
+    """24-slot hourly kWh profile for every (building type, sensor type)."""
+    return {
+        (btype, stype): np.array(
+            [base_load_kwh(btype, stype, h) for h in range(24)], dtype=np.float64
+        )
+        for btype in BUILDING_TYPES
+        for stype in ("energy_meter", "hvac_meter")
+    }
+
+
+def _sensor_types(btype, sensors_per_building):
+    """Main meter first; offices/colleges get an HVAC meter next, then sub-meters."""
+    types = ["energy_meter"]
+    while len(types) < sensors_per_building:
+        if len(types) == 1 and btype in ("office", "college"):
+            types.append("hvac_meter")
+        else:
+            types.append("energy_meter")
+    return types
+
+
+def _generate_building_readings(task):
+    """
+    Worker: readings for a block of buildings.
+    task = (seed, slot_hours, cadence_minutes, [(building_idx, btype, [(sensor_id, stype)])])
+    Returns (sensor_ids, slot_indices, values) as NumPy arrays.
+    """
+    seed, slot_hours, cadence_minutes, buildings = task
+    profiles = _load_profiles()
+    scale = cadence_minutes / 60.0
+    n_slots = len(slot_hours)
+
+    sensor_ids, slots, values = [], [], []
+    for building_idx, btype, sensors in buildings:
+        rng = np.random.default_rng([seed, building_idx])
+        for sensor_id, stype in sensors:
+            base = profiles[(btype, stype)][slot_hours]
+            value = base + rng.uniform(-0.1, 0.1, n_slots) * base
+            sensor_ids.append(np.full(n_slots, sensor_id, dtype=np.int64))
+            slots.append(np.arange(n_slots, dtype=np.int32))
+            values.append(np.maximum(0.5, value) * scale)
+
+    if not sensor_ids:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+    return np.concatenate(sensor_ids), np.concatenate(slots), np.concatenate(values)
+
+
+def _bulk_insert(conn, table, rows, chunk_size):
+    for i in range(0, len(rows), chunk_size):
+        conn.execute(table.insert(), rows[i : i + chunk_size])
+
+
+def _insert_readings(conn, slot_values, arrays, chunk_size):
+    """Fast path: positional executemany straight on the DBAPI cursor."""
+    placeholder = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+    sql = (
+        f"INSERT INTO {models.EnergyReading.__tablename__} (sensor_id, timestamp, value) "
+        f"VALUES ({placeholder}, {placeholder}, {placeholder})"
+    )
+    sensor_ids, slot_idx, values = arrays
+    cursor = conn.connection.cursor()
+    try:
+        for i in range(0, len(values), chunk_size):
+            j = i + chunk_size
+            ts = [slot_values[k] for k in slot_idx[i:j].tolist()]
+            cursor.executemany(
+                sql, list(zip(sensor_ids[i:j].tolist(), ts, values[i:j].tolist()))
+            )
+    finally:
+        cursor.close()
+    return len(values)
+
+
+def _sync_sequences(conn):
+    if engine.dialect.name != "postgresql":
+        return
+    for table in models.Base.metadata.sorted_tables:
+        if "id" in table.c:
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+            )
+
+
+def generate(
+    buildings=1000,
+    sensors_per_building=2,
+    days=14,
+    cadence_minutes=60,
+    students=5000,
+    seed=42,
+    end=None,
+    workers=4,
+    chunk_size=50_000,
+):
+    rng = np.random.default_rng(seed)
+    end = (end or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+    n_slots = int(days * 24 * 60 / cadence_minutes) + 1
+    slot_times = [start + timedelta(minutes=cadence_minutes * i) for i in range(n_slots)]
+    slot_hours = np.array([ts.hour for ts in slot_times], dtype=np.int64)
+
+    # Pre-render each slot's timestamp the way the dialect stores it, once.
+    process = models.EnergyReading.__table__.c.timestamp.type.bind_processor(engine.dialect)
+    slot_values = [process(ts) for ts in slot_times] if process else slot_times
+
+    # --- buildings & sensors (explicit ids, so workers need no round-trips)
+    btypes = rng.choice(BUILDING_TYPES, size=buildings, p=BUILDING_TYPE_WEIGHTS)
+    zone_idx = rng.integers(0, len(CITY_ZONES), size=buildings)
+    jitter = rng.normal(0.0, 0.015, size=(buildings, 2))
+
+    building_rows, sensor_rows, blocks = [], [], []
+    sensor_id = 0
+    for i in range(buildings):
+        zone, lat, lon = CITY_ZONES[zone_idx[i]]
+        btype = str(btypes[i])
+        building_rows.append(
+            {
+                "id": i + 1,
+                "name": f"{btype.title()} #{i + 1}, {zone}",
+                "type": btype,
+                "latitude": round(lat + jitter[i, 0], 6),
+                "longitude": round(lon + jitter[i, 1], 6),
+                "city_zone": zone,
+            }
+        )
+        sensors = []
+        for stype in _sensor_types(btype, sensors_per_building):
+            sensor_id += 1
+            sensor_rows.append(
+                {
+                    "id": sensor_id,
+                    "building_id": i + 1,
+                    "sensor_type": stype,
+                    "unit": "kWh",
+                    "is_active": True,
+                }
+            )
+            sensors.append((sensor_id, stype))
+        blocks.append((i, btype, sensors))
+
+    # --- institutions & students for every school/college building
+    institution_rows = []
+    for b in building_rows:
+        if b["type"] in GRADE_LEVELS:
+            institution_rows.append(
+                {
+                    "id": len(institution_rows) + 1,
+                    "building_id": b["id"],
+                    "name": b["name"],
+                    "level": b["type"],
+                    "student_count": 0,
+                }
+            )
+
+    student_rows, performance_rows = [], []
+    if institution_rows and students:
+        inst_for_student = rng.integers(0, len(institution_rows), size=students)
+        base_scores = rng.normal(70, 12, size=students)
+        low_attendance = rng.random(students) < 0.2
+        school_days = [
+            datetime(d.year, d.month, d.day, 8, 30)
+            for d in (end.date() - timedelta(days=k) for k in range(30, -1, -1))
+            if d.weekday() < 5
+        ]
+        n_days = len(school_days)
+        for s in range(students):
+            inst = institution_rows[inst_for_student[s]]
+            inst["student_count"] += 1
+            grades = GRADE_LEVELS[inst["level"]]
+            student_rows.append(
+                {
+                    "id": s + 1,
+                    "institution_id": inst["id"],
+                    "name": f"Student {s + 1}",
+                    "grade_level": grades[s % len(grades)],
+                    "risk_score": 0.0,
+                }
+            )
+            scores = np.clip(base_scores[s] + rng.uniform(-10, 10, n_days), 0.0, 100.0)
+            if low_attendance[s]:
+                attendance = rng.uniform(0.3, 0.8, n_days)
+            else:
+                attendance = rng.uniform(0.85, 1.0, n_days)
+            for d in range(n_days):
+                performance_rows.append(
+                    {
+                        "student_id": s + 1,
+                        "timestamp": school_days[d],
+                        "score": float(scores[d]),
+                        "attendance": float(attendance[d]),
+                    }
+                )
+
+    reset_db()
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.execute(
+            models.User.__table__.insert(),
+            [
+                {
+                    "email": "admin@smartedcity.in",
+                    "hashed_password": "dummy-hash",
+                    "role": "city_admin",
+                    "is_active": True,
+                }
+            ],
+        )
+        _bulk_insert(conn, models.Building.__table__, building_rows, chunk_size)
+        _bulk_insert(conn, models.Sensor.__table__, sensor_rows, chunk_size)
+        _bulk_insert(conn, models.Institution.__table__, institution_rows, chunk_size)
+        _bulk_insert(conn, models.Student.__table__, student_rows, chunk_size)
+        _bulk_insert(conn, models.StudentPerformance.__table__, performance_rows, chunk_size)
+    print(
+        f"Inserted {len(building_rows)} buildings, {len(sensor_rows)} sensors, "
+        f"{len(student_rows)} students, {len(performance_rows)} performances "
+        f"in {time.perf_counter() - t0:.1f}s"
+    )
+
+    # --- readings: generated per block in worker processes, written in chunks
+    block_size = max(1, len(blocks) // (workers * 8))
+    tasks = [
+        (seed, slot_hours, cadence_minutes, blocks[i : i + block_size])
+        for i in range(0, len(blocks), block_size)
+    ]
+    total = 0
+    t0 = time.perf_counter()
+    engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers) as pool, engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        # Building secondary indexes once at the end beats maintaining them per row.
+        indexes = list(models.EnergyReading.__table__.indexes)
+        for index in indexes:
+            index.drop(conn)
+        for arrays in pool.map(_generate_building_readings, tasks):
+            total += _insert_readings(conn, slot_values, arrays, chunk_size)
+        for index in indexes:
+            index.create(conn)
+        _sync_sequences(conn)
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Inserted {total:,} readings ({n_slots} slots x {len(sensor_rows)} sensors) "
+        f"in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)"
+    )
+
+    if settings.TIMESERIES_STORE_ENABLED:
+        t0 = time.perf_counter()
+        db = SessionLocal()
+        try:
+            timeseries_store.rebuild(db)
+        finally:
+            db.close()
+        print(f"Rebuilt the time-series store in {time.perf_counter() - t0:.1f}s")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic large-city dataset.")
+    parser.add_argument("--buildings", type=int, default=1000)
+    parser.add_argument("--sensors-per-building", type=int, default=2)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--cadence-minutes", type=int, default=60)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        default=None,
+        help="Last reading time (ISO). Defaults to the current hour; pin it for reproducible data.",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    generate(
+        buildings=args.buildings,
+        sensors_per_building=args.sensors_per_building,
+        days=args.days,
+        cadence_minutes=args.cadence_minutes,
+        students=args.students,
+        seed=args.seed,
+        end=args.end,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Managed process pool for CPU-bound model fitting and LP solving.
+
+scikit-learn fits and CBC solves otherwise run in the API's request
+threadpool and hold the GIL against request handling and serialization.
+With COMPUTE_POOL_SIZE > 0 they run in dedicated worker processes instead:
+
+- workers are started once and stay warm: heavy libraries are imported up
+  front (app.startup.warm_up) and each worker keeps its own in-memory LRU of
+  fitted models on top of the shared on-disk cache;
+- every call has a deadline (COMPUTE_TIMEOUT_S); a call that overruns, or
+  whose client disconnected, has its worker process killed and replaced, so
+  a runaway solve can't hold a slot forever;
+- callers block a thread, not the event loop: `ComputePool.call` is sync and
+  is used from code already running in the threadpool.
+
+Cancellation is signalled through `cancel_scope()` (set by
+`app.concurrency.run_heavy` when the requesting client goes away) and picked
+up by any pool call made inside it.
+
+With COMPUTE_POOL_SIZE = 0 (the default) `run` calls the function inline.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+
+from .config import settings
+from .profiling import timed
+
+logger = logging.getLogger("app.workers")
+
+# How often a waiting caller checks for cancellation (seconds)
+POLL_S = 0.1
+# Sent by a worker once its warm-up imports are done
+READY = "ready"
+# How long `start` waits for workers to finish warming up (seconds)
+STARTUP_TIMEOUT_S = 120.0
+
+
+class ComputeTimeout(RuntimeError):
+    pass
+
+
+class ComputeCancelled(RuntimeError):
+    pass
+
+
+_cancel: ContextVar[Optional[threading.Event]] = ContextVar("compute_cancel", default=None)
+
+
+@contextmanager
+def cancel_scope(event: threading.Event):
+    """Pool calls made inside this block are abandoned once `event` is set."""
+    token = _cancel.set(event)
+    try:
+        yield
+    finally:
+        _cancel.reset(token)
+
+
+def _worker_main(conn):
+    from .startup import warm_up
+
+    try:
+        warm_up()
+    except Exception:  # a missing optional library only matters when used
+        logger.exception("Compute worker warm-up failed")
+    conn.send(READY)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        fn, args = message
+        try:
+            conn.send((True, fn(*args)))
+        except Exception as exc:
+            try:
+                conn.send((False, exc))
+            except Exception:  # exception not picklable
+                conn.send((False, RuntimeError(repr(exc))))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready and self.conn.poll(timeout) and self.conn.recv() == READY:
+            self.ready = True
+        return self.ready
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class ComputePool:
+    def __init__(self, size: int, start_method: str = "spawn"):
+        self.size = size
+        self.start_method = start_method
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self.stats = {"calls": 0, "timeouts": 0, "cancelled": 0, "restarts": 0}
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            ctx = multiprocessing.get_context(self.start_method)
+            self._ctx = ctx
+            self._workers = [_Worker(ctx) for _ in range(self.size)]
+            deadline = time.monotonic() + STARTUP_TIMEOUT_S
+            for worker in self._workers:
+                if not worker.wait_ready(max(deadline - time.monotonic(), 0.0)):
+                    logger.warning("Compute worker %s not ready yet", worker.process.pid)
+                self._idle.put(worker)
+            self._started = True
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for worker in self._workers:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.kill()
+            self._workers = []
+            self._idle = queue.Queue()
+            self._started = False
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        fresh = _Worker(self._ctx)
+        with self._lock:
+            self._workers = [fresh if w is worker else w for w in self._workers]
+            self.stats["restarts"] += 1
+        return fresh
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run picklable `fn(*args)` in a worker process and return its result."""
+        self.start()
+        cancel = _cancel.get()
+        deadline = time.monotonic() + (timeout or settings.COMPUTE_TIMEOUT_S)
+
+        worker = None
+        while worker is None:
+            if cancel is not None and cancel.is_set():
+                raise ComputeCancelled("client disconnected")
+            if time.monotonic() > deadline:
+                raise ComputeTimeout("no compute worker became available in time")
+            try:
+                worker = self._idle.get(timeout=POLL_S)
+            except queue.Empty:
+                pass
+
+        healthy = True
+        try:
+            self.stats["calls"] += 1
+            worker.conn.send((fn, args))
+            while True:
+                if worker.conn.poll(POLL_S):
+                    message = worker.conn.recv()
+                    if message == READY:  # replacement worker finished warming up
+                        worker.ready = True
+                        continue
+                    ok, value = message
+                    break
+                if not worker.process.is_alive():
+                    healthy = False
+                    raise RuntimeError("compute worker died")
+                if cancel is not None and cancel.is_set():
+                    healthy = False
+                    self.stats["cancelled"] += 1
+                    raise ComputeCancelled("client disconnected")
+                if time.monotonic() > deadline:
+                    healthy = False
+                    self.stats["timeouts"] += 1
+                    raise ComputeTimeout(f"{getattr(fn, '__name__', fn)} timed out")
+        except (EOFError, BrokenPipeError, OSError):
+            healthy = False
+            raise RuntimeError("compute worker died")
+        finally:
+            if not healthy:
+                worker = self._replace(worker)
+            self._idle.put(worker)
+
+        if not ok:
+            raise value
+        return value
+
+
+compute_pool = ComputePool(settings.COMPUTE_POOL_SIZE)
+
+
+def run(fn: Callable, *args) -> Any:
+    """`fn(*args)` in the compute pool when it is enabled, else inline."""
+    if compute_pool.size <= 0:
+        return fn(*args)
+    with timed("compute_pool"):
+        return compute_pool.call(fn, *args)
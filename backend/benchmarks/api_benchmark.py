@@ -0,0 +1,308 @@
+"""
+End-to-end API benchmark.
+
+Boots the FastAPI `app` in-process (ASGI transport, no network) against the
+database in DATABASE_URL / --database-url and drives each scenario at a
+fixed concurrency, recording p50/p95/p99 latency, throughput, SQL statements
+per request and peak RSS. The JSON report carries the git revision so two
+runs can be compared:
+
+    python -m benchmarks.api_benchmark --database-url sqlite:///./bench.db \\
+        --requests 200 --concurrency 16 --output before.json
+    python -m benchmarks.api_benchmark --database-url sqlite:///./bench.db \\
+        --requests 200 --concurrency 16 --compare before.json
+
+Note that the forecast, risk and ingest scenarios write rows, as the
+endpoints themselves do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+SCENARIOS = ["forecast", "optimize", "risk", "intensity", "dashboard", "ingest"]
+
+
+class StatementCounter:
+    """Counts SQL statements executed on an engine (all threads)."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        from sqlalchemy import event
+
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[idx], 3)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _build_requests(name: str, ids: Dict[str, List[int]], horizon: int):
+    """Return a callable producing (method, path, json_body) for one request."""
+    prefix = "/api/v1"
+    if name == "forecast":
+        return lambda: (
+            "GET",
+            f"{prefix}/energy/forecast/{random.choice(ids['buildings'])}?horizon_hours={horizon}",
+            None,
+        )
+    if name == "optimize":
+        return lambda: (
+            "POST",
+            f"{prefix}/optimize/energy",
+            {
+                "building_id": random.choice(ids["buildings"]),
+                "max_load_kw": 200.0,
+                "hours": horizon,
+                "mode": random.choice(["peak", "cost", "emissions"]),
+            },
+        )
+    if name == "risk":
+        return lambda: (
+            "GET",
+            f"{prefix}/education/risk/{random.choice(ids['institutions'])}",
+            None,
+        )
+    if name == "intensity":
+        return lambda: ("GET", f"{prefix}/energy/intensity", None)
+    if name == "dashboard":
+        return lambda: ("GET", f"{prefix}/analytics/dashboard-summary", None)
+    if name == "ingest":
+        return lambda: (
+            "POST",
+            f"{prefix}/energy/readings",
+            {
+                "sensor_id": random.choice(ids["sensors"]),
+                "value": round(random.uniform(1.0, 50.0), 3),
+            },
+        )
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def _run_scenario(client, make_request, n_requests: int, concurrency: int):
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = 0
+    remaining = iter(range(n_requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, path, body = make_request()
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, json=body)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return latencies, statuses, errors, wall
+
+
+async def run_benchmark(
+    scenarios: List[str],
+    n_requests: int,
+    concurrency: int,
+    horizon: int,
+    warmup: int,
+    base_url: Optional[str] = None,
+) -> Dict:
+    import httpx
+
+    from app import models
+    from app.database import SessionLocal, engine, init_db
+    from app.main import app
+
+    if base_url is None:
+        init_db()  # ASGITransport does not run the app's lifespan
+    db = SessionLocal()
+    try:
+        ids = {
+            "buildings": [r.id for r in db.query(models.Building.id).all()],
+            "sensors": [r.id for r in db.query(models.Sensor.id).all()],
+            "institutions": [r.id for r in db.query(models.Institution.id).all()],
+        }
+    finally:
+        db.close()
+    if not ids["buildings"] or not ids["sensors"]:
+        raise SystemExit("Dataset is empty; generate one with `python -m app.synthetic_data`.")
+    if not ids["institutions"]:
+        scenarios = [s for s in scenarios if s != "risk"]
+
+    # Query counts are only observable when the app runs in this process.
+    counter = StatementCounter(engine) if base_url is None else None
+    if base_url is None:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300)
+    else:
+        client = httpx.AsyncClient(base_url=base_url, timeout=300)
+
+    results = {}
+    async with client:
+        for name in scenarios:
+            make_request = _build_requests(name, ids, horizon)
+            if warmup:
+                await _run_scenario(client, make_request, warmup, min(concurrency, warmup))
+
+            statements_before = counter.count if counter else None
+            latencies, statuses, errors, wall = await _run_scenario(
+                client, make_request, n_requests, concurrency
+            )
+            completed = len(latencies)
+            row = {
+                "requests": n_requests,
+                "concurrency": concurrency,
+                "completed": completed,
+                "errors": errors,
+                "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+                "wall_s": round(wall, 3),
+                "throughput_rps": round(completed / wall, 2) if wall else None,
+                "latency_ms": {
+                    "mean": round(sum(latencies) / completed, 3) if completed else None,
+                    "p50": _percentile(latencies, 50),
+                    "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99),
+                    "max": round(max(latencies), 3) if latencies else None,
+                },
+                "queries_per_request": round(
+                    (counter.count - statements_before) / max(completed, 1), 2
+                )
+                if counter
+                else None,
+                "peak_rss_mb": round(
+                    resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1
+                ),
+            }
+            results[name] = row
+            print(
+                f"{name:<10} {row['throughput_rps'] or 0:>9.1f} req/s  "
+                f"p50 {row['latency_ms']['p50'] or 0:>8.1f}  "
+                f"p95 {row['latency_ms']['p95'] or 0:>8.1f}  "
+                f"p99 {row['latency_ms']['p99'] or 0:>8.1f} ms  "
+                f"q/req {row['queries_per_request'] if row['queries_per_request'] is not None else '-':>6}  "
+                f"rss {row['peak_rss_mb']} MB  {row['status_codes']}"
+            )
+
+    return {
+        "revision": _git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "database": {
+            "buildings": len(ids["buildings"]),
+            "sensors": len(ids["sensors"]),
+            "institutions": len(ids["institutions"]),
+        },
+        "config": {
+            "requests": n_requests,
+            "concurrency": concurrency,
+            "horizon": horizon,
+            "warmup": warmup,
+            "base_url": base_url,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print relative change per scenario for the headline metrics."""
+    print(f"\nvs {baseline.get('revision')} ({baseline.get('created_at')}):")
+
+    def delta(new, old):
+        if new is None or old in (None, 0):
+            return "     n/a"
+        return f"{(new - old) / old * 100.0:+7.1f}%"
+
+    for name, row in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        print(
+            f"{name:<10} rps {delta(row['throughput_rps'], old['throughput_rps'])}  "
+            f"p50 {delta(row['latency_ms']['p50'], old['latency_ms']['p50'])}  "
+            f"p95 {delta(row['latency_ms']['p95'], old['latency_ms']['p95'])}  "
+            f"p99 {delta(row['latency_ms']['p99'], old['latency_ms']['p99'])}  "
+            f"q/req {delta(row['queries_per_request'], old['queries_per_request'])}  "
+            f"rss {delta(row['peak_rss_mb'], old['peak_rss_mb'])}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API benchmark.")
+    parser.add_argument("--database-url", help="Overrides DATABASE_URL")
+    parser.add_argument(
+        "--base-url",
+        help="Benchmark a running server instead of the in-process app "
+        "(query counts are then unavailable)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    if args.database_url:
+        # Must be set before `app` is imported; settings read it at import time.
+        os.environ["DATABASE_URL"] = args.database_url
+    random.seed(args.seed)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    report = asyncio.run(
+        run_benchmark(
+            scenarios,
+            n_requests=args.requests,
+            concurrency=args.concurrency,
+            horizon=args.horizon,
+            warmup=args.warmup,
+            base_url=args.base_url,
+        )
+    )
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(report, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
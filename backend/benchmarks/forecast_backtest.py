@@ -0,0 +1,301 @@
+"""
+Rolling-origin backtest for the hybrid energy forecaster.
+
+For every building, the history is replayed in folds: at each origin the
+forecaster is fitted on the `history_days` before it and asked for the next
+`horizon` hours, which are then compared with what was actually metered.
+Buildings are spread over a process pool.
+
+Run from the backend directory against any database via DATABASE_URL,
+typically a synthetic large-city dataset built with `app.synthetic_data`:
+
+    DATABASE_URL=sqlite:///./bench.db python -m app.synthetic_data --buildings 2000 --days 30
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.forecast_backtest \\
+        --folds 7 --step-hours 24 --horizon 24 --workers 8 --output backtest.json
+"""
+import argparse
+import json
+import resource
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func
+
+from app import models
+from app.database import SessionLocal, engine
+from app.services.energy_forecasting import (
+    _fit_hybrid,
+    _get_building_hourly_series,
+    _predict_hybrid,
+)
+
+# Actuals below this are treated as zero and left out of MAPE.
+MAPE_EPSILON = 1e-6
+
+
+def _init_worker():
+    # Connections inherited across fork must not be shared with the parent.
+    engine.dispose(close=False)
+
+
+def _fold_origins(data_end: datetime, folds: int, step_hours: int, horizon: int):
+    last_origin = data_end - timedelta(hours=horizon)
+    return [last_origin - timedelta(hours=k * step_hours) for k in range(folds)][::-1]
+
+
+def backtest_building(
+    building_id: int,
+    origins: List[datetime],
+    history_days: int,
+    horizon: int,
+    trace_memory: bool = False,
+) -> Dict:
+    """
+    Replay every origin for one building. Returns per-horizon absolute and
+    percentage errors for the hybrid blend and both of its components,
+    plus fit/predict timings.
+    """
+    span_days = history_days + (origins[-1] - origins[0]).days + 1
+    end = origins[-1] + timedelta(hours=horizon)
+
+    db = SessionLocal()
+    try:
+        series = _get_building_hourly_series(db, building_id, days=span_days, end=end)
+    finally:
+        db.close()
+
+    timestamps = [p["timestamp"] for p in series]
+    actual_by_ts = {p["timestamp"]: p["value"] for p in series}
+
+    errors = defaultdict(lambda: defaultdict(list))
+    fit_ms: List[float] = []
+    predict_ms: List[float] = []
+    peak_fit_bytes = 0
+
+    for origin in origins:
+        lo = bisect_left(timestamps, origin - timedelta(days=history_days))
+        hi = bisect_left(timestamps, origin)
+        train = series[lo:hi]
+        if not train:
+            continue
+
+        if trace_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        baseline_profile, ml_model = _fit_hybrid(train)
+        t1 = time.perf_counter()
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_fit_bytes = max(peak_fit_bytes, peak)
+
+        targets = [origin + timedelta(hours=h) for h in range(horizon)]
+        t2 = time.perf_counter()
+        hybrid, baseline_only, ml_only = _predict_hybrid(
+            baseline_profile, ml_model, targets
+        )
+        t3 = time.perf_counter()
+
+        fit_ms.append((t1 - t0) * 1000.0)
+        predict_ms.append((t3 - t2) * 1000.0)
+
+        for h, ts in enumerate(targets):
+            actual = actual_by_ts.get(ts)
+            if actual is None:
+                continue
+            for name, preds in (
+                ("hybrid", hybrid),
+                ("baseline", baseline_only),
+                ("ml", ml_only),
+            ):
+                err = abs(preds[h] - actual)
+                errors[h + 1][f"{name}_ae"].append(err)
+                if abs(actual) > MAPE_EPSILON:
+                    errors[h + 1][f"{name}_ape"].append(err / abs(actual))
+
+    return {
+        "building_id": building_id,
+        "errors": {h: dict(v) for h, v in errors.items()},
+        "fit_ms": fit_ms,
+        "predict_ms": predict_ms,
+        "peak_fit_bytes": peak_fit_bytes,
+        "worker_max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _mean(values: List[float]):
+    return sum(values) / len(values) if values else None
+
+
+def _percentile(values: List[float], pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(results: List[Dict], building_types: Dict[int, str]) -> Dict:
+    """Aggregate per-building results into MAE/MAPE per (type, horizon)."""
+    grouped = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    fit_ms: List[float] = []
+    predict_ms: List[float] = []
+
+    for res in results:
+        btype = building_types.get(res["building_id"], "unknown")
+        for h, metrics in res["errors"].items():
+            for key, values in metrics.items():
+                grouped[btype][h][key].extend(values)
+                grouped["all"][h][key].extend(values)
+        fit_ms.extend(res["fit_ms"])
+        predict_ms.extend(res["predict_ms"])
+
+    accuracy = {}
+    for btype, by_horizon in sorted(grouped.items()):
+        accuracy[btype] = {}
+        for h in sorted(by_horizon):
+            metrics = by_horizon[h]
+            row = {"samples": len(metrics.get("hybrid_ae", []))}
+            for name in ("hybrid", "baseline", "ml"):
+                mae = _mean(metrics.get(f"{name}_ae", []))
+                mape = _mean(metrics.get(f"{name}_ape", []))
+                row[f"{name}_mae"] = round(mae, 4) if mae is not None else None
+                row[f"{name}_mape_pct"] = (
+                    round(mape * 100.0, 2) if mape is not None else None
+                )
+            accuracy[btype][h] = row
+
+    return {
+        "accuracy": accuracy,
+        "cost": {
+            "fits": len(fit_ms),
+            "fit_ms_mean": _mean(fit_ms),
+            "fit_ms_p95": _percentile(fit_ms, 95),
+            "predict_ms_mean": _mean(predict_ms),
+            "predict_ms_p95": _percentile(predict_ms, 95),
+            "peak_fit_bytes_max": max(
+                (r["peak_fit_bytes"] for r in results), default=0
+            ),
+            "worker_max_rss_kb": max(
+                (r["worker_max_rss_kb"] for r in results), default=0
+            ),
+        },
+    }
+
+
+def run_backtest(
+    folds: int = 7,
+    step_hours: int = 24,
+    horizon: int = 24,
+    history_days: int = 14,
+    workers: int = 4,
+    limit: int = None,
+    trace_memory: bool = False,
+) -> Dict:
+    db = SessionLocal()
+    try:
+        q = db.query(models.Building.id, models.Building.type).order_by(
+            models.Building.id
+        )
+        if limit:
+            q = q.limit(limit)
+        building_types = {b.id: b.type for b in q.all()}
+        data_end = db.query(func.max(models.EnergyReading.timestamp)).scalar()
+    finally:
+        db.close()
+
+    if not building_types or data_end is None:
+        raise SystemExit("No buildings or readings to backtest against.")
+
+    data_end = data_end.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    origins = _fold_origins(data_end, folds, step_hours, horizon)
+
+    started = time.perf_counter()
+    engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(
+                backtest_building, bid, origins, history_days, horizon, trace_memory
+            )
+            for bid in building_types
+        ]
+        results = [f.result() for f in futures]
+    wall_s = time.perf_counter() - started
+
+    report = summarize(results, building_types)
+    report["config"] = {
+        "buildings": len(building_types),
+        "folds": folds,
+        "step_hours": step_hours,
+        "horizon": horizon,
+        "history_days": history_days,
+        "workers": workers,
+        "first_origin": origins[0].isoformat(),
+        "last_origin": origins[-1].isoformat(),
+    }
+    report["cost"]["wall_s"] = round(wall_s, 3)
+    return report
+
+
+def _print_report(report: Dict):
+    cfg = report["config"]
+    print(
+        f"Backtest: {cfg['buildings']} buildings, {cfg['folds']} folds, "
+        f"horizon {cfg['horizon']}h, {cfg['workers']} workers"
+    )
+    header = f"{'type':<14}{'h':>4}{'n':>8}{'MAE':>10}{'MAPE%':>9}{'base MAE':>10}{'ml MAE':>10}"
+    print(header)
+    print("-" * len(header))
+    for btype, by_horizon in report["accuracy"].items():
+        for h, row in by_horizon.items():
+            print(
+                f"{btype:<14}{h:>4}{row['samples']:>8}"
+                f"{row['hybrid_mae'] or 0:>10.3f}{row['hybrid_mape_pct'] or 0:>9.2f}"
+                f"{row['baseline_mae'] or 0:>10.3f}{row['ml_mae'] or 0:>10.3f}"
+            )
+    cost = report["cost"]
+    print(
+        f"\nfit: mean {cost['fit_ms_mean'] or 0:.1f} ms, p95 {cost['fit_ms_p95'] or 0:.1f} ms | "
+        f"predict: mean {cost['predict_ms_mean'] or 0:.2f} ms | "
+        f"worker max RSS {cost['worker_max_rss_kb'] / 1024:.0f} MiB | wall {cost['wall_s']} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--folds", type=int, default=7)
+    parser.add_argument("--step-hours", type=int, default=24)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--history-days", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None, help="Only the first N buildings")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record peak Python allocations while fitting (slower)",
+    )
+    parser.add_argument("--output", help="Write the full JSON report here")
+    args = parser.parse_args()
+
+    report = run_backtest(
+        folds=args.folds,
+        step_hours=args.step_hours,
+        horizon=args.horizon,
+        history_days=args.history_days,
+        workers=args.workers,
+        limit=args.limit,
+        trace_memory=args.trace_memory,
+    )
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
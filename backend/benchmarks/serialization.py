@@ -0,0 +1,165 @@
+"""
+Serialization cost per 10k rows: response_model path vs fast path.
+
+"model" mimics what FastAPI does for a `response_model` endpoint: build the
+Pydantic objects, validate them against the response field, run
+`jsonable_encoder` and `json.dumps`. "fast" is what the endpoints do with
+FAST_JSON_RESPONSES on: plain dicts straight from rows, encoded by orjson.
+
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from app import schemas
+from app.responses import FastJSONResponse
+
+
+def _model_path(model_type, objs):
+    validated = parse_obj_as(model_type, objs)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def _fast_path(content):
+    return FastJSONResponse(content).body
+
+
+def case_forecasts(n: int):
+    now = datetime.utcnow()
+    rows = [
+        {
+            "building_id": 1 + i % 100,
+            "timestamp": now + timedelta(hours=i),
+            "horizon_hours": i + 1,
+            "predicted_value": 12.5 + i * 0.01,
+        }
+        for i in range(n)
+    ]
+    orm_like = [SimpleNamespace(**r) for r in rows]
+    return (
+        lambda: _model_path(List[schemas.EnergyForecastOut], orm_like),
+        lambda: _fast_path(rows),
+    )
+
+
+def case_intensity(n: int):
+    rows = [
+        SimpleNamespace(
+            building_id=i,
+            name=f"Building {i}",
+            type="office",
+            latitude=12.9 + i * 1e-5,
+            longitude=77.6 + i * 1e-5,
+            city_zone="Whitefield",
+            total_kwh_24h=100.0 + i,
+        )
+        for i in range(n)
+    ]
+
+    def model():
+        out = [
+            schemas.BuildingEnergyIntensityOut(
+                building_id=r.building_id,
+                name=r.name,
+                type=r.type,
+                latitude=r.latitude,
+                longitude=r.longitude,
+                city_zone=r.city_zone,
+                total_kwh_24h=float(r.total_kwh_24h or 0.0),
+            )
+            for r in rows
+        ]
+        return _model_path(List[schemas.BuildingEnergyIntensityOut], out)
+
+    def fast():
+        return _fast_path(
+            [
+                {
+                    "building_id": r.building_id,
+                    "name": r.name,
+                    "type": r.type,
+                    "latitude": r.latitude,
+                    "longitude": r.longitude,
+                    "city_zone": r.city_zone,
+                    "total_kwh_24h": float(r.total_kwh_24h or 0.0),
+                }
+                for r in rows
+            ]
+        )
+
+    return model, fast
+
+
+def case_schedule(n: int):
+    now = datetime.utcnow()
+    schedule = [
+        {
+            "hour_index": i,
+            "timestamp": now + timedelta(hours=i),
+            "baseline_kw": 40.0 + i % 24,
+            "optimized_kw": 35.0 + i % 24,
+        }
+        for i in range(n)
+    ]
+    result = {
+        "building_id": 1,
+        "hours": n,
+        "mode": schemas.OptimizationMode.cost,
+        "total_baseline_kwh": 1.0,
+        "total_optimized_kwh": 1.0,
+        "estimated_cost_baseline": 1.0,
+        "estimated_cost_optimized": 1.0,
+        "schedule": schedule,
+    }
+
+    def model():
+        items = [schemas.EnergyOptimizationScheduleItem(**s) for s in schedule]
+        obj = schemas.EnergyOptimizationResult(**{**result, "schedule": items})
+        return _model_path(schemas.EnergyOptimizationResult, obj)
+
+    return model, lambda: _fast_path(result)
+
+
+CASES = {
+    "forecasts": case_forecasts,
+    "intensity": case_intensity,
+    "schedule": case_schedule,
+}
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization benchmark.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    scale = 10_000 / args.rows
+    print(f"{'case':<12}{'model ms/10k':>14}{'fast ms/10k':>14}{'speedup':>10}{'bytes':>12}")
+    for name, build in CASES.items():
+        model, fast = build(args.rows)
+        model_ms = _best_ms(model, args.repeat) * scale
+        fast_ms = _best_ms(fast, args.repeat) * scale
+        print(
+            f"{name:<12}{model_ms:>14.1f}{fast_ms:>14.1f}"
+            f"{model_ms / max(fast_ms, 1e-9):>9.1f}x{len(fast()):>12,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
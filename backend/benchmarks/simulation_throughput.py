@@ -0,0 +1,126 @@
+"""
+Scenario throughput of the what-if simulator.
+
+Builds a synthetic city profile (`--buildings` spread over `--zones` zones,
+seed-data templates with per-building noise) and evaluates `--scenarios`
+random scenarios of `--transforms` transforms each, in one `simulate` call.
+
+By default no database is needed and only the in-memory evaluation is
+timed. With --from-db the profile is instead built the way the API builds
+it, with `build_profile` over the last --history-days of readings in
+DATABASE_URL, and that build's time and peak RSS are reported as well:
+
+    python -m benchmarks.simulation_throughput --buildings 20000 --scenarios 5000
+
+    DATABASE_URL=sqlite:///./bench.db python -m app.synthetic_data --buildings 2000 --days 30
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.simulation_throughput \\
+        --from-db --history-days 30 --scenarios 5000
+"""
+import argparse
+import json
+import random
+import resource
+import time
+
+import numpy as np
+
+from app.schemas import Scenario, ScenarioTransform
+from app.services.simulation import (
+    HOURS, METER_TYPES, CityProfile, _template, build_profile, simulate,
+)
+
+TYPES = ("school", "college", "office", "residential")
+
+
+def _profile(buildings: int, zones: int, rng: np.random.Generator) -> CityProfile:
+    zone_names = [f"zone-{i}" for i in range(zones)]
+    types = rng.choice(len(TYPES), buildings)
+    zone_idx = rng.integers(0, zones, buildings)
+    templates = {(t, m): _template(t, m) for t in TYPES for m in METER_TYPES}
+
+    index, rows = {}, []
+    sums = {key: np.zeros(HOURS) for key in templates}
+    for t, z in zip(types, zone_idx):
+        btype = TYPES[t]
+        for meter in METER_TYPES:
+            load = templates[(btype, meter)] * rng.uniform(0.7, 1.3)
+            key = (btype, zone_names[z], meter)
+            if key not in index:
+                index[key] = len(rows)
+                rows.append(np.zeros(HOURS))
+            rows[index[key]] += load
+            sums[(btype, meter)] += load
+    counts = np.bincount(types, minlength=len(TYPES))
+    type_means = {(b, m): s / max(counts[TYPES.index(b)], 1) for (b, m), s in sums.items()}
+    return CityProfile(list(index), np.vstack(rows), type_means, buildings=buildings)
+
+
+def _scenario(i: int, zone_names, transforms: int, rng: random.Random) -> Scenario:
+    ops = []
+    for _ in range(transforms):
+        zone = rng.choice(zone_names)
+        kind = rng.choice(("scale", "shift", "add_buildings"))
+        if kind == "scale":
+            ops.append(ScenarioTransform(op=kind, type=rng.choice(TYPES), factor=rng.uniform(0.5, 1.5)))
+        elif kind == "shift":
+            ops.append(ScenarioTransform(
+                op=kind, type=rng.choice(TYPES), sensor_type="hvac_meter",
+                hours=rng.randint(-3, 3), fraction=rng.random(),
+            ))
+        else:
+            ops.append(ScenarioTransform(
+                op=kind, type=rng.choice(TYPES), city_zone=zone, count=rng.randint(1, 100)
+            ))
+    return Scenario(name=f"s{i}", transforms=ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--buildings", type=int, default=20000)
+    parser.add_argument("--zones", type=int, default=12)
+    parser.add_argument("--scenarios", type=int, default=5000)
+    parser.add_argument("--transforms", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--from-db", action="store_true", help="build the profile from DATABASE_URL")
+    parser.add_argument("--history-days", type=int, default=14)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.from_db:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            profile = build_profile(db, args.history_days)
+        finally:
+            db.close()
+    else:
+        profile = _profile(args.buildings, args.zones, np.random.default_rng(args.seed))
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    build_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rng = random.Random(args.seed)
+    zone_names = profile.zone_names or ["unknown"]
+    scenarios = [_scenario(i, zone_names, args.transforms, rng) for i in range(args.scenarios)]
+
+    t0 = time.perf_counter()
+    simulate(profile, scenarios)
+    elapsed = time.perf_counter() - t0
+
+    report = {
+        "profile_source": f"database, {args.history_days} days" if args.from_db else "synthetic",
+        "buildings": profile.buildings,
+        "groups": len(profile.groups),
+        "scenarios": args.scenarios,
+        "transforms_per_scenario": args.transforms,
+        "profile_build_ms": round(build_ms, 1),
+        "max_rss_kb_after_build": build_rss_kb,
+        "evaluate_s": round(elapsed, 3),
+        "scenarios_per_s": round(args.scenarios / elapsed),
+        "us_per_scenario": round(elapsed / args.scenarios * 1e6, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
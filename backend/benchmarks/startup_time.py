@@ -0,0 +1,75 @@
+"""
+Cold-start cost of the API: `import app.main` in a fresh interpreter.
+
+Runs `python -X importtime -c "import app.main"` several times and reports
+the best total wall time plus the slowest modules by cumulative import time
+(grouped by top-level package), so regressions from a new eager import show
+up in review.
+
+    python -m benchmarks.startup_time --repeat 5 --top 15
+    python -m benchmarks.startup_time --module app.jobs
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+
+def _run(module: str) -> Tuple[float, Dict[str, int], Dict[str, int]]:
+    """(wall seconds, {module: cumulative us}, {module: self us})"""
+    env = dict(os.environ)
+    env.setdefault("PYTHONPATH", os.getcwd())
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+
+    cumulative, own = {}, {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|")
+            own[name.strip()] = int(self_us)
+            cumulative[name.strip()] = int(cum_us)
+        except ValueError:  # header line
+            continue
+    return wall, cumulative, own
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [_run(args.module) for _ in range(args.repeat)]
+    wall, cumulative, own = min(runs, key=lambda r: r[0])
+
+    print(f"import {args.module}: best {wall * 1000:.0f} ms wall of {args.repeat} runs "
+          f"({cumulative.get(args.module, 0) / 1000:.0f} ms in imports)")
+
+    packages = defaultdict(int)
+    for name, us in own.items():
+        packages[name.split(".")[0]] += us
+    print(f"\n{'package':<28}{'self ms':>10}")
+    for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{name:<28}{us / 1000:>10.1f}")
+
+    print(f"\n{'module':<48}{'cumulative ms':>14}")
+    for name, us in sorted(cumulative.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{name:<48}{us / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
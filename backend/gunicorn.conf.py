@@ -0,0 +1,43 @@
+"""
+Multi-worker deployment:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Workers are uvicorn ASGI workers (WEB_CONCURRENCY, default 2 x CPUs + 1).
+Tables are created once in the master before forking instead of by every
+worker at startup. Trained forecast models and rollup snapshots live in the
+shared on-disk cache (SHARED_CACHE_DIR), so extra workers reuse them instead
+of retraining. With JOBS_ENABLED, each worker runs the scheduler but the
+job leases make sure every job runs in only one of them per interval.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound memory growth from fragmentation.
+max_requests = int(os.getenv("MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+accesslog = "-"
+
+
+def on_starting(server):
+    from app.config import settings
+    from app.database import engine, init_db, read_engine
+
+    init_db()
+    engine.dispose()  # don't share pooled connections with forked workers
+    read_engine.dispose()
+    os.makedirs(settings.SHARED_CACHE_DIR, exist_ok=True)
+    if settings.WARMUP_ON_STARTUP:
+        from app.startup import warm_up
+
+        warm_up()  # forked workers inherit the imported modules
+
+    # Workers are forked from this process and inherit both of these.
+    settings.AUTO_CREATE_TABLES = False
+    os.environ["AUTO_CREATE_TABLES"] = "false"
@@ -0,0 +1,99 @@
+"""
+Shared fixtures. Every test runs against a fresh SQLite database in a
+temporary directory; the environment is set before `app` is imported so the
+engine and settings pick it up.
+"""
+import os
+import shutil
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="smarted-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["JOBS_ENABLED"] = "false"
+os.environ["SHARED_CACHE_DIR"] = os.path.join(_TMP, "cache")
+os.environ["TIMESERIES_STORE_DIR"] = os.path.join(_TMP, "timeseries")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import MetaData  # noqa: E402
+
+from app import models, partitions  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.services import grid_signals, ingest, simulation  # noqa: E402
+from app.services.intensity_tiles import intensity_tiles  # noqa: E402
+from app.services.spatial import spatial_index  # noqa: E402
+from app.services.timeseries_store import timeseries_store  # noqa: E402
+from app.shared_cache import shared_cache  # noqa: E402
+
+pytest_plugins = ["app.pytest_plugin"]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+def _reset_state():
+    reflected = MetaData()
+    reflected.reflect(bind=engine)
+    reflected.drop_all(bind=engine)
+    init_db()
+    with partitions._known_lock:
+        partitions._known.clear()
+    partitions._base_empty = False
+    ingest._index_checked = (0.0, False)
+    grid_signals._curves.clear()
+    simulation.profiles.clear()
+    spatial_index.__init__()
+    intensity_tiles.__init__()
+    shutil.rmtree(settings.TIMESERIES_STORE_DIR, ignore_errors=True)
+    timeseries_store.__init__(settings.TIMESERIES_STORE_DIR)
+    shutil.rmtree(settings.SHARED_CACHE_DIR, ignore_errors=True)
+    shared_cache.__init__(settings.SHARED_CACHE_DIR, shared_cache.memory_items)
+
+
+@pytest.fixture(autouse=True)
+def fresh_database(monkeypatch):
+    # Settings changed by a test are restored by monkeypatch.
+    monkeypatch.setattr(settings, "READINGS_PARTITIONING", False)
+    _reset_state()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_building(db):
+    """make_building(type=..., city_zone=..., meters=("energy_meter",)) -> (building, sensor ids)."""
+    counter = {"n": 0}
+
+    def make(type="office", city_zone="Central", meters=("energy_meter",), lat=12.97, lon=77.59):
+        counter["n"] += 1
+        building = models.Building(
+            name=f"{type}-{counter['n']}", type=type, city_zone=city_zone,
+            latitude=lat, longitude=lon,
+        )
+        db.add(building)
+        db.flush()
+        sensors = [models.Sensor(building_id=building.id, sensor_type=m) for m in meters]
+        db.add_all(sensors)
+        db.commit()
+        return building, [s.id for s in sensors]
+
+    return make
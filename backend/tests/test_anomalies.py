@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import models
+from app.services.ingest import upsert_readings
+
+START = datetime(2026, 3, 1)
+
+
+def _history(sensor_id, days=10, seed=0):
+    """Hourly readings around 10 kWh with a little noise."""
+    rng = np.random.default_rng(seed)
+    return [
+        (sensor_id, START + timedelta(hours=h), float(10.0 + rng.normal(0, 0.2)))
+        for h in range(days * 24)
+    ]
+
+
+def _anomalies(db):
+    return [
+        (a.sensor_id, a.timestamp, a.kind, a.zscore)
+        for a in db.query(models.Anomaly).order_by(models.Anomaly.sensor_id, models.Anomaly.timestamp)
+    ]
+
+
+@pytest.fixture
+def sensor(make_building, db):
+    _, (sensor_id,) = make_building()
+    upsert_readings(db, _history(sensor_id))
+    return sensor_id
+
+
+def test_spike_is_flagged_once_the_baseline_is_warm(db, sensor):
+    spike_at = START + timedelta(days=10, hours=3)
+    result = upsert_readings(db, [(sensor, spike_at, 40.0)])
+    assert result["anomalies"] == 1
+    [(sensor_id, timestamp, kind, zscore)] = _anomalies(db)
+    assert (sensor_id, timestamp, kind) == (sensor, spike_at, "spike")
+    assert zscore > 4.0
+
+
+def test_one_batch_scores_like_reading_by_reading(db, make_building):
+    _, (batched,) = make_building()
+    _, (single,) = make_building()
+    history = _history(batched) + [(batched, START + timedelta(days=10, hours=h), 40.0) for h in (1, 2)]
+    history += [(batched, START + timedelta(days=10, hours=3), 0.5)]
+
+    upsert_readings(db, history)
+    for _, ts, value in history:
+        upsert_readings(db, [(single, ts, value)])
+
+    found = _anomalies(db)
+    assert len(found) == 6  # spike, spike, drop for each sensor
+    by_sensor = {s: [(t, k, z) for sid, t, k, z in found if sid == s] for s in (batched, single)}
+    assert by_sensor[batched] == by_sensor[single]
+    baselines = {b.sensor_id: np.frombuffer(b.state) for b in db.query(models.SensorBaseline)}
+    np.testing.assert_allclose(baselines[batched], baselines[single])
+
+
+def test_correction_replaces_the_anomaly(db, sensor):
+    at = START + timedelta(days=10, hours=3)
+    upsert_readings(db, [(sensor, at, 40.0)])
+
+    assert upsert_readings(db, [(sensor, at, 10.1)])["anomalies"] == 0
+    assert _anomalies(db) == []
+
+    assert upsert_readings(db, [(sensor, at, 0.5)])["anomalies"] == 1
+    assert [kind for _, _, kind, _ in _anomalies(db)] == ["drop"]
+
+
+def test_feed_pages_with_the_cursor(client, db, sensor):
+    upsert_readings(db, [(sensor, START + timedelta(days=10, hours=h), 40.0) for h in range(5)])
+
+    first = client.get("/api/v1/energy/anomalies", params={"limit": 3})
+    assert first.status_code == 200
+    assert len(first.json()) == 3
+    cursor = first.headers["X-Next-Cursor"]
+
+    rest = client.get("/api/v1/energy/anomalies", params={"cursor": cursor})
+    ids = [e["id"] for e in first.json() + rest.json()]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+    upsert_readings(db, [(sensor, START + timedelta(days=10, hours=6), 40.0)])
+    new = client.get("/api/v1/energy/anomalies", params={"cursor": rest.headers["X-Next-Cursor"]})
+    assert [e["timestamp"] for e in new.json()] == [(START + timedelta(days=10, hours=6)).isoformat()]
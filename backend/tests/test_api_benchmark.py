@@ -0,0 +1,34 @@
+import asyncio
+import random
+
+from benchmarks import api_benchmark
+
+
+def test_in_process_run_reports_latency_and_queries(make_building, capsys):
+    make_building()
+    random.seed(0)
+    report = asyncio.run(
+        api_benchmark.run_benchmark(
+            ["intensity", "ingest", "risk"], n_requests=6, concurrency=2, horizon=6, warmup=1
+        )
+    )
+
+    # No institutions: the risk scenario is skipped
+    assert list(report["scenarios"]) == ["intensity", "ingest"]
+    assert report["database"] == {"buildings": 1, "sensors": 1, "institutions": 0}
+    for row in report["scenarios"].values():
+        assert (row["completed"], row["errors"], row["status_codes"]) == (6, 0, {"200": 6})
+        latency = row["latency_ms"]
+        assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert row["queries_per_request"] > 0
+
+    api_benchmark.compare(report, report)
+    out = capsys.readouterr().out
+    assert "intensity  rps    +0.0%" in out
+
+
+def test_percentiles_pick_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert api_benchmark._percentile(values, 50) == 51.0
+    assert api_benchmark._percentile(values, 99) == 99.0
+    assert api_benchmark._percentile([], 95) is None
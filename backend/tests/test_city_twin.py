@@ -0,0 +1,35 @@
+def test_listing_projects_fields_and_pages(client, make_building):
+    for _ in range(3):
+        make_building()
+    first = client.get("/api/v1/city/buildings", params={"limit": 2, "fields": "name"})
+    assert first.status_code == 200
+    assert [set(item) for item in first.json()] == [{"id", "name"}] * 2
+    cursor = first.headers["x-next-cursor"]
+
+    rest = client.get("/api/v1/city/buildings", params={"limit": 2, "cursor": cursor})
+    assert len(rest.json()) == 1
+    assert "x-next-cursor" not in rest.headers
+
+    bad = client.get("/api/v1/city/buildings", params={"fields": "name,height"})
+    assert bad.status_code == 400
+
+
+def test_listing_schema_allows_projection(client):
+    schema = client.get("/openapi.json").json()
+    item = schema["components"]["schemas"]["BuildingFieldsOut"]
+    assert item["required"] == ["id"]
+
+
+def test_if_none_match_compares_whole_tags(client, make_building):
+    make_building()
+    etag = client.get("/api/v1/city/buildings").headers["etag"]
+    opaque = etag[2:]  # drop W/
+
+    for header in (etag, opaque, f'"other", {etag}', "*"):
+        response = client.get("/api/v1/city/buildings", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+
+    longer = opaque[:-1] + 'abc"'
+    for header in (longer, f'W/{longer}', f'"x{opaque[1:]}'):
+        response = client.get("/api/v1/city/buildings", headers={"If-None-Match": header})
+        assert response.status_code == 200, header
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.concurrency import AdmissionLimiter, Overloaded, forecast_limiter, run_heavy
+from app.workers import ComputeCancelled
+
+
+def test_cancelled_computation_is_a_503():
+    def cancelled():
+        raise ComputeCancelled("client disconnected")
+
+    with pytest.raises(HTTPException) as caught:
+        asyncio.run(run_heavy(forecast_limiter, ("test", "cancelled"), cancelled))
+    assert caught.value.status_code == 503
+    assert "Retry-After" in caught.value.headers
+
+
+def test_cancelled_forecast_is_not_a_500(client, make_building, monkeypatch):
+    building, _ = make_building()
+
+    def cancelled(*args, **kwargs):
+        raise ComputeCancelled("client disconnected")
+
+    monkeypatch.setattr("app.routers.energy.forecast_building_energy", cancelled)
+    response = client.get(f"/api/v1/energy/forecast/{building.id}")
+    assert response.status_code == 503
+
+
+def test_limiter_counts_running_and_waiting():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=1, queue_timeout_s=1.0, retry_after_s=1)
+
+    async def scenario():
+        release = asyncio.Event()
+        seen = []
+
+        async def hold():
+            async with limiter.slot():
+                seen.append((limiter.running, limiter.waiting))
+                await release.wait()
+
+        first = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        assert (limiter.running, limiter.waiting) == (1, 1)
+        with pytest.raises(Overloaded):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(first, second)
+        return seen
+
+    assert asyncio.run(scenario()) == [(1, 0), (1, 0)]
+    assert (limiter.running, limiter.waiting, limiter.rejected) == (0, 0, 1)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.responses import FastJSONResponse, fast_json_enabled
+from app.services.ingest import upsert_readings
+
+
+@pytest.fixture
+def building_with_history(db, make_building):
+    building, (sensor_id,) = make_building()
+    latest = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 1.0 + h % 5) for h in range(48)])
+    return building
+
+
+def _get_both(client, monkeypatch, method, url, **kwargs):
+    bodies = []
+    for fast in (False, True):
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast)
+        response = client.request(method, url, **kwargs)
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/json"
+        bodies.append(response.json())
+    return bodies
+
+
+@pytest.mark.parametrize(
+    "method, url, body",
+    [
+        ("GET", "/api/v1/energy/intensity", None),
+        ("GET", "/api/v1/energy/forecast/{id}?horizon_hours=6", None),
+        ("POST", "/api/v1/optimize/energy", {"max_load_kw": 50.0, "hours": 6, "mode": "peak"}),
+    ],
+)
+def test_fast_path_returns_the_same_json(client, monkeypatch, building_with_history, method, url, body):
+    # Serve the stored forecast on the second call, so both see the same run
+    monkeypatch.setattr(settings, "FORECAST_MAX_AGE_S", 3600)
+    url = url.format(id=building_with_history.id)
+    if body is not None:
+        body = {**body, "building_id": building_with_history.id}
+
+    default, fast = _get_both(client, monkeypatch, method, url, json=body)
+    if body is not None:
+        # Each solve plans from its own "now"
+        for result in (default, fast):
+            for item in result["schedule"]:
+                item.pop("timestamp")
+    assert fast == default and fast
+
+
+def test_fast_path_encodes_numpy_and_datetimes(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    assert fast_json_enabled()
+    body = FastJSONResponse({"at": datetime(2026, 1, 2, 3), "values": np.array([1.5, 2.0]), 1: "x"}).body
+    assert body == b'{"at":"2026-01-02T03:00:00","values":[1.5,2.0],"1":"x"}'
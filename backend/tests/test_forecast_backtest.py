@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.ingest import upsert_readings
+from benchmarks import forecast_backtest
+
+END = datetime(2026, 4, 1)
+
+
+def _daily_pattern(db, make_building, days, type="office"):
+    building, (sensor_id,) = make_building(type=type)
+    hours = [END - timedelta(hours=h) for h in range(1, days * 24 + 1)]
+    upsert_readings(db, [(sensor_id, ts, 1.0 + ts.hour) for ts in hours])
+    return building
+
+
+def test_fold_origins_step_back_from_the_end():
+    origins = forecast_backtest._fold_origins(END, folds=3, step_hours=24, horizon=6)
+    assert origins == [END - timedelta(hours=6 + 48), END - timedelta(hours=6 + 24), END - timedelta(hours=6)]
+
+
+def test_repeating_day_is_forecast_exactly_by_the_baseline(db, make_building):
+    building = _daily_pattern(db, make_building, days=10)
+    origins = forecast_backtest._fold_origins(END, folds=2, step_hours=24, horizon=6)
+
+    result = forecast_backtest.backtest_building(building.id, origins, history_days=7, horizon=6)
+
+    assert sorted(result["errors"]) == [1, 2, 3, 4, 5, 6]
+    assert len(result["fit_ms"]) == len(result["predict_ms"]) == 2
+    for metrics in result["errors"].values():
+        assert len(metrics["baseline_ae"]) == 2
+        assert max(metrics["baseline_ae"]) == pytest.approx(0.0)
+        assert max(metrics["baseline_ape"]) == pytest.approx(0.0)
+
+
+def test_summary_groups_by_type_and_horizon():
+    results = [
+        {"building_id": 1, "errors": {1: {"hybrid_ae": [1.0], "hybrid_ape": [0.5]}},
+         "fit_ms": [2.0], "predict_ms": [1.0], "peak_fit_bytes": 10, "worker_max_rss_kb": 5},
+        {"building_id": 2, "errors": {1: {"hybrid_ae": [3.0], "hybrid_ape": [0.1]}},
+         "fit_ms": [4.0], "predict_ms": [1.0], "peak_fit_bytes": 30, "worker_max_rss_kb": 7},
+    ]
+    report = forecast_backtest.summarize(results, {1: "school", 2: "office"})
+
+    assert report["accuracy"]["all"][1]["hybrid_mae"] == 2.0
+    assert report["accuracy"]["all"][1]["hybrid_mape_pct"] == 30.0
+    assert report["accuracy"]["school"][1]["samples"] == 1
+    assert report["accuracy"]["all"][1]["ml_mae"] is None
+    assert (report["cost"]["fits"], report["cost"]["fit_ms_mean"]) == (2, 3.0)
+    assert report["cost"]["peak_fit_bytes_max"] == 30
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.services.energy_forecasting import forecast_building_energy
+from app.services.ingest import upsert_readings
+
+
+def test_cached_model_is_refit_after_a_backdated_correction(db, make_building, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_CACHE_ENABLED", True)
+    building, (sensor_id,) = make_building()
+    latest = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 1.0) for h in range(72)])
+
+    before = [f["predicted_value"] for f in forecast_building_energy(db, building.id, 6)]
+    assert forecast_building_energy(db, building.id, 6)[0]["predicted_value"] == before[0]
+
+    # Same latest hour, older values corrected
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 50.0) for h in range(24, 72)])
+    after = [f["predicted_value"] for f in forecast_building_energy(db, building.id, 6)]
+    assert after != before
+
+
+
+def test_store_without_data_falls_back_to_the_database(db, make_building, monkeypatch):
+    building, (sensor_id,) = make_building()
+    latest = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    # Written with the store off, as seed_data / synthetic_data do
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 2.0) for h in range(48)])
+    expected = [f["predicted_value"] for f in forecast_building_energy(db, building.id, 6)]
+    assert len(expected) == 6
+
+    monkeypatch.setattr(settings, "TIMESERIES_STORE_ENABLED", True)
+    for shared in (False, True):
+        monkeypatch.setattr(settings, "SHARED_CACHE_ENABLED", shared)
+        assert [f["predicted_value"] for f in forecast_building_energy(db, building.id, 6)] == expected
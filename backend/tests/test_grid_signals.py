@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from app.schemas import EnergyOptimizationRequest
+from app.services import grid_signals
+from app.services.optimization_engine import _objective_profile
+
+DAY = datetime(2026, 5, 4)
+
+
+def _hours(*hours):
+    return [DAY + timedelta(hours=h) for h in hours]
+
+
+def _import(db, values, zone="Central", **kwargs):
+    points = [(zone, DAY + timedelta(hours=h), v) for h, v in values.items()]
+    return grid_signals.import_points(db, grid_signals.TARIFF, points, **kwargs)
+
+
+def test_newer_version_replaces_its_whole_range(db):
+    _import(db, {h: 1.0 + h for h in range(6)})
+    _import(db, {1: 10.0, 3: 30.0}, valid_until=DAY + timedelta(hours=4))
+
+    values = grid_signals.tariff_profile(db, "Central", _hours(0, 1, 2, 3, 4, 5))
+    # hour 2 of the first import is inside the second one's range
+    assert values == [1.0, 10.0, 10.0, 30.0, 5.0, 6.0]
+
+
+def test_curve_ends_after_its_last_step(db):
+    _import(db, {0: 1.0, 1: 2.0})
+    assert grid_signals.tariff_profile(db, "Central", _hours(0, 1)) == [1.0, 2.0]
+    assert grid_signals.tariff_profile(db, "Central", _hours(0, 1, 2)) is None
+
+    _import(db, {3: 4.0}, zone="Other", valid_until=DAY + timedelta(hours=5))
+    assert grid_signals.tariff_profile(db, "Other", _hours(3, 4)) == [4.0, 4.0]
+    assert grid_signals.tariff_profile(db, "Other", _hours(5)) is None
+
+
+def test_each_import_gets_its_own_version(db):
+    versions = [_import(db, {0: 1.0})["version"] for _ in range(3)]
+    assert versions == sorted(set(versions))
+
+
+def test_request_tariffs_win_over_imported_curves(db, make_building):
+    building, _ = make_building(city_zone="Central")
+    _import(db, {h: 3.0 for h in range(4)})
+    timestamps = _hours(0, 1, 2, 3)
+
+    imported = EnergyOptimizationRequest(building_id=building.id, max_load_kw=10, mode="cost")
+    assert _objective_profile(db, imported, timestamps) == [3.0] * 4
+
+    explicit = EnergyOptimizationRequest(
+        building_id=building.id, max_load_kw=10, mode="cost", day_tariff=9.0
+    )
+    assert _objective_profile(db, explicit, timestamps) is None
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func, inspect, insert, text
+
+from app import models
+from app.config import settings
+from app.services import ingest
+from app.services.ingest import dedupe_readings, upsert_readings
+from app.services.timeseries_store import timeseries_store
+
+START = datetime(2026, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def store_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "TIMESERIES_STORE_ENABLED", True)
+
+
+def _stored(db):
+    return sorted(
+        (r.sensor_id, r.timestamp, r.value) for r in db.query(models.EnergyReading)
+    )
+
+
+def _store_total(building_id):
+    _, values = timeseries_store.window(building_id, START, START + timedelta(days=1))
+    return float(np.nansum(values))
+
+
+def test_single_reading_resend_updates_in_place(client, db, make_building):
+    _, (sensor_id,) = make_building()
+    reading = {"sensor_id": sensor_id, "timestamp": START.isoformat(), "value": 2.5}
+
+    first = client.post("/api/v1/energy/readings", json=reading)
+    again = client.post("/api/v1/energy/readings", json=reading)
+    corrected = client.post("/api/v1/energy/readings", json={**reading, "value": 3.0})
+
+    assert first.status_code == again.status_code == corrected.status_code == 200
+    assert first.json()["id"] == again.json()["id"] == corrected.json()["id"]
+    assert corrected.json()["value"] == 3.0
+    assert _stored(db) == [(sensor_id, START, 3.0)]
+    assert db.query(models.SensorHealth).one().reading_count == 1
+
+
+def test_batch_retry_counts_and_store_totals(db, make_building):
+    building, (sensor_id,) = make_building()
+    readings = [(sensor_id, START + timedelta(hours=h), 1.0 + h) for h in range(6)]
+
+    assert upsert_readings(db, readings)["inserted"] == 6
+    retry = upsert_readings(db, readings)
+    assert (retry["inserted"], retry["updated"], retry["unchanged"]) == (0, 0, 6)
+
+    corrected = readings[:5] + [(sensor_id, START + timedelta(hours=5), 10.0)]
+    result = upsert_readings(db, corrected)
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (0, 1, 5)
+
+    assert len(_stored(db)) == 6
+    assert _store_total(building.id) == pytest.approx(1 + 2 + 3 + 4 + 5 + 10)
+    assert db.query(models.SensorHealth).one().reading_count == 6
+
+
+def test_duplicates_in_one_batch_keep_the_last_value(db, make_building):
+    building, (sensor_id,) = make_building()
+    result = upsert_readings(db, [(sensor_id, START, 1.0), (sensor_id, START, 4.0)])
+    assert (result["received"], result["inserted"]) == (1, 1)
+    assert _stored(db) == [(sensor_id, START, 4.0)]
+    assert _store_total(building.id) == 4.0
+
+
+def test_dedupe_keeps_newest_row_and_adds_the_index(db, make_building):
+    building, (sensor_id,) = make_building()
+    db.execute(text(f"DROP INDEX {ingest.UNIQUE_INDEX}"))
+    db.execute(
+        insert(models.EnergyReading),
+        [
+            {"sensor_id": sensor_id, "timestamp": START, "value": 1.0},
+            {"sensor_id": sensor_id, "timestamp": START, "value": 2.0},
+            {"sensor_id": sensor_id, "timestamp": START + timedelta(hours=1), "value": 5.0},
+        ],
+    )
+    db.commit()
+    ingest._index_checked = (0.0, False)
+
+    assert dedupe_readings(db) == {"removed": 1, "buildings": 1}
+    names = {ix["name"] for ix in inspect(db.get_bind()).get_indexes("energy_readings")}
+    assert ingest.UNIQUE_INDEX in names
+    assert _stored(db) == [(sensor_id, START, 2.0), (sensor_id, START + timedelta(hours=1), 5.0)]
+    assert _store_total(building.id) == 7.0
+
+    # Re-running is a no-op
+    assert dedupe_readings(db)["removed"] == 0
+    assert db.query(func.count(models.EnergyReading.id)).scalar() == 2
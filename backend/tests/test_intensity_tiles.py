@@ -0,0 +1,44 @@
+import json
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.services.ingest import upsert_readings
+from app.services.intensity_tiles import IntensityTileCache, lonlat_to_tile
+
+
+def _tile_of(lat, lon, z=12):
+    x, y = lonlat_to_tile(lon, lat, z)
+    return z, int(x), int(y)
+
+
+def test_tile_sees_readings_ingested_by_another_worker(db, make_building, monkeypatch):
+    monkeypatch.setattr(settings, "INTENSITY_TILE_SYNC_INTERVAL_S", 0.0)
+    _, (sensor_id,) = make_building(lat=12.97, lon=77.59)
+    z, x, y = _tile_of(12.97, 77.59)
+    # This cache stands in for another process: ingest never notifies it.
+    worker = IntensityTileCache()
+
+    first = worker.get(db, z, x, y)
+    assert json.loads(first.body)["features"][0]["total_kwh_24h"] == 0.0
+
+    upsert_readings(db, [(sensor_id, datetime.utcnow() - timedelta(hours=1), 5.0)])
+    second = worker.get(db, z, x, y)
+    assert second is not first
+    assert json.loads(second.body)["features"][0]["total_kwh_24h"] == 5.0
+    assert worker.stats["invalidated"] == 1
+
+    # No new writes: served from the cache
+    assert worker.get(db, z, x, y) is second
+
+
+def test_tile_response_is_publicly_cacheable_and_revalidated(client, make_building):
+    make_building(lat=12.97, lon=77.59)
+    z, x, y = _tile_of(12.97, 77.59)
+
+    response = client.get(f"/api/v1/energy/intensity/tiles/{z}/{x}/{y}")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=60, stale-while-revalidate=900"
+    etag = response.headers["etag"]
+
+    cached = client.get(f"/api/v1/energy/intensity/tiles/{z}/{x}/{y}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
@@ -0,0 +1,55 @@
+import os
+from datetime import datetime, timedelta
+
+from app import jobs, models
+from app.config import settings
+from app.services import education_models
+from app.services.analytics import DASHBOARD_SNAPSHOT, latest_snapshot
+from app.services.ingest import upsert_readings
+from app.shared_cache import shared_cache
+
+
+def test_rollups_leave_the_shared_cache_alone_when_disabled(db, make_building, monkeypatch):
+    make_building()
+    pruned = []
+    monkeypatch.setattr(shared_cache, "prune", lambda max_age_s: pruned.append(max_age_s))
+
+    assert jobs.refresh_rollups(db) == 1
+    assert not os.path.exists(settings.SHARED_CACHE_DIR) and not pruned
+    assert latest_snapshot(db, DASHBOARD_SNAPSHOT, 60)["monitored_buildings"] == 1
+
+    monkeypatch.setattr(settings, "SHARED_CACHE_ENABLED", True)
+    jobs.refresh_rollups(db)
+    assert shared_cache.get("snapshots", DASHBOARD_SNAPSHOT)["monitored_buildings"] == 1
+    assert pruned == [settings.SHARED_CACHE_MAX_AGE_S]
+
+
+def test_forecast_job_keeps_only_the_newest_run(db, make_building):
+    building, (sensor_id,) = make_building()
+    latest = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 1.0 + h % 3) for h in range(48)])
+
+    for _ in range(3):
+        assert jobs.refresh_forecasts(db) == 1
+    stored = db.query(models.EnergyForecast).filter_by(building_id=building.id).all()
+    assert sorted(f.horizon_hours for f in stored) == list(range(1, settings.JOB_FORECAST_HORIZON + 1))
+
+
+def test_one_failing_institution_does_not_stop_the_risk_job(db, make_building, monkeypatch, caplog):
+    building, _ = make_building(type="school")
+    db.add_all([
+        models.Institution(building_id=building.id, name=f"inst-{i}", level="school")
+        for i in range(3)
+    ])
+    db.commit()
+    real = education_models.compute_institution_risk
+
+    def flaky(db, institution_id):
+        if institution_id == 2:
+            raise ValueError("bad data")
+        return real(db, institution_id)
+
+    monkeypatch.setattr(education_models, "compute_institution_risk", flaky)
+    assert jobs.refresh_risk_scores(db) == 2
+    assert {f.institution_id for f in db.query(models.EducationForecast)} == {1, 3}
+    assert "Risk refresh failed for institution 2" in caplog.text
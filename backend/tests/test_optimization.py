@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.mark.parametrize("lookback, hours", [(-1, 24), (25, 24), (7, 6)])
+def test_rolling_lookback_is_bounded_by_the_horizon(client, lookback, hours):
+    response = client.post(
+        "/api/v1/optimize/energy/rolling",
+        json={"building_id": 1, "max_load_kw": 50, "hours": hours, "lookback_hours": lookback},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][-1] == "lookback_hours"
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from app.services import analytics, panels
+from app.services.ingest import upsert_readings
+
+
+def _post(client, *specs):
+    response = client.post("/api/v1/analytics/panels", json={"panels": list(specs)})
+    assert response.status_code == 200
+    return {p["id"]: p for p in response.json()["panels"]}
+
+
+def test_params_are_validated_per_panel(client, make_building):
+    make_building(type="school")
+    make_building(type="office")
+
+    result = _post(
+        client,
+        {"id": "ok", "type": "buildings", "params": {"type": "school"}},
+        {"id": "limit", "type": "buildings", "params": {"limit": "lots"}},
+        {"id": "missing", "type": "forecast", "params": {}},
+        {"id": "typo", "type": "summary", "params": {"zone": "Central"}},
+    )
+
+    assert result["ok"]["ok"] and [b["type"] for b in result["ok"]["data"]] == ["school"]
+    for panel_id in ("limit", "missing", "typo"):
+        assert not result[panel_id]["ok"]
+        assert result[panel_id]["error"].startswith("Bad params")
+
+
+def test_unexpected_error_fails_only_that_panel(client, make_building, monkeypatch, caplog):
+    make_building()
+
+    def broken(db, shared, params):
+        raise ZeroDivisionError("boom")
+
+    monkeypatch.setitem(panels.PANELS, "summary", ((), broken, False))
+    result = _post(
+        client,
+        {"id": "summary", "type": "summary"},
+        {"id": "buildings", "type": "buildings", "params": {"limit": 1}},
+    )
+
+    assert result["summary"] == {
+        "id": "summary", "type": "summary", "ok": False, "data": None, "error": "Internal error",
+    }
+    assert result["buildings"]["ok"] and len(result["buildings"]["data"]) == 1
+    assert "Panel summary (summary) failed" in caplog.text
+
+
+def test_building_panels_filter_and_limit_in_sql(client, db, make_building):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    for i in range(4):
+        _, (sensor_id,) = make_building(type="school" if i % 2 else "office")
+        upsert_readings(db, [(sensor_id, hour, float(i + 1))])
+
+    result = _post(
+        client,
+        {"id": "list", "type": "buildings", "params": {"type": "office", "limit": 1}},
+        {"id": "map", "type": "intensity", "params": {"type": "school", "limit": 5}},
+    )
+    assert [b["name"] for b in result["list"]["data"]] == ["office-1"]
+    assert [(b["name"], b["total_kwh_24h"]) for b in result["map"]["data"]] == [
+        ("school-2", 2.0), ("school-4", 4.0),
+    ]
+
+
+def test_summary_reuses_the_shared_24h_input(client, db, make_building, monkeypatch):
+    _, (sensor_id,) = make_building()
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+    upsert_readings(db, [(sensor_id, hour + timedelta(hours=h), v) for h, v in enumerate((1.0, 4.0))])
+    expected = analytics.compute_dashboard_summary(db)
+
+    def rescan(*args):
+        raise AssertionError("24h readings scanned again")
+
+    monkeypatch.setattr(analytics, "day_load_range", rescan)
+    result = _post(client, {"id": "s", "type": "summary"}, {"id": "m", "type": "intensity"})
+    assert result["s"]["data"] == expected
+
+
+def test_horizon_is_bounded_and_ids_are_unique(client):
+    result = _post(
+        client, {"id": "f", "type": "forecast", "params": {"building_id": 1, "horizon_hours": 10_000}}
+    )
+    assert result["f"]["error"].startswith("Bad params")
+
+    response = client.post(
+        "/api/v1/analytics/panels",
+        json={"panels": [{"id": "a", "type": "summary"}, {"id": "a", "type": "intensity"}]},
+    )
+    assert response.status_code == 422
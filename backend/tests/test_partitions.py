@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import partitions
+from app.config import settings
+from app.services.ingest import get_reading, upsert_readings
+
+
+def _all_readings(db):
+    source = partitions.readings(db)
+    return sorted(
+        db.execute(select(source.c.id, source.c.sensor_id, source.c.timestamp, source.c.value)).all(),
+        key=lambda r: r.timestamp,
+    )
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    monkeypatch.setattr(settings, "READINGS_PARTITIONING", True)
+
+
+def test_resend_after_enabling_updates_the_unmigrated_row(db, make_building, monkeypatch):
+    _, (sensor_id,) = make_building()
+    at = datetime(2026, 1, 15, 8)
+    upsert_readings(db, [(sensor_id, at, 1.0)])
+
+    monkeypatch.setattr(settings, "READINGS_PARTITIONING", True)
+    result = upsert_readings(db, [(sensor_id, at, 2.0), (sensor_id, at + timedelta(hours=1), 3.0)])
+
+    assert (result["inserted"], result["updated"]) == (1, 1)
+    assert [(r.timestamp, r.value) for r in _all_readings(db)] == [(at, 2.0), (at + timedelta(hours=1), 3.0)]
+    assert get_reading(db, sensor_id, at).value == 2.0
+
+    assert partitions.migrate(db) == 1
+    rows = _all_readings(db)
+    assert len(rows) == 2 and len({r.id for r in rows}) == 2
+    assert upsert_readings(db, [(sensor_id, at, 2.0)])["unchanged"] == 1
+
+
+def test_month_boundary_routes_to_each_shard(db, make_building, partitioned):
+    _, (sensor_id,) = make_building()
+    last_hour = datetime(2026, 1, 31, 23)
+    upsert_readings(db, [(sensor_id, last_hour, 1.0), (sensor_id, last_hour + timedelta(hours=1), 2.0)])
+
+    for month, value in ((datetime(2026, 1, 1), 1.0), (datetime(2026, 2, 1), 2.0)):
+        table = partitions.shard_table(month)
+        assert [r.value for r in db.execute(select(table.c.value))] == [value]
+
+    ids = [r.id for r in _all_readings(db)]
+    assert len(set(ids)) == 2
+    february = partitions.readings(db, datetime(2026, 2, 1), datetime(2026, 3, 1))
+    assert [r.value for r in db.execute(select(february.c.value))] == [2.0]
+
+
+def test_retention_drops_whole_months_and_never_reuses_ids(db, make_building, partitioned):
+    _, (sensor_id,) = make_building()
+    upsert_readings(db, [(sensor_id, datetime(2026, m, 10), float(m)) for m in (1, 2, 3)])
+    dropped_ids = {r.id for r in _all_readings(db) if r.timestamp < datetime(2026, 3, 1)}
+
+    assert partitions.drop_before(db, datetime(2026, 3, 1)) == [
+        "energy_readings_2026_01", "energy_readings_2026_02",
+    ]
+    assert [r.value for r in _all_readings(db)] == [3.0]
+
+    upsert_readings(db, [(sensor_id, datetime(2026, 1, 10), 9.0)])
+    ids = {r.id for r in _all_readings(db)}
+    assert len(ids) == 2 and not ids & dropped_ids
@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+import pytest
+
+from app import profiling
+from app.concurrency import forecast_limiter, run_heavy
+from app.config import settings
+
+
+@pytest.fixture
+def sampled(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILING_PROFILER", "cprofile")
+    token = profiling._current.set(profiling.RequestTimings(sampled=True))
+    yield tmp_path
+    profiling._current.reset(token)
+
+
+def test_sync_endpoints_are_traced_with_cprofile(sampled):
+    endpoint = profiling._profiled_endpoint(lambda: sum(range(100)))
+    assert endpoint() == 4950
+    assert [p.endswith(".prof") for p in os.listdir(sampled)] == [True]
+
+
+def test_async_endpoints_trace_only_their_threadpool_work(sampled):
+    def solve():
+        return sum(range(100))
+
+    async def optimize():
+        await asyncio.sleep(0)
+        return await run_heavy(forecast_limiter, ("profiling", "test"), solve)
+
+    endpoint = profiling._profiled_endpoint(optimize)
+    assert asyncio.run(endpoint()) == 4950
+    # One trace, from the threadpool thread running `solve`; the event loop
+    # (shared with other requests) is not traced with cProfile
+    assert [name.split("-")[1] for name in os.listdir(sampled)] == ["solve"]
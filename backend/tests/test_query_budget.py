@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import models, pytest_plugin
+
+
+def _buildings_with_readings(db, make_building, count):
+    now = datetime.utcnow()
+    for _ in range(count):
+        _, (sensor_id,) = make_building()
+        db.add_all(
+            models.EnergyReading(sensor_id=sensor_id, timestamp=now - timedelta(hours=h), value=2.0)
+            for h in range(1, 4)
+        )
+    db.commit()
+
+
+def test_intensity_is_one_query(client, db, make_building, query_budget):
+    _buildings_with_readings(db, make_building, 5)
+    with query_budget(1):
+        response = client.get("/api/v1/energy/intensity")
+    assert response.status_code == 200
+    assert sorted(r["total_kwh_24h"] for r in response.json()) == [6.0] * 5
+
+
+@pytest.fixture
+def twenty_buildings(db, make_building):
+    _buildings_with_readings(db, make_building, 20)
+
+
+@pytest.mark.query_budget(8, max_repeats=2)
+def test_dashboard_summary_does_not_grow_with_buildings(client, twenty_buildings):
+    response = client.get("/api/v1/analytics/dashboard-summary")
+    assert response.status_code == 200
+    assert response.json()["monitored_buildings"] == 20
+
+
+def test_budget_fails_when_exceeded(client, db, make_building, query_budget):
+    _buildings_with_readings(db, make_building, 2)
+    with pytest.raises(pytest.fail.Exception, match="budget is 0"):
+        with query_budget(0):
+            client.get("/api/v1/energy/intensity")
+
+
+def test_queries_on_a_separate_read_engine_count(request, monkeypatch, tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    monkeypatch.setattr(pytest_plugin, "read_engine", replica)
+    query_budget = request.getfixturevalue("query_budget")
+
+    with pytest.raises(pytest.fail.Exception, match="2 statements executed"):
+        with query_budget(1):
+            with replica.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+    replica.dispose()
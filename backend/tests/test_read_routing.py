@@ -0,0 +1,148 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models
+from app.config import settings
+from app.database import get_read_db
+from app.services import panels
+from app.services.ingest import upsert_readings
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_ENDPOINTS = [
+    "/api/v1/city/buildings",
+    "/api/v1/city/buildings/within?south=52.0&west=4.0&north=53.0&east=5.0",
+    "/api/v1/city/buildings/near?lat=52.37&lon=4.89&radius_km=5",
+    "/api/v1/city/clusters?south=52.0&west=4.0&north=53.0&east=5.0",
+    "/api/v1/energy/sensors/health",
+    "/api/v1/energy/anomalies",
+    "/api/v1/energy/intensity",
+    "/api/v1/energy/intensity/tiles/0/0/0",
+    "/api/v1/analytics/dashboard-summary",
+]
+
+
+@pytest.fixture
+def read_only(client, db, make_building, monkeypatch):
+    """
+    Route get_read_db (and the panels' read sessions) to a query_only engine
+    on the test database; returns the list of sessions handed out.
+    """
+    from app.main import app
+
+    building, (sensor_id,) = make_building(lat=52.37, lon=4.89)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    upsert_readings(db, [(sensor_id, now - timedelta(hours=h), 1.0 + h % 3) for h in range(48)])
+
+    read_engine = database._make_engine(settings.SQLALCHEMY_DATABASE_URI, read_only=True)
+    database._sqlite_pragmas(read_engine, "query_only = ON")
+    ReadOnlySession = sessionmaker(autoflush=False, bind=read_engine, future=True)
+    handed_out = []
+
+    def make_session():
+        session = ReadOnlySession()
+        handed_out.append(session)
+        return session
+
+    def read_db():
+        session = make_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_read_db] = read_db
+    monkeypatch.setattr(panels, "ReadSessionLocal", make_session)
+    yield building, handed_out
+    app.dependency_overrides.pop(get_read_db, None)
+    read_engine.dispose()
+
+
+@pytest.mark.parametrize("url", READ_ENDPOINTS)
+def test_read_endpoints_work_on_a_read_only_engine(client, read_only, url):
+    _, handed_out = read_only
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    assert handed_out
+
+
+def test_read_only_engine_rejects_writes(read_only):
+    from app.main import app
+
+    gen = app.dependency_overrides[get_read_db]()
+    session = next(gen)
+    with pytest.raises(OperationalError):
+        session.execute(text("DELETE FROM buildings"))
+    gen.close()
+
+
+def test_forecast_reads_from_replica_and_writes_to_primary(client, db, read_only, monkeypatch):
+    building, handed_out = read_only
+    monkeypatch.setattr(settings, "FORECAST_MAX_AGE_S", 3600)
+
+    response = client.get(f"/api/v1/energy/forecast/{building.id}?horizon_hours=6")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 6
+    assert handed_out
+    stored = db.query(models.EnergyForecast).filter_by(building_id=building.id).count()
+    assert stored == 6
+
+
+def test_panels_use_read_sessions(client, read_only):
+    _, handed_out = read_only
+    response = client.post(
+        "/api/v1/analytics/panels",
+        json={"panels": [{"id": "b", "type": "buildings"}, {"id": "s", "type": "summary"}]},
+    )
+    assert response.status_code == 200, response.text
+    assert all(p["ok"] for p in response.json()["panels"]), response.text
+    assert handed_out
+
+
+def test_sqlite_read_url_is_query_only_and_primary_uses_wal(tmp_path):
+    db_path = tmp_path / "routing.db"
+    code = (
+        "import json\n"
+        "from sqlalchemy import text\n"
+        "from sqlalchemy.exc import OperationalError\n"
+        "from app.database import engine, read_engine, init_db\n"
+        "init_db()\n"
+        "with engine.connect() as conn:\n"
+        "    mode = conn.execute(text('PRAGMA journal_mode')).scalar()\n"
+        "with read_engine.connect() as conn:\n"
+        "    count = conn.execute(text('SELECT count(*) FROM buildings')).scalar()\n"
+        "    try:\n"
+        "        conn.execute(text('DELETE FROM buildings'))\n"
+        "        rejected = False\n"
+        "    except OperationalError:\n"
+        "        rejected = True\n"
+        "print(json.dumps({'separate': read_engine is not engine, 'journal_mode': mode,\n"
+        "                  'count': count, 'rejected': rejected}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=BACKEND,
+        env={
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "READ_DATABASE_URL": f"sqlite:///file:{db_path}?mode=ro&uri=true",
+            "JOBS_ENABLED": "false",
+        },
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == {
+        "separate": True,
+        "journal_mode": "wal",
+        "count": 0,
+        "rejected": True,
+    }
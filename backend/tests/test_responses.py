@@ -0,0 +1,76 @@
+import importlib
+from datetime import datetime, timedelta
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.responses import COLUMNAR_JSON, COLUMNAR_MSGPACK
+from app.services.ingest import upsert_readings
+
+
+@pytest.fixture
+def forecast_url(db, make_building):
+    building, (sensor_id,) = make_building()
+    latest = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    upsert_readings(db, [(sensor_id, latest - timedelta(hours=h), 1.0 + h % 4) for h in range(48)])
+    return f"/api/v1/energy/forecast/{building.id}?horizon_hours=6"
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_every_encoding_varies_on_accept(client, forecast_url, monkeypatch, fast_json):
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", fast_json)
+    monkeypatch.setattr(settings, "FORECAST_MAX_AGE_S", 3600)
+
+    plain = client.get(forecast_url)
+    columnar = client.get(forecast_url, headers={"Accept": COLUMNAR_JSON})
+    packed = client.get(forecast_url, headers={"Accept": COLUMNAR_MSGPACK})
+
+    for response in (plain, columnar, packed):
+        assert response.status_code == 200
+        assert response.headers["vary"] == "Accept"
+    assert plain.headers["content-type"] == "application/json"
+    assert columnar.headers["content-type"] == COLUMNAR_JSON
+    assert packed.headers["content-type"] == COLUMNAR_MSGPACK
+
+    values = [f["predicted_value"] for f in plain.json()]
+    assert columnar.json()["predicted_value"] == values
+    decoded = msgpack.unpackb(packed.content)
+    assert decoded["predicted_value"] == values and decoded["count"] == 6 and decoded["step_seconds"] == 3600.0
+
+
+def test_optimize_json_response_varies_on_accept(client, forecast_url):
+    response = client.post(
+        "/api/v1/optimize/energy", json={"building_id": 1, "max_load_kw": 50, "hours": 6}
+    )
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept"
+
+
+@pytest.fixture
+def app_with(monkeypatch):
+    """Re-import app.main with settings changed; the original app is restored after."""
+    import app.main
+
+    def build(**overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, name, value)
+        return importlib.reload(app.main).app
+
+    yield build
+    monkeypatch.undo()
+    importlib.reload(app.main)
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_large_responses_are_compressed_only_when_enabled(app_with, make_building, enabled):
+    for _ in range(40):
+        make_building()
+    with TestClient(app_with(COMPRESSION_ENABLED=enabled)) as client:
+        large = client.get("/api/v1/city/buildings", headers={"Accept-Encoding": "gzip"})
+        small = client.get("/api/v1/city/buildings?limit=1", headers={"Accept-Encoding": "gzip"})
+
+    assert len(large.json()) == 40
+    assert large.headers.get("content-encoding") == ("gzip" if enabled else None)
+    assert "content-encoding" not in small.headers  # below COMPRESSION_MIN_SIZE
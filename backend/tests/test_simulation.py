@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services import simulation
+from app.services.ingest import upsert_readings
+
+
+def test_profile_averages_hourly_totals_per_hour_of_day(db, make_building):
+    building, (sensor_id,) = make_building(type="school", city_zone="North")
+    make_building(type="school", city_zone="North")  # no readings: template
+    start = (datetime.utcnow() - timedelta(days=2)).replace(minute=0, second=0, microsecond=0)
+    readings = []
+    for h in range(36):
+        ts = start + timedelta(hours=h)
+        # two readings in each clock hour, summed before averaging over days
+        readings += [(sensor_id, ts, 1.0 + h), (sensor_id, ts + timedelta(minutes=30), 1.0)]
+    upsert_readings(db, readings)
+
+    profile = simulation.build_profile(db, days=3)
+
+    expected = np.zeros(24)
+    seen = np.zeros(24)
+    for h in range(36):
+        hod = (start + timedelta(hours=h)).hour
+        expected[hod] += 2.0 + h
+        seen[hod] += 1
+    expected /= seen
+    row = profile.load[profile.groups.index(("school", "North", "energy_meter"))]
+    template = simulation._template("school", "energy_meter")
+    np.testing.assert_allclose(row, expected + template)
+    assert profile.buildings == 2
+
+
+def test_concurrent_misses_share_one_build(db, make_building, monkeypatch):
+    make_building()
+    builds = []
+    real_build = simulation.build_profile
+
+    def counting(db, days):
+        builds.append(days)
+        return real_build(db, days)
+
+    monkeypatch.setattr(simulation, "build_profile", counting)
+
+    async def many():
+        return await asyncio.gather(*(simulation.profiles.get(db, 7) for _ in range(5)))
+
+    results = asyncio.run(many())
+    assert builds == [7]
+    assert all(r is results[0] for r in results)
+
+
+def test_simulate_endpoint(client, make_building):
+    make_building(type="school", city_zone="North")
+    response = client.post(
+        "/api/v1/city/simulate",
+        json={
+            "scenarios": [{
+                "name": "more schools",
+                "transforms": [{"op": "add_buildings", "type": "school", "city_zone": "North", "count": 1}],
+            }],
+            "history_days": 3,
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    baseline, [scenario] = body["baseline"], body["scenarios"]
+    assert scenario["city_daily_kwh"] > baseline["city_daily_kwh"]
@@ -0,0 +1,110 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy import inspect, text
+
+from app import models
+from app.database import init_db
+from app.services import spatial
+from app.services.spatial import SpatialIndex
+
+
+def _building(i, lat, lon):
+    return SimpleNamespace(
+        id=i, latitude=lat, longitude=lon, name=f"b{i}", type="office", city_zone=f"z{i}",
+        updated_at=None,
+    )
+
+
+def test_add_keeps_cell_order_and_is_queryable(db, make_building):
+    make_building(lat=12.90, lon=77.50)
+    make_building(lat=13.10, lon=77.70)
+    index = SpatialIndex()
+    index.ensure_fresh(db)
+
+    index.add(_building(100, 13.00, 77.60))
+    snap = index._snapshot
+    assert np.all(np.diff(snap.keys) >= 0)
+    assert [r["id"] for r in index.within(12.99, 77.59, 13.01, 77.61)] == [100]
+    assert {r["id"] for r in index.within(12.8, 77.4, 13.2, 77.8)} == {1, 2, 100}
+
+
+def test_readers_never_see_misaligned_rows():
+    index = SpatialIndex()
+    rng = np.random.default_rng(0)
+    errors = []
+    done = threading.Event()
+
+    def write():
+        for i in range(1500):
+            lat, lon = rng.uniform(12.8, 13.2), rng.uniform(77.4, 77.8)
+            index.add(_building(i, lat, lon))
+        done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                for row in index.within(12.8, 77.4, 13.2, 77.8):
+                    assert row["name"] == f"b{row['id']}"
+                    assert row["city_zone"] == f"z{row['id']}"
+                index.near(13.0, 77.6, 5.0)
+                index.clusters(12.8, 77.4, 13.2, 77.8, zoom=12)
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    writer = threading.Thread(target=write)
+    for t in readers + [writer]:
+        t.start()
+    for t in readers + [writer]:
+        t.join()
+    assert not errors
+    assert len(index.within(12.8, 77.4, 13.2, 77.8, limit=5000)) == 1500
+
+
+def test_moved_and_replaced_buildings_are_picked_up(db, make_building, monkeypatch):
+    monkeypatch.setattr(spatial, "REFRESH_INTERVAL_S", 0.0)
+    first, _ = make_building(lat=12.90, lon=77.50)
+    second, _ = make_building(lat=13.10, lon=77.70)
+    index = SpatialIndex()
+    index.ensure_fresh(db)
+
+    first.latitude, first.longitude = 13.10, 77.70
+    db.commit()
+    index.ensure_fresh(db)
+    assert {r["id"] for r in index.within(13.09, 77.69, 13.11, 77.71)} == {first.id, second.id}
+
+    # Same count and max id, different building
+    db.delete(first)
+    db.commit()
+    third, _ = make_building(lat=12.50, lon=77.00)
+    db.delete(third)
+    db.commit()
+    replacement = models.Building(id=first.id, name="new", type="office", latitude=12.5, longitude=77.0)
+    db.add(replacement)
+    db.commit()
+    index.ensure_fresh(db)
+    assert [r["name"] for r in index.within(12.49, 76.99, 12.51, 77.01)] == ["new"]
+
+
+def test_viewport_results_are_capped_by_default():
+    index = SpatialIndex()
+    for i in range(spatial.DEFAULT_LIMIT + 10):
+        index.add(_building(i, 13.0, 77.6))
+    assert len(index.within(12.9, 77.5, 13.1, 77.7)) == spatial.DEFAULT_LIMIT
+    assert len(index.near(13.0, 77.6, 1.0)) == spatial.DEFAULT_LIMIT
+
+
+def test_init_db_adds_updated_at_to_existing_databases(db, make_building):
+    make_building()
+    db.execute(text("DROP INDEX ix_buildings_updated_at"))
+    db.execute(text("ALTER TABLE buildings DROP COLUMN updated_at"))
+    db.commit()
+
+    init_db()
+    columns = {c["name"] for c in inspect(db.get_bind()).get_columns("buildings")}
+    assert "updated_at" in columns
+    index = SpatialIndex()
+    index.ensure_fresh(db)
+    assert len(index.within(12.9, 77.5, 13.0, 77.6)) == 1
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import startup_time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "sklearn", "pulp")
+
+
+def _python(code: str, tmp_path, **env) -> dict:
+    """Run `code` in a fresh interpreter; it prints one JSON object."""
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=BACKEND,
+        env={
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{tmp_path}/startup.db",
+            "JOBS_ENABLED": "false",
+            **env,
+        },
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_skips_heavy_modules_and_the_database(tmp_path):
+    loaded = _python(
+        "import json, sys, app.main; "
+        f"print(json.dumps({{m: m in sys.modules for m in {HEAVY!r}}}))",
+        tmp_path,
+    )
+    assert loaded == {m: False for m in HEAVY}
+    # Tables are created on startup, not at import
+    assert not (tmp_path / "startup.db").exists()
+
+
+STARTUP = (
+    "import json, sys\n"
+    "from fastapi.testclient import TestClient\n"
+    "from sqlalchemy import inspect\n"
+    "from app.main import app\n"
+    "from app.database import engine\n"
+    "with TestClient(app):\n"
+    "    pass\n"
+    f"loaded = {{m: m in sys.modules for m in {HEAVY!r}}}\n"
+    "print(json.dumps({'loaded': loaded, 'tables': inspect(engine).has_table('buildings')}))\n"
+)
+
+
+def test_startup_creates_tables_without_warm_up(tmp_path):
+    result = _python(STARTUP, tmp_path)
+    assert result == {"loaded": {m: False for m in HEAVY}, "tables": True}
+
+
+def test_warm_up_on_startup_imports_heavy_modules(tmp_path):
+    result = _python(STARTUP, tmp_path, WARMUP_ON_STARTUP="true")
+    assert result["loaded"] == {m: True for m in HEAVY}
+
+
+def test_models_load_on_first_fit_only(tmp_path):
+    code = (
+        "import json, sys\n"
+        "import numpy as np\n"
+        "from app.services.energy_forecasting import _fit_hybrid_arrays\n"
+        "from app.services.optimization_engine import solve_energy_schedule\n"
+        "before = 'sklearn' in sys.modules\n"
+        "_fit_hybrid_arrays(0, np.arange(48, dtype=np.float32))\n"
+        "print(json.dumps({'before': before, 'after': 'sklearn' in sys.modules,\n"
+        "                  'pulp': 'pulp' in sys.modules}))\n"
+    )
+    assert _python(code, tmp_path) == {"before": False, "after": True, "pulp": False}
+
+
+def test_startup_benchmark_parses_importtime(monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", BACKEND)
+    wall, cumulative, own = startup_time._run("app.config")
+    assert wall > 0
+    assert "app.config" in cumulative and "app.config" in own
+    assert cumulative["app.config"] >= own["app.config"]
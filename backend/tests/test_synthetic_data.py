@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import func
+
+from app import models
+from app.config import settings
+from app.services.timeseries_store import timeseries_store
+from app.synthetic_data import generate
+
+END = datetime(2026, 4, 1)
+ARGS = dict(buildings=6, sensors_per_building=2, days=1, cadence_minutes=30, students=20, end=END)
+
+
+def _readings(db):
+    return [
+        (r.sensor_id, r.timestamp, r.value)
+        for r in db.query(models.EnergyReading).order_by(
+            models.EnergyReading.sensor_id, models.EnergyReading.timestamp
+        )
+    ]
+
+
+def test_same_arguments_give_the_same_data_for_any_worker_count(db):
+    total = generate(workers=1, **ARGS)
+    # 6 buildings x 2 sensors x (48 half-hour slots + the end slot)
+    assert total == 6 * 2 * 49
+    first = _readings(db)
+    assert (first[0][1], first[-1][1]) == (END - timedelta(days=1), END)
+    assert db.query(func.count(models.Student.id)).scalar() == 20
+
+    generate(workers=2, **ARGS)
+    db.expire_all()
+    assert _readings(db) == first
+
+    generate(workers=1, **{**ARGS, "end": END + timedelta(hours=1)})
+    db.expire_all()
+    assert _readings(db) != first
+
+
+def test_generator_fills_the_timeseries_store(db, monkeypatch):
+    monkeypatch.setattr(settings, "TIMESERIES_STORE_ENABLED", True)
+    generate(workers=1, **ARGS)
+
+    building_id = db.query(models.Sensor.building_id).first()[0]
+    expected = (
+        db.query(func.sum(models.EnergyReading.value))
+        .join(models.Sensor, models.Sensor.id == models.EnergyReading.sensor_id)
+        .filter(models.Sensor.building_id == building_id)
+        .scalar()
+    )
+    _, window = timeseries_store.window(building_id, END - timedelta(days=1), END + timedelta(hours=1))
+    assert float(np.nansum(window)) == pytest.approx(expected, rel=1e-5)
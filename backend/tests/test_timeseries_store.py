@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.timeseries_store import TimeseriesStore, to_hour
+
+START = datetime(2026, 3, 1)
+
+
+def test_backdated_data_swaps_in_a_new_file(tmp_path):
+    store = TimeseriesStore(str(tmp_path))
+    hour = to_hour(START)
+    store.add_many(1, np.array([hour, hour + 1]), np.array([1.0, 2.0]))
+    first, window = store.window(1, START, START + timedelta(hours=2))
+    assert first == hour and isinstance(window, np.memmap)
+
+    store.add_many(1, np.array([hour - 3]), np.array([5.0]))
+    # A reader holding the old mapping still sees consistent values
+    assert window.tolist() == [1.0, 2.0]
+    first, values = store.window(1, START - timedelta(hours=3), START + timedelta(hours=2))
+    assert first == hour - 3
+    np.testing.assert_array_equal(values, [5.0, np.nan, np.nan, 1.0, 2.0])
+
+
+def test_latest_hour_comes_from_the_header(tmp_path):
+    store = TimeseriesStore(str(tmp_path))
+    assert store.latest_hour(1) is None
+    hour = to_hour(START)
+    store.add_many(1, np.array([hour]), np.array([1.0]))
+    store.add_many(1, np.array([hour + 30]), np.array([1.0]))
+    assert store.latest_hour(1) == hour + 30
+    store.add_many(1, np.array([hour - 10, hour + 2]), np.array([1.0, -1.0]))
+    assert store.latest_hour(1) == hour + 30
+    assert TimeseriesStore(str(tmp_path)).latest_hour(1) == hour + 30
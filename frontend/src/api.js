@@ -6,8 +6,14 @@ const api = axios.create({
 });
 
 // ==== CITY TWIN ====
-export const fetchBuildings = () => api.get("/city/buildings");
+// Keyset-paginated: pass { cursor } from the previous response's
+// "x-next-cursor" header to get the next page.
+export const fetchBuildings = (params = {}) =>
+  api.get("/city/buildings", { params });
 export const createBuilding = (data) => api.post("/city/buildings", data);
+// bounds: { south, west, north, east }
+export const fetchBuildingClusters = (bounds, zoom) =>
+  api.get("/city/clusters", { params: { ...bounds, zoom } });
 
 // ==== ENERGY ====
 export const fetchEnergyForecast = (buildingId, horizon = 24) =>
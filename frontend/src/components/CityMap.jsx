@@ -1,24 +1,67 @@
-import React, { useMemo } from "react";
-import { MapContainer, TileLayer, CircleMarker, Popup } from "react-leaflet";
+import React, { useCallback, useEffect, useMemo, useState } from "react";
+import {
+  MapContainer,
+  TileLayer,
+  CircleMarker,
+  Popup,
+  Tooltip,
+  useMap,
+  useMapEvents,
+} from "react-leaflet";
 import "leaflet/dist/leaflet.css";
+import { fetchBuildingClusters } from "../api";
 
-const CityMap = ({ buildings, energyIntensity }) => {
-  const blrCenter = [12.9716, 77.5946];
+const getColorForType = (type) => {
+  switch (type) {
+    case "school":
+      return "#3b82f6";
+    case "college":
+      return "#a855f7";
+    case "office":
+      return "#f97316";
+    case "residential":
+      return "#22c55e";
+    default:
+      return "#6b7280";
+  }
+};
 
-  const buildingsWithCoords = buildings.filter(
-    (b) =>
-      b.latitude !== null &&
-      b.latitude !== undefined &&
-      b.longitude !== null &&
-      b.longitude !== undefined
-  );
+// Renders only what is inside the current viewport, clustered server-side
+// for the current zoom, so the payload stays constant as the city grows.
+export const ViewportClusters = ({ energyIntensity, refreshKey }) => {
+  const map = useMap();
+  const [clusters, setClusters] = useState([]);
+
+  const load = useCallback(async () => {
+    const b = map.getBounds();
+    try {
+      const res = await fetchBuildingClusters(
+        {
+          south: b.getSouth(),
+          west: b.getWest(),
+          north: b.getNorth(),
+          east: b.getEast(),
+        },
+        map.getZoom()
+      );
+      setClusters(res.data || []);
+    } catch (e) {
+      console.error("Failed to load map clusters", e);
+    }
+  }, [map]);
+
+  useMapEvents({ moveend: load });
+
+  useEffect(() => {
+    load();
+  }, [load, refreshKey]);
 
   const intensityMap = useMemo(() => {
-    const map = {};
+    const m = {};
     (energyIntensity || []).forEach((item) => {
-      map[item.building_id] = item.total_kwh_24h;
+      m[item.building_id] = item.total_kwh_24h;
     });
-    return map;
+    return m;
   }, [energyIntensity]);
 
   const maxIntensity = useMemo(() => {
@@ -29,21 +72,6 @@ const CityMap = ({ buildings, energyIntensity }) => {
     );
   }, [energyIntensity]);
 
-  const getColorForType = (type) => {
-    switch (type) {
-      case "school":
-        return "#3b82f6";
-      case "college":
-        return "#a855f7";
-      case "office":
-        return "#f97316";
-      case "residential":
-        return "#22c55e";
-      default:
-        return "#6b7280";
-    }
-  };
-
   const getRadiusForBuilding = (buildingId) => {
     const baseRadius = 6;
     const intensity = intensityMap[buildingId];
@@ -54,6 +82,70 @@ const CityMap = ({ buildings, energyIntensity }) => {
     return baseRadius + scale * 12;
   };
 
+  return clusters.map((c) => {
+    if (c.count > 1) {
+      return (
+        <CircleMarker
+          key={`c-${c.latitude}-${c.longitude}`}
+          center={[c.latitude, c.longitude]}
+          radius={Math.min(30, 8 + Math.log2(c.count) * 3)}
+          pathOptions={{
+            color: "#0f766e",
+            fillColor: "#14b8a6",
+            fillOpacity: 0.6,
+            weight: 1,
+          }}
+          eventHandlers={{
+            click: () =>
+              map.setView([c.latitude, c.longitude], map.getZoom() + 2),
+          }}
+        >
+          <Tooltip direction="center" permanent>
+            {c.count}
+          </Tooltip>
+        </CircleMarker>
+      );
+    }
+
+    const color = getColorForType(c.type);
+    const totalKwh = intensityMap[c.id];
+    return (
+      <CircleMarker
+        key={c.id}
+        center={[c.latitude, c.longitude]}
+        radius={getRadiusForBuilding(c.id)}
+        pathOptions={{
+          color,
+          fillColor: color,
+          fillOpacity: 0.75,
+          weight: 1,
+        }}
+      >
+        <Popup>
+          <div style={{ fontSize: "12px" }}>
+            <strong>{c.name}</strong>
+            <br />
+            Type: {c.type}
+            <br />
+            Zone: {c.city_zone || "N/A"}
+            <br />
+            Lat: {c.latitude.toFixed(4)}, Lon: {c.longitude.toFixed(4)}
+            {typeof totalKwh === "number" && (
+              <>
+                <br />
+                24h Energy: {totalKwh.toFixed(1)} kWh
+              </>
+            )}
+          </div>
+        </Popup>
+      </CircleMarker>
+    );
+  });
+};
+
+const CityMap = ({ energyIntensity }) => {
+  const blrCenter = [12.9716, 77.5946];
+
   return (
     <div
       style={{
@@ -74,44 +166,7 @@ const CityMap = ({ buildings, energyIntensity }) => {
           attribution="&copy; OpenStreetMap contributors"
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
         />
-
-        {buildingsWithCoords.map((b) => {
-          const color = getColorForType(b.type);
-          const radius = getRadiusForBuilding(b.id);
-          const totalKwh = intensityMap[b.id];
-
-          return (
-            <CircleMarker
-              key={b.id}
-              center={[b.latitude, b.longitude]}
-              radius={radius}
-              pathOptions={{
-                color,
-                fillColor: color,
-                fillOpacity: 0.75,
-                weight: 1,
-              }}
-            >
-              <Popup>
-                <div style={{ fontSize: "12px" }}>
-                  <strong>{b.name}</strong>
-                  <br />
-                  Type: {b.type}
-                  <br />
-                  Zone: {b.city_zone || "N/A"}
-                  <br />
-                  Lat: {b.latitude.toFixed(4)}, Lon: {b.longitude.toFixed(4)}
-                  {typeof totalKwh === "number" && (
-                    <>
-                      <br />
-                      24h Energy: {totalKwh.toFixed(1)} kWh
-                    </>
-                  )}
-                </div>
-              </Popup>
-            </CircleMarker>
-          );
-        })}
+        <ViewportClusters energyIntensity={energyIntensity} />
       </MapContainer>
     </div>
   );
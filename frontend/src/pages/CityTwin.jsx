@@ -1,7 +1,8 @@
 import React, { useEffect, useState } from "react";
-import { MapContainer, TileLayer, Marker, Popup } from "react-leaflet";
+import { MapContainer, TileLayer } from "react-leaflet";
 import L from "leaflet";
 import { fetchBuildings, createBuilding } from "../api";
+import { ViewportClusters } from "../components/CityMap";
 
 // Fix Leaflet default icon paths for bundlers like Vite
 import markerIcon2x from "leaflet/dist/images/marker-icon-2x.png";
@@ -23,6 +24,8 @@ const BLR_CENTER = {
 
 const CityTwin = () => {
   const [buildings, setBuildings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [mapVersion, setMapVersion] = useState(0);
   const [loading, setLoading] = useState(true);
   const [form, setForm] = useState({
     name: "",
@@ -33,11 +36,13 @@ const CityTwin = () => {
   });
   const [error, setError] = useState("");
 
-  const loadBuildings = async () => {
+  const loadBuildings = async (cursor = null) => {
     try {
       setLoading(true);
-      const res = await fetchBuildings();
-      setBuildings(res.data || []);
+      const res = await fetchBuildings(cursor ? { cursor } : {});
+      const page = res.data || [];
+      setBuildings((prev) => (cursor ? [...prev, ...page] : page));
+      setNextCursor(res.headers["x-next-cursor"] || null);
     } catch (e) {
       console.error("Failed to fetch buildings", e);
       setError("Unable to load buildings. Check backend connection.");
@@ -86,6 +91,7 @@ const CityTwin = () => {
         city_zone: "",
       });
       loadBuildings();
+      setMapVersion((v) => v + 1);
     } catch (e) {
       console.error("Failed to create building", e);
       setError(
@@ -228,7 +234,7 @@ const CityTwin = () => {
               Registered Buildings
             </h2>
 
-            {loading ? (
+            {loading && buildings.length === 0 ? (
               <p className="muted-text" style={{ fontSize: "13px" }}>
                 Loading buildings...
               </p>
@@ -238,7 +244,8 @@ const CityTwin = () => {
                   className="muted-text"
                   style={{ fontSize: "13px", marginBottom: "4px" }}
                 >
-                  Total: <strong>{buildings.length}</strong>
+                  Showing: <strong>{buildings.length}</strong>
+                  {nextCursor ? "+" : ""}
                 </p>
 
                 {buildings.length === 0 ? (
@@ -294,6 +301,17 @@ const CityTwin = () => {
                     </div>
                   ))
                 )}
+
+                {nextCursor && (
+                  <button
+                    type="button"
+                    onClick={() => loadBuildings(nextCursor)}
+                    disabled={loading}
+                    style={{ alignSelf: "flex-start" }}
+                  >
+                    {loading ? "Loading..." : "Load more"}
+                  </button>
+                )}
               </>
             )}
           </div>
@@ -324,23 +342,7 @@ const CityTwin = () => {
                 url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                 attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
               />
-              {buildings.map((b) =>
-                b.latitude != null && b.longitude != null ? (
-                  <Marker
-                    key={b.id}
-                    position={[b.latitude, b.longitude]}
-                    title={b.name}
-                  >
-                    <Popup>
-                      <strong>{b.name}</strong>
-                      <br />
-                      Type: {b.type}
-                      <br />
-                      Zone: {b.city_zone || "N/A"}
-                    </Popup>
-                  </Marker>
-                ) : null
-              )}
+              <ViewportClusters refreshKey={mapVersion} />
             </MapContainer>
           </div>
         </div>